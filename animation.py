@@ -0,0 +1,315 @@
+"""
+animation.py
+
+Animations made of frames: a base SvgCanvas plus the changes made to it's shapes in every frame (nudged positions, new
+colours, fading opacities, ...). The frames can be written one file per frame, or as a single SVG that animates itself
+with SMIL <animate> elements.
+
+A frame's changes are the new values of shape instance variables, and they last until a later frame changes them again:
+    {circle: {"position": Position(12, 40)}, rect: {"fill": rgb(0, 0, 255), "fill_opacity": 0.5}}
+
+Rendering frames keeps the HTML of every child of the canvas from the frame before, and only re-renders the shapes the
+new frame changes (through their render cache, see HtmlComponent.string()). So past the first frame, the cost of a frame
+grows with the number of changed shapes rather than the size of the canvas, apart from writing the frame out.
+The shapes are changed in place while the frames are rendered, and given their base values back afterwards.
+
+Usage:
+    frames = FrameSequence(canvas)
+    for step in range(60):
+        frames.add_frame({circle: {"position": Position(50 + step, 50)}})
+    frames.write_frames("frames")       # frames/frame_0000.html, ... (or .svg for a canvas outside of a document)
+    frames.write_smil("animated.svg", frame_duration=1/30)
+
+Classes:
+    FrameSequence: The base canvas and the changes of every frame
+"""
+
+import os
+from typing import Any, Dict, Iterable, Iterator, List
+
+from html_f import HtmlComponent, SvgCanvas, CircleShape, RectangleShape, EllipseShape
+
+_SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+
+# the instance variables that can change between frames, and the SVG attributes they are output as
+_ANIMATED = {
+    CircleShape: {"position": ("cx", "cy"), "radius": ("r",), "fill": ("fill",), "fill_opacity": ("fill-opacity",)},
+    RectangleShape: {"position": ("x", "y"), "width": ("width",), "height": ("height",), "fill": ("fill",), "fill_opacity": ("fill-opacity",)},
+    EllipseShape: {"position": ("cx", "cy"), "rx": ("rx",), "ry": ("ry",), "fill": ("fill",), "fill_opacity": ("fill-opacity",)},
+}
+
+_MARKER = "\0canvas\0" # stands in for the canvas while the rest of it's tree is rendered
+
+
+def _attribute_values(name: str, value: Any) -> tuple:
+    '''the values of the SVG attributes an instance variable is output as'''
+    if name == "position":
+        return (value.x, value.y)
+    return (value,)
+
+
+class FrameSequence:
+    """
+    A base SvgCanvas and the changes made to it's shapes in every frame.
+
+    Only CircleShape, RectangleShape and EllipseShape children of the canvas can change, and only in the instance variables
+    that make up their SVG attributes (position, fill, fill_opacity and their sizes). Everything else on the canvas, like
+    ShapeTables, ShapeStreams (pulled once, then kept) or text, is the same in every frame.
+
+    Instance Variables:
+        canvas (SvgCanvas): The base canvas
+        frames (List[Dict[HtmlComponent, Dict[str, Any]]]): The changes of every frame, in order
+
+    Methods:
+        add_frame(self, changes=None) -> int: Adds a frame, returning it's index
+        iter_frames(self) -> Iterator[str]: Yields the HTML of every frame
+        write_frames(self, directory, name="frame") -> List[str]: Writes every frame to it's own file
+        smil_chunks(self, frame_duration=0.1, interpolate=False, repeat="indefinite") -> Iterator[str]: Yields one SVG that plays the frames
+        smil_svg(self, frame_duration=0.1, interpolate=False, repeat="indefinite") -> str: Returns one SVG that plays the frames
+        write_smil(self, path, frame_duration=0.1, interpolate=False, repeat="indefinite") -> None: Writes one SVG that plays the frames
+    """
+
+    def __init__(self, canvas: SvgCanvas, frames: Iterable[Dict[HtmlComponent, Dict[str, Any]]] = None):
+        """
+        Args:
+            canvas (SvgCanvas): The base canvas
+            frames (Iterable[Dict[HtmlComponent, Dict[str, Any]]], optional): The changes of the first frames. Defaults to None (no frames yet).
+        """
+        self.canvas = canvas
+        self.frames = []
+        for changes in frames or ():
+            self.add_frame(changes)
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def add_frame(self, changes: Dict[HtmlComponent, Dict[str, Any]] = None) -> int:
+        """
+        Adds a frame to the end of the sequence
+
+        Args:
+            changes (Dict[HtmlComponent, Dict[str, Any]], optional): The new values of the shapes' instance variables,
+                by shape. Defaults to None (the same as the frame before).
+
+        Raises:
+            ValueError: If a shape isn't a CircleShape, RectangleShape or EllipseShape child of the canvas, or an instance variable can't change
+
+        Returns:
+            int: The index of the frame
+        """
+        changes = dict(changes or {})
+        for shape, values in changes.items():
+            animated = _ANIMATED.get(type(shape))
+            if animated is None or shape.parent is not self.canvas:
+                raise ValueError(f"only circles, rectangles and ellipses on the canvas can change between frames, not {type(shape).__name__}")
+            for name in values:
+                if name not in animated:
+                    raise ValueError(f"{type(shape).__name__}.{name} can't change between frames")
+        self.frames.append(changes)
+        return len(self.frames) - 1
+
+    # Frames as files
+    def _level(self) -> int:
+        '''the indentation level of the canvas in it's tree'''
+        level = 0
+        element = self.canvas.parent
+        while element is not None:
+            level += 1
+            element = element.parent
+        return level
+
+    def _surroundings(self, level: int) -> tuple:
+        '''the HTML of the canvas' tree before and after the canvas'''
+        canvas = self.canvas
+        if canvas.parent is None:
+            return "", ""
+
+        root = canvas
+        while root.parent is not None:
+            root = root.parent
+        # the tree is rendered with the canvas' cache standing in for it's HTML, then split where it's HTML would go
+        canvas.invalidate()
+        canvas._render_cache = (level, _MARKER)
+        try:
+            html = "".join(root.iter_chunks())
+        finally:
+            canvas._render_cache = None
+        before, _, after = html.partition(_MARKER)
+        return before, after
+
+    def _standalone(self) -> SvgCanvas:
+        '''an <svg> element like the canvas but with the SVG namespace, only used for it's opening and closing tags'''
+        canvas = self.canvas
+        return SvgCanvas(canvas.size, attributes={**(canvas._attributes or {}), "xmlns": _SVG_NAMESPACE})
+
+    def _parts(self, level: int) -> tuple:
+        '''the canvas' HTML as a list of fragments (opening, then a newline and the HTML of every child, then closing) and where every shape's HTML is in it'''
+        canvas = self.canvas
+        # a canvas on it's own is written as a standalone SVG, which needs the namespace
+        opening = self._standalone() if canvas.parent is None else canvas
+        parts = [opening._opening_html(level)]
+        positions = {}
+        for element in canvas._children:
+            parts.append("\n")
+            if type(element) in _ANIMATED:
+                positions[element] = len(parts)
+            parts.append(element.string(indentation_level=level + 1))
+        parts.append(canvas._closing_html(level))
+        return parts, positions
+
+    def _iter_parts(self) -> Iterator[List[str]]:
+        '''yields the fragments of every frame's HTML, changing the shapes in place and giving them their base values back at the end'''
+        level = self._level()
+        before, after = self._surroundings(level)
+        parts, positions = self._parts(level)
+        parts.insert(0, before)
+        parts.append(after)
+
+        base = {} # shape -> the values it had before the first frame
+        try:
+            for changes in self.frames:
+                for shape, values in changes.items():
+                    original = base.setdefault(shape, {})
+                    for name, value in values.items():
+                        if name not in original:
+                            original[name] = getattr(shape, name)
+                        setattr(shape, name, value)
+                    # +1 for the fragment before the canvas
+                    parts[positions[shape] + 1] = shape.string(indentation_level=level + 1)
+                yield parts
+        finally:
+            for shape, values in base.items():
+                for name, value in values.items():
+                    setattr(shape, name, value)
+
+    def iter_frames(self) -> Iterator[str]:
+        """
+        Yields the HTML of every frame: the whole tree the canvas is in (like an HtmlDocument's <html>), or a standalone SVG if the canvas has no parent
+
+        Yields:
+            str: The HTML of the next frame
+        """
+        for parts in self._iter_parts():
+            yield "".join(parts)
+
+    def write_frames(self, directory: str, name: str = "frame") -> List[str]:
+        """
+        Writes every frame to directory/<name>_<index>.html, or .svg if the canvas has no parent (see iter_frames())
+
+        Args:
+            directory (str): Where to write the files (created if needed)
+            name (str, optional): The start of the file names. Defaults to "frame".
+
+        Returns:
+            List[str]: The paths of the frames, in order
+        """
+        os.makedirs(directory, exist_ok=True)
+        extension = "svg" if self.canvas.parent is None else "html"
+        digits = max(4, len(str(len(self.frames) - 1)))
+        paths = []
+        for index, parts in enumerate(self._iter_parts()):
+            path = os.path.join(directory, f"{name}_{index:0{digits}d}.{extension}")
+            with open(path, "w") as file:
+                file.writelines(parts)
+            paths.append(path)
+        return paths
+
+    # Frames as SMIL
+    def _timelines(self) -> Dict[HtmlComponent, Dict[str, list]]:
+        '''shape -> instance variable -> it's value in every frame, for every instance variable that changes'''
+        timelines = {}
+        for index, changes in enumerate(self.frames):
+            for shape, values in changes.items():
+                timeline = timelines.setdefault(shape, {})
+                for name, value in values.items():
+                    if name not in timeline:
+                        timeline[name] = [getattr(shape, name)] * index
+                    timeline[name].append(value)
+            # whatever didn't change in this frame keeps it's value from the frame before
+            for timeline in timelines.values():
+                for values in timeline.values():
+                    if len(values) <= index:
+                        values.append(values[-1])
+        return timelines
+
+    def _animated_html(self, shape: HtmlComponent, timeline: Dict[str, list], level: int, timing: Dict[str, Any]) -> str:
+        '''a shape's HTML with an <animate> child for every SVG attribute that changes'''
+        tabs = "    "*(level)
+        html = [shape._opening_html(level)]
+        for name, values in timeline.items():
+            # a value that never changes (like being set to what it already was) doesn't need animating
+            if all(value == values[0] for value in values):
+                continue
+            for position, attribute in enumerate(_ANIMATED[type(shape)][name]):
+                animate = HtmlComponent(tag="animate", indented_content=False, attributes={
+                    "attributeName": attribute,
+                    "values": ";".join(str(_attribute_values(name, value)[position]) for value in values),
+                    **timing,
+                })
+                html.append("\n")
+                html.append(animate.string(indentation_level=level + 1))
+        if len(html) == 1:
+            return shape.string(indentation_level=level)
+        html.append("\n" + tabs + shape._closing_html(level))
+        return "".join(html)
+
+    def smil_chunks(self, frame_duration: float = 0.1, interpolate: bool = False, repeat: str = "indefinite") -> Iterator[str]:
+        """
+        Yields a standalone SVG of the base canvas, where every shape that changes has <animate> elements playing it's values
+        frame by frame. Shapes that never change are output from their cached HTML, the same as in the frame files.
+
+        Args:
+            frame_duration (float, optional): How long every frame lasts, in seconds. Defaults to 0.1.
+            interpolate (bool, optional): Whether to move smoothly between frames, rather than jumping from one to the next. Defaults to False.
+            repeat (str, optional): The SMIL repeatCount, a number of times or "indefinite". Defaults to "indefinite".
+
+        Yields:
+            str: The next fragment of SVG
+        """
+        canvas = self.canvas
+        frame_count = len(self.frames)
+        timing = {
+            # interpolated, the last frame is where the animation ends up, so it takes one frame less
+            "dur": f"{frame_duration * (frame_count - 1 if interpolate and frame_count > 1 else frame_count):g}s",
+            "calcMode": "linear" if interpolate else "discrete",
+            "repeatCount": repeat,
+        }
+        timelines = self._timelines()
+
+        wrapper = self._standalone()
+        yield wrapper._opening_html(0)
+        for element in canvas._children or ():
+            yield "\n"
+            timeline = timelines.get(element)
+            if timeline is None:
+                yield element.string(indentation_level=1)
+            else:
+                yield self._animated_html(element, timeline, 1, timing)
+        yield wrapper._closing_html(0)
+
+    def smil_svg(self, frame_duration: float = 0.1, interpolate: bool = False, repeat: str = "indefinite") -> str:
+        """
+        Returns a standalone SVG that plays the frames with SMIL <animate> elements (see smil_chunks())
+
+        Args:
+            frame_duration (float, optional): How long every frame lasts, in seconds. Defaults to 0.1.
+            interpolate (bool, optional): Whether to move smoothly between frames. Defaults to False.
+            repeat (str, optional): The SMIL repeatCount. Defaults to "indefinite".
+
+        Returns:
+            str: The SVG
+        """
+        return "".join(self.smil_chunks(frame_duration, interpolate, repeat))
+
+    def write_smil(self, path: str, frame_duration: float = 0.1, interpolate: bool = False, repeat: str = "indefinite") -> None:
+        """
+        Writes a standalone SVG that plays the frames with SMIL <animate> elements (see smil_chunks())
+
+        Args:
+            path (str): The file to write
+            frame_duration (float, optional): How long every frame lasts, in seconds. Defaults to 0.1.
+            interpolate (bool, optional): Whether to move smoothly between frames. Defaults to False.
+            repeat (str, optional): The SMIL repeatCount. Defaults to "indefinite".
+        """
+        with open(path, "w") as file:
+            file.writelines(self.smil_chunks(frame_duration, interpolate, repeat))
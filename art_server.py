@@ -0,0 +1,362 @@
+"""
+art_server.py
+
+A small local HTTP server for art pages, built on the standard library.
+
+Every GET of / (or /art) generates a page of random shapes from the PyArtConfig given in the query string, and streams
+it back with chunked transfer encoding while the shapes are being generated and serialized, so the first bytes go out
+long before a big page is finished. Requests are handled by a fixed pool of worker threads. A worker only holds a
+connection while it answers a request: a keep-alive connection waiting for it's next request is watched by one thread
+for all of them, so idle clients can't use up the pool. Rendering holds the GIL, so more workers than CPUs don't render
+any faster, they let slow clients and cache hits be answered while a page renders.
+
+With a RenderCache (--cache-memory / --cache-dir) pages asked for with a seed are kept, and the next request for the same
+page is answered from the cache. GET /cache returns the cache's counters as JSON.
+
+Query parameters (all optional):
+    count: How many shapes (default 100, at most the server's --max-count)
+    seed: Seed for a reproducible page. Without one a seed is picked at random, and sent back in the X-Art-Seed header
+    SHA: Comma separated shape codes, e.g. SHA=0,3 (0=circle, 1=rectangle, 3=ellipse)
+    X, Y, RAD, RX, RY, W, H, R, G, B, OP: A "min,max" range, e.g. R=200,255&OP=0.5,1
+
+Usage:
+    python art_server.py --port 8000 --workers 8
+    python art_server.py --cache-memory 64 --cache-dir .art_cache
+    curl "http://127.0.0.1:8000/art?count=500&seed=7&R=200,255"
+
+Classes:
+    ArtServer: The HTTP server, handing requests to a pool of worker threads
+    ArtRequestHandler: Generates and streams one page per request
+Functions:
+    page_from_query(query, max_count) -> GalleryPage: The page asked for by a parsed query string
+"""
+
+import argparse
+import json
+import random
+import selectors
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List
+from urllib.parse import urlsplit, parse_qs
+
+from gallery import GalleryPage, build_page
+from render_cache import RenderCache, page_key
+from s_gen import PyArtConfig
+
+_RANGES = ["X", "Y", "RAD", "RX", "RY", "W", "H", "R", "G", "B", "OP"]
+
+
+def _parse_range(name: str, value: str) -> tuple:
+    '''a "min,max" query value as a (min, max) tuple, floats for OP and ints for the rest'''
+    parts = value.split(",")
+    if len(parts) != 2:
+        raise ValueError(f"{name} must be min,max")
+    convert = float if name == "OP" else int
+    try:
+        low, high = convert(parts[0]), convert(parts[1])
+    except ValueError:
+        raise ValueError(f"{name} must be two {convert.__name__}s") from None
+    if low > high:
+        raise ValueError(f"{name} minimum is larger than it's maximum")
+    return (low, high)
+
+def page_from_query(query: Dict[str, List[str]], max_count: int = 100000) -> GalleryPage:
+    """
+    Makes the page asked for by a query string
+
+    Args:
+        query (Dict[str, List[str]]): The query string, parsed by urllib.parse.parse_qs
+        max_count (int, optional): The largest count allowed. Defaults to 100000.
+
+    Raises:
+        ValueError: If a parameter is missing a value, badly formed or out of range
+
+    Returns:
+        GalleryPage: The page (named "art"), always with a seed
+    """
+    def single(name: str) -> str:
+        values = query.get(name)
+        return None if values is None else values[-1]
+
+    config = {}
+    if single("SHA") is not None:
+        try:
+            config["SHA"] = [int(code) for code in single("SHA").split(",")]
+        except ValueError:
+            raise ValueError("SHA must be comma separated shape codes") from None
+        if not config["SHA"] or any(code not in (0, 1, 3) for code in config["SHA"]):
+            raise ValueError("SHA codes must be 0, 1 or 3")
+    for name in _RANGES:
+        if single(name) is not None:
+            config[name] = _parse_range(name, single(name))
+
+    try:
+        count = int(single("count") or 100)
+        seed = int(single("seed")) if single("seed") is not None else random.randrange(2 ** 32)
+    except ValueError:
+        raise ValueError("count and seed must be integers") from None
+    if not 0 <= count <= max_count:
+        raise ValueError(f"count must be between 0 and {max_count}")
+
+    return GalleryPage("art", PyArtConfig(**config), count, seed)
+
+
+class ArtRequestHandler(BaseHTTPRequestHandler):
+    """
+    Generates and streams one art page per GET request
+
+    Instance Variables:
+        block_size (int): Roughly how many characters go in each chunk of the response
+        quiet (bool): Don't log requests to stderr
+    """
+    protocol_version = "HTTP/1.1" # needed for chunked responses (and keeps connections alive between requests)
+    server_version = "htmlshapeart"
+    timeout = 10 # how long a worker waits for the rest of a request (idle keep-alive connections don't hold a worker, see ArtServer)
+    block_size = 16384
+    quiet = False
+
+    def handle(self) -> None:
+        # one request at a time: between requests the connection goes back to the server (see ArtServer.keep_alive_timeout)
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._request_waiting():
+            self.handle_one_request()
+
+    def _request_waiting(self) -> bool:
+        '''whether the client has already sent another request, which might be read into rfile and so not show up on the socket'''
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except (OSError, ValueError):
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        if url.path == "/cache":
+            self._send_cache_stats()
+            return
+        if url.path not in ("/", "/art"):
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        try:
+            page = page_from_query(query, self.server.max_count)
+        except ValueError as error:
+            self.send_error(400, str(error))
+            return
+
+        # pages with a random seed are unlikely to be asked for again, they would only push useful pages out of the cache
+        cache = self.server.cache if "seed" in query else None
+        key = page_key(page) if cache is not None else None
+        if cache is not None:
+            data = cache.get(key)
+            if data is not None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.send_header("X-Art-Seed", str(page.seed))
+                self.send_header("X-Art-Cache", "hit")
+                self.end_headers()
+                self._write(data)
+                return
+
+        # lazy, so the shapes are generated while the response is streamed rather than all up front
+        doc = build_page(page, lazy=True)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Art-Seed", str(page.seed))
+        if cache is not None:
+            self.send_header("X-Art-Cache", "miss")
+        self.end_headers()
+
+        blocks = [] if cache is not None else None # a copy of the page for the cache, kept while streaming it
+        for block in doc.root.iter_blocks(block_size=self.block_size):
+            data = block.encode("utf-8")
+            if not self._write(b"%X\r\n%s\r\n" % (len(data), data)):
+                return
+            if blocks is not None:
+                blocks.append(data)
+        if self._write(b"0\r\n\r\n") and blocks is not None:
+            cache.put(key, b"".join(blocks))
+
+    def _write(self, data: bytes) -> bool:
+        '''writes data to the client, returning False if the client has gone away'''
+        try:
+            self.wfile.write(data)
+            return True
+        except (BrokenPipeError, ConnectionResetError):
+            # nothing left to send it, and the page might be incomplete so it isn't cached either
+            self.close_connection = True
+            return False
+
+    def _send_cache_stats(self) -> None:
+        '''answers GET /cache with the cache counters as JSON'''
+        if self.server.cache is None:
+            self.send_error(404, "the server has no cache")
+            return
+        data = json.dumps(self.server.cache.stats()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self._write(data)
+
+    def log_message(self, format, *args) -> None:
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class ArtServer(HTTPServer):
+    """
+    An HTTPServer that hands every request to a fixed pool of worker threads, instead of a new thread per connection (like
+    ThreadingHTTPServer), so a burst of requests can't start an unlimited number of renders at once.
+    Requests that arrive while every worker is busy wait in the pool's queue. Between requests a keep-alive connection is
+    handed back to one watcher thread, which gives it to a worker again when the next request arrives, or closes it once it
+    has been idle for keep_alive_timeout.
+
+    Instance Variables:
+        max_count (int): The largest count a request may ask for
+        cache (RenderCache): The cache for seeded pages, or None
+        keep_alive_timeout (float): How many seconds an idle keep-alive connection is kept open
+
+    Methods:
+        serve_forever(self, poll_interval=0.5) -> None: Serves requests until shutdown() is called (from HTTPServer)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: tuple, workers: int = 8, max_count: int = 100000, cache: RenderCache = None, handler=ArtRequestHandler,
+                 keep_alive_timeout: float = 30):
+        """
+        Args:
+            address (tuple): The (host, port) to listen on, port 0 picks a free one
+            workers (int, optional): The number of worker threads. Defaults to 8.
+            max_count (int, optional): The largest count a request may ask for. Defaults to 100000.
+            cache (RenderCache, optional): Where to keep seeded pages. Defaults to None (no caching).
+            handler (type, optional): The request handler class. Defaults to ArtRequestHandler.
+            keep_alive_timeout (float, optional): How many seconds an idle keep-alive connection is kept open. Defaults to 30.
+        """
+        super().__init__(address, handler)
+        self.max_count = max_count
+        self.cache = cache
+        self.keep_alive_timeout = keep_alive_timeout
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="art-worker")
+
+        # idle keep-alive connections, watched by one thread. Parked ones are handed over through _parked, and the other
+        # end of _wakeup is written to so the watcher stops waiting and picks them up
+        self._idle = selectors.DefaultSelector()
+        self._parked = []
+        self._parked_lock = threading.Lock()
+        self._wakeup, self._wakeup_writer = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._idle.register(self._wakeup, selectors.EVENT_READ)
+        self._closing = False
+        self._watcher = threading.Thread(target=self._watch_idle, name="art-keep-alive", daemon=True)
+        self._watcher.start()
+
+    def process_request(self, request, client_address) -> None:
+        self._pool.submit(self._process_request_in_pool, request, client_address)
+
+    def finish_request(self, request, client_address):
+        return self.RequestHandlerClass(request, client_address, self)
+
+    def _process_request_in_pool(self, request, client_address) -> None:
+        '''runs in a worker thread, the same as socketserver.ThreadingMixIn.process_request_thread, except that a connection kept alive is parked'''
+        try:
+            handler = self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        if handler.close_connection or self._closing:
+            self.shutdown_request(request)
+            return
+        with self._parked_lock:
+            self._parked.append((request, client_address))
+        self._wakeup_writer.send(b"\0")
+
+    def _watch_idle(self) -> None:
+        '''runs in the watcher thread: hands idle connections to a worker when their next request arrives, and closes them when they time out'''
+        deadlines = {} # connection -> (client address, when it is closed)
+        while not self._closing:
+            timeout = max(0.0, min(deadline for _, deadline in deadlines.values()) - time.monotonic()) if deadlines else None
+            for key, _ in self._idle.select(timeout):
+                if key.fileobj is self._wakeup:
+                    try:
+                        while self._wakeup.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                # the next request (or the client closing the connection), which a worker reads
+                self._idle.unregister(key.fileobj)
+                client_address, _ = deadlines.pop(key.fileobj)
+                self._pool.submit(self._process_request_in_pool, key.fileobj, client_address)
+
+            with self._parked_lock:
+                parked, self._parked = self._parked, []
+            deadline = time.monotonic() + self.keep_alive_timeout
+            for request, client_address in parked:
+                self._idle.register(request, selectors.EVENT_READ)
+                deadlines[request] = (client_address, deadline)
+
+            now = time.monotonic()
+            for request in [request for request, (_, deadline) in deadlines.items() if deadline <= now]:
+                self._idle.unregister(request)
+                del deadlines[request]
+                self.shutdown_request(request)
+
+        for request in deadlines:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._closing = True
+        self._wakeup_writer.send(b"\0")
+        self._watcher.join()
+        self._pool.shutdown(wait=True)
+        with self._parked_lock:
+            parked, self._parked = self._parked, []
+        for request, _ in parked:
+            self.shutdown_request(request)
+        self._idle.close()
+        self._wakeup.close()
+        self._wakeup_writer.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serves generated art pages over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default 8000)")
+    parser.add_argument("--workers", type=int, default=8, help="worker threads (default 8)")
+    parser.add_argument("--max-count", type=int, default=100000, help="largest count a request may ask for (default 100000)")
+    parser.add_argument("--cache-memory", type=int, metavar="MIB", help="cache seeded pages, keeping up to MIB mebibytes in memory")
+    parser.add_argument("--cache-dir", help="also keep cached pages on disk in this directory (default 64 MiB in memory if --cache-memory isn't given)")
+    parser.add_argument("--quiet", action="store_true", help="don't log requests")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_memory is not None or args.cache_dir is not None:
+        cache = RenderCache(directory=args.cache_dir, max_memory_bytes=(args.cache_memory or 64) * 2**20)
+
+    ArtRequestHandler.quiet = args.quiet
+    with ArtServer((args.host, args.port), workers=args.workers, max_count=args.max_count, cache=cache) as server:
+        print(f"serving art on http://{server.server_address[0]}:{server.server_address[1]}/art")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
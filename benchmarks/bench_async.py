@@ -0,0 +1,90 @@
+"""
+bench_async.py
+
+Measures how long HtmlDocument.aoutput() holds the asyncio event loop while writing a big document.
+A ticker coroutine wakes up every millisecond during the write, and the longest gap between its wake ups (beyond the
+millisecond it asked for) is the worst event loop stall. Run it from the repository root:
+
+    python benchmarks/bench_async.py --count 100000
+
+For comparison, the blocking HtmlDocument.output() stalls the loop for the whole write.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_f import HtmlDocument, SvgCanvas, Size
+from s_gen import PyArtConfig, RandomShape
+
+
+def build_document(path: str, count: int) -> HtmlDocument:
+    '''a document with one SvgCanvas of count random shapes'''
+    doc = HtmlDocument(path)
+    canvas = doc.body.add(SvgCanvas(Size(500, 300)))
+    config = PyArtConfig()
+    rand = random.Random(0)
+    for _ in range(count):
+        canvas.add(RandomShape(config, rand).as_html_component())
+    return doc
+
+
+async def measure(write, tick: float = 0.001) -> (float, float):
+    """
+    Runs write() while a ticker measures the event loop stalls
+
+    Args:
+        write (Callable[[], Awaitable]): The write to measure
+        tick (float, optional): How often the ticker asks to wake up, in seconds. Defaults to 0.001.
+
+    Returns:
+        (float, float): The total write time and the longest stall, in seconds
+    """
+    worst = 0.0
+    done = False
+
+    async def ticker():
+        nonlocal worst
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(tick)
+            now = time.perf_counter()
+            worst = max(worst, now - last - tick)
+            last = now
+
+    ticking = asyncio.create_task(ticker())
+    await asyncio.sleep(0) # let the ticker start
+    start = time.perf_counter()
+    await write()
+    elapsed = time.perf_counter() - start
+    done = True
+    await ticking
+    return elapsed, worst
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measures event loop stalls while writing a document asynchronously")
+    parser.add_argument("--count", type=int, default=100000, help="shapes in the document (default 100000)")
+    parser.add_argument("--block-size", type=int, default=16384, help="aoutput() block size (default 16384)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        doc = build_document(os.path.join(directory, "async"), args.count)
+
+        async def blocking():
+            doc.output()
+
+        for name, write in (("aoutput", lambda: doc.aoutput(block_size=args.block_size)), ("output", blocking)):
+            elapsed, worst = asyncio.run(measure(write))
+            print(f"{name:>8}: {elapsed:8.3f}s total, longest event loop stall {worst * 1000:8.2f}ms")
+        doc._close_file()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
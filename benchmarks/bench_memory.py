@@ -0,0 +1,106 @@
+"""
+bench_memory.py
+
+Reports how many bytes each shape costs on an SvgCanvas (the shape objects, their rgb / Position values and the canvas' child list).
+Run it from the repository root:
+
+    python benchmarks/bench_memory.py --count 100000
+    python benchmarks/bench_memory.py --count 100000 --against <git revision>
+
+--against loads html_f.py from that git revision as well, so the numbers before and after a change can be compared side by side.
+"""
+
+import argparse
+import gc
+import importlib.util
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_html_f(revision: str = None):
+    """
+    Imports html_f, either from the working tree or from a git revision
+
+    Args:
+        revision (str, optional): The git revision to load html_f.py from. Defaults to None (the working tree).
+
+    Returns:
+        module: The html_f module
+    """
+    if revision is None:
+        path = os.path.join(REPO_ROOT, "html_f.py")
+        name = "html_f_current"
+    else:
+        source = subprocess.run(["git", "show", f"{revision}:html_f.py"], cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+        path = os.path.join(tempfile.mkdtemp(), "html_f.py")
+        with open(path, "w") as file:
+            file.write(source)
+        name = f"html_f_{revision}"
+
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bytes_per_shape(html_f, count: int, seed: int = 0) -> float:
+    """
+    Builds an SvgCanvas of count random circles, rectangles and ellipses and measures the memory they use
+
+    Args:
+        html_f (module): The html_f module to build the shapes with
+        count (int): How many shapes to build
+        seed (int, optional): The seed for the shape values. Defaults to 0.
+
+    Returns:
+        float: The traced bytes per shape
+    """
+    rand = random.Random(seed)
+    # the values are generated up front so that only the components are traced
+    values = [(rand.choice((0, 1, 3)), rand.randint(0, 500), rand.randint(0, 300), rand.randint(10, 100), rand.randint(10, 100),
+               rand.randint(0, 255), rand.randint(0, 255), rand.randint(0, 255), round(rand.uniform(0, 1), 1)) for _ in range(count)]
+
+    gc.collect()
+    tracemalloc.start()
+    canvas = html_f.SvgCanvas(html_f.Size(500, 300))
+    for sha, x, y, a, b, red, green, blue, opacity in values:
+        position = html_f.Position(x, y)
+        fill = html_f.rgb(red, green, blue)
+        if sha == 0:
+            canvas.add(html_f.CircleShape(position, a, fill, opacity))
+        elif sha == 1:
+            canvas.add(html_f.RectangleShape(position, a, b, fill, opacity))
+        else:
+            canvas.add(html_f.EllipseShape(position, a, b, fill, opacity))
+    gc.collect()
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del canvas
+    return used / count
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Reports the memory used per shape on an SvgCanvas")
+    parser.add_argument("--count", type=int, default=100000, help="how many shapes to build (default 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the shape values (default 0)")
+    parser.add_argument("--against", metavar="REVISION", help="also measure html_f.py from this git revision")
+    args = parser.parse_args(argv)
+
+    results = []
+    if args.against is not None:
+        results.append((args.against, load_html_f(args.against)))
+    results.append(("working tree", load_html_f()))
+
+    for label, html_f in results:
+        print(f"{label:>14}: {bytes_per_shape(html_f, args.count, args.seed):8.1f} bytes per shape ({args.count} shapes)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""
+bench_parallel.py
+
+Measures how long HtmlComponent.string(workers=N) takes to render one big SvgCanvas, and the speedup over rendering in one process.
+Run it from the repository root:
+
+    python benchmarks/bench_parallel.py --count 200000 --workers 1 2 4 8
+
+Every parallel result is checked against the single process output. With --break-even it also measures what the speed of
+parallel rendering depends on (the time to render a shape here and in a forked worker, to send it's HTML back, and to
+start the pool) and models from those how many shapes a canvas needs before N workers beat one process:
+
+    python benchmarks/bench_parallel.py --count 20000 --workers 2 4 8 --break-even
+
+Results (CPython 3, Linux, a container limited to 1 CPU, so the timed runs can't show a gain: with one usable CPU
+string(workers=N) renders in this process. The break-even is modelled for a machine with N free CPUs):
+
+    per shape: 9.30us serial, 9.38us in a forked worker, 0.20us to send back and join
+           2: pool start   16.0ms, pays off from 3620 shapes
+           4: pool start   27.4ms, pays off from 4057 shapes
+           8: pool start   50.7ms, pays off from 6390 shapes
+
+The model leaves out everything the workers share (memory bandwidth, copying pages on write as they touch the tree,
+other load), which is why html_f only splits up child lists of _PARALLEL_MIN_CHILDREN (32768) or more, several times
+the modelled break-even: on a multi-core machine, 20000 shapes were measured rendering no faster with workers than without.
+"""
+
+import argparse
+import multiprocessing
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import html_f
+from html_f import HtmlComponent, SvgCanvas, Size
+from s_gen import PyArtConfig, RandomShape
+
+
+def build_canvas(count: int) -> HtmlComponent:
+    """
+    Builds an <html> tree holding one SvgCanvas of count random shapes
+
+    Args:
+        count (int): How many shapes to put on the canvas
+
+    Returns:
+        HtmlComponent: The <html> HtmlComponent
+    """
+    root = HtmlComponent(tag="html")
+    body = root.add(HtmlComponent(tag="body"))
+    canvas = body.add(SvgCanvas(Size(500, 300)))
+    config = PyArtConfig()
+    for _ in range(count):
+        canvas.add(RandomShape(config).as_html_component())
+    return root
+
+
+def clear_cache(root: HtmlComponent) -> None:
+    '''forgets every cached render, so each timing renders the tree from scratch'''
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        element.invalidate()
+        stack.extend(element._children or ())
+
+
+def time_render(root: HtmlComponent, workers: int, repeat: int) -> (float, str):
+    '''returns the best time of repeat renders with the given number of workers, and the HTML'''
+    best = None
+    for _ in range(repeat):
+        clear_cache(root)
+        start = time.perf_counter()
+        html = root.string(workers=workers)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, html
+
+
+def _noop(value):
+    return value
+
+def _timed_forked_range(start: int, stop: int, indentation_level: int) -> float:
+    '''runs in a forked worker: how long rendering part of the inherited child list takes, copy on write included'''
+    began = time.perf_counter()
+    html_f._render_forked_range(0, start, stop, indentation_level)
+    return time.perf_counter() - began
+
+def measure_break_even(root: HtmlComponent, worker_counts: list) -> dict:
+    """
+    Measures what the parallel renderer's speed depends on, and models from it how many shapes a canvas needs before
+    rendering it with N workers beats rendering it in one process (on a machine with at least N free CPUs):
+
+        serial time   = shapes * serial
+        parallel time = start(N) + shapes * worker / N + shapes * transfer
+
+    Args:
+        root (HtmlComponent): A tree from build_canvas()
+        worker_counts (list): The numbers of workers to model
+
+    Returns:
+        dict: serial, worker and transfer (seconds per shape), and per worker count, start (seconds) and break_even (shapes, None if never)
+    """
+    canvas = root._children[0]._children[0]
+    children = canvas._children
+    count = len(children)
+    clear_cache(root)
+
+    # rendering a shape in this process, the same way a worker does (without caching it)
+    began = time.perf_counter()
+    html = "\n".join([html_f._render_element(element, 3) for element in children])
+    serial = (time.perf_counter() - began) / count
+
+    # sending a rendered chunk back from a worker and joining it, as 8 chunks per worker would be
+    chunk = max(1, len(html) // 64)
+    chunks = [html[start:start+chunk] for start in range(0, len(html), chunk)]
+    began = time.perf_counter()
+    "\n".join([pickle.loads(pickle.dumps(piece)) for piece in chunks])
+    transfer = (time.perf_counter() - began) / count
+
+    context = multiprocessing.get_context("fork")
+    html_f._forked_children[:] = [children]
+    try:
+        # rendering a shape in a forked worker, which pays for copying the pages of the tree it touches
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            worker = executor.submit(_timed_forked_range, 0, count, 3).result() / count
+
+        results = {"serial": serial, "worker": worker, "transfer": transfer}
+        for workers in worker_counts:
+            began = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                list(executor.map(_noop, range(workers)))
+            start = time.perf_counter() - began
+            saved = serial - worker / workers - transfer
+            results[workers] = {"start": start, "break_even": round(start / saved) if saved > 0 else None}
+    finally:
+        html_f._forked_children.clear()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Measures the parallel rendering speedup for a large SvgCanvas")
+    parser.add_argument("--count", type=int, default=200000, help="how many shapes to render (default 200000)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="worker counts to measure (default 1 2 4 8)")
+    parser.add_argument("--repeat", type=int, default=3, help="renders per worker count, the best is reported (default 3)")
+    parser.add_argument("--break-even", action="store_true", help="also model how many shapes parallel rendering needs to pay off")
+    args = parser.parse_args(argv)
+
+    root = build_canvas(args.count)
+    print(f"{args.count} shapes, {os.cpu_count()} cpus ({html_f._usable_cpus()} usable)")
+
+    if args.break_even:
+        model = measure_break_even(root, [workers for workers in args.workers if workers > 1])
+        print(f"per shape: {model['serial'] * 1e6:.2f}us serial, {model['worker'] * 1e6:.2f}us in a forked worker, "
+              f"{model['transfer'] * 1e6:.2f}us to send back and join")
+        for workers in args.workers:
+            if workers > 1:
+                break_even = model[workers]["break_even"]
+                print(f"{workers:>8}: pool start {model[workers]['start'] * 1e3:6.1f}ms, pays off from "
+                      + (f"{break_even} shapes" if break_even is not None else "never"))
+
+    serial_time, expected = time_render(root, None, args.repeat)
+    print(f"{'serial':>8}: {serial_time:8.3f}s")
+
+    for workers in args.workers:
+        elapsed, html = time_render(root, workers, args.repeat)
+        if html != expected:
+            raise AssertionError(f"output with {workers} workers differs from the serial output")
+        print(f"{workers:>8}: {elapsed:8.3f}s  speedup {serial_time / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+bench_server.py
+
+A load test for art_server.py. A number of client threads send GET requests as fast as they can (each over its own
+keep-alive connection) and the requests per second and p50/p99 latencies are reported. A latency is the time from sending
+a request to having read the whole page. Run it from the repository root:
+
+    python benchmarks/bench_server.py --requests 500 --concurrency 16 --count 1000      # starts its own server
+    python benchmarks/bench_server.py --url "http://127.0.0.1:8000/art?count=1000"      # against a running server
+    python benchmarks/bench_server.py --seeds 20 --cache-memory 64                        # mostly cache hits
+
+Without --url a server is started in this process, so the clients and the server share the same interpreter.
+Run the server on it's own (python art_server.py --quiet) for numbers closer to real use.
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from art_server import ArtServer, ArtRequestHandler
+from render_cache import RenderCache
+
+
+def percentile(values: list, fraction: float) -> float:
+    '''the value below which fraction of the (sorted) values fall, nearest rank'''
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def run_load(url: str, requests: int, concurrency: int, seeds: int = 0) -> (float, list, int):
+    """
+    Sends requests GETs to url from concurrency client threads
+
+    Args:
+        url (str): The page to request
+        requests (int): How many requests to send in total
+        concurrency (int): How many clients send requests at the same time
+        seeds (int, optional): Cycle the requests through this many seeds. Defaults to 0 (the server picks a random seed every time).
+
+    Returns:
+        (float, list, int): The total time in seconds, the sorted latencies in seconds and the number of failed requests
+    """
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    query = parts.query
+
+    latencies = []
+    failures = 0
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client():
+        nonlocal failures
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        try:
+            while True:
+                with lock:
+                    number = next(counter, None)
+                if number is None:
+                    return
+                target = path + "?" + "&".join(filter(None, [query, f"seed={number % seeds}" if seeds else ""]))
+                start = time.perf_counter()
+                try:
+                    connection.request("GET", target)
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    ok = False
+                    connection.close() # reconnects on the next request
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if ok:
+                        latencies.append(elapsed)
+                    else:
+                        failures += 1
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    return total, latencies, failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load tests the art server")
+    parser.add_argument("--url", help="page to request from a running server (default: start a server in this process)")
+    parser.add_argument("--requests", type=int, default=500, help="requests to send (default 500)")
+    parser.add_argument("--concurrency", type=int, default=16, help="clients sending at the same time (default 16)")
+    parser.add_argument("--count", type=int, default=1000, help="shapes per page when starting a server (default 1000)")
+    parser.add_argument("--workers", type=int, default=8, help="server worker threads when starting a server (default 8)")
+    parser.add_argument("--seeds", type=int, default=0, help="cycle the requests through this many seeds (default 0: unseeded)")
+    parser.add_argument("--cache-memory", type=int, metavar="MIB", help="give the started server a RenderCache of MIB mebibytes")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        ArtRequestHandler.quiet = True
+        cache = RenderCache(max_memory_bytes=args.cache_memory * 2**20) if args.cache_memory else None
+        server = ArtServer(("127.0.0.1", 0), workers=args.workers, cache=cache)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/art?count={args.count}"
+
+    try:
+        total, latencies, failures = run_load(url, args.requests, args.concurrency, args.seeds)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(f"{url}")
+    print(f"{len(latencies)} ok, {failures} failed in {total:.2f}s with {args.concurrency} clients")
+    print(f"{len(latencies) / total:10.1f} requests/s")
+    print(f"{percentile(latencies, 0.50) * 1000:10.2f} ms p50")
+    print(f"{percentile(latencies, 0.99) * 1000:10.2f} ms p99")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+bench_suite.py
+
+The benchmark suite: shape generation throughput, SvgCanvas.add tree building, serialization latency against shape count,
+peak memory, HtmlDocument.output() file write time and command line startup (launch to first byte of output). Run it from the repository root:
+
+    python benchmarks/bench_suite.py                                # print the results
+    python benchmarks/bench_suite.py --output results.json          # also save them as JSON
+    python benchmarks/bench_suite.py --baseline baseline.json       # compare against saved results
+
+Every result is a Dict of named numbers. Metrics ending in "_seconds" or "_bytes" are lower-is-better, and are the ones compared
+against a baseline. The comparison exits with status 1 if any of them got worse by more than --tolerance.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+_REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPOSITORY)
+
+from html_f import HtmlComponent, HtmlDocument, SvgCanvas, Size
+from s_gen import PyArtConfig, RandomShape, generate_shapes, np
+
+
+def _shape_counts(max_count: int) -> list:
+    '''1e2, 1e3, ... up to max_count'''
+    counts = []
+    count = 100
+    while count <= max_count:
+        counts.append(count)
+        count *= 10
+    return counts
+
+def _components(count: int, seed: int = 0) -> list:
+    '''count random shapes as HtmlComponents, generated the per-object way'''
+    config = PyArtConfig()
+    rand = random.Random(seed)
+    return [RandomShape(config, rand).as_html_component() for _ in range(count)]
+
+def _tree(components: list) -> HtmlComponent:
+    '''an <html> tree with one SvgCanvas holding components'''
+    root = HtmlComponent(tag="html")
+    body = root.add(HtmlComponent(tag="body"))
+    canvas = body.add(SvgCanvas(Size(500, 300)))
+    for component in components:
+        canvas.add(component)
+    return root
+
+def _best_of(repeat: int, function) -> float:
+    '''the fastest of repeat calls to function, in seconds'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# Benchmarks
+# each one takes the parsed arguments and returns {result name: {metric: number}}
+
+def bench_generation(args) -> dict:
+    results = {}
+    config = PyArtConfig()
+    count = min(args.max_count, 100000)
+
+    elapsed = _best_of(args.repeat, lambda: [RandomShape(config) for _ in range(count)])
+    results[f"generation.random_shape[n={count}]"] = {"total_seconds": elapsed, "shapes_per_second": count / elapsed}
+
+    if np is not None:
+        count = args.max_count
+        elapsed = _best_of(args.repeat, lambda: generate_shapes(config, count, seed=0))
+        results[f"generation.generate_shapes[n={count}]"] = {"total_seconds": elapsed, "shapes_per_second": count / elapsed}
+
+    return results
+
+def bench_tree_building(args) -> dict:
+    count = min(args.max_count, 100000)
+    components = _components(count)
+
+    def build():
+        canvas = SvgCanvas(Size(500, 300))
+        for component in components:
+            canvas.add(component)
+
+    elapsed = _best_of(args.repeat, build)
+    return {f"tree.svg_canvas_add[n={count}]": {"total_seconds": elapsed, "adds_per_second": count / elapsed}}
+
+def bench_serialization(args) -> dict:
+    results = {}
+    for count in _shape_counts(args.max_count):
+        root = _tree(_components(count))
+        # iter_chunks() never fills the render cache, so every repeat serializes the whole tree
+        elapsed = _best_of(args.repeat, lambda: "".join(root.iter_chunks()))
+        results[f"serialize[n={count}]"] = {"total_seconds": elapsed, "per_shape_seconds": elapsed / count}
+    return results
+
+def bench_peak_memory(args) -> dict:
+    count = min(args.max_count, 100000)
+
+    results = {}
+    for name, render in (("string", lambda root: root.string()), ("stream", lambda root: sum(len(chunk) for chunk in root.iter_chunks()))):
+        # fresh components every time, so nothing is left in their render cache from the previous run
+        components = _components(count)
+        tracemalloc.start()
+        root = _tree(components)
+        render(root)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del root, components
+        results[f"memory.{name}[n={count}]"] = {"peak_bytes": peak, "per_shape_bytes": peak / count}
+    return results
+
+def bench_file_write(args) -> dict:
+    count = min(args.max_count, 100000)
+    components = _components(count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        def write():
+            doc = HtmlDocument(os.path.join(directory, "bench"))
+            canvas = doc.body.add(SvgCanvas(Size(500, 300)))
+            for component in components:
+                canvas.add(component)
+            start = time.perf_counter()
+            doc.output()
+            doc._close_file()
+            return time.perf_counter() - start
+
+        elapsed = min(write() for _ in range(args.repeat))
+        size = os.path.getsize(os.path.join(directory, "bench.html"))
+
+    return {f"file_write[n={count}]": {"total_seconds": elapsed, "file_bytes": size, "bytes_per_second": size / elapsed}}
+
+def _launch(command: list) -> tuple:
+    '''runs command in a new process, returning (seconds until the first byte of it's output, seconds until it exits)'''
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, cwd=_REPOSITORY)
+    process.stdout.read(1)
+    first_byte = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return first_byte, time.perf_counter() - start
+
+def bench_startup(args) -> dict:
+    count = min(args.max_count, 1000)
+    # the interpreter on it's own, so the command line's own startup cost can be told apart from python's
+    interpreter = min(_launch([sys.executable, "-c", "print()"])[0] for _ in range(args.repeat))
+    runs = [_launch([sys.executable, "-m", "htmlshapeart", "generate", "--count", str(count), "--seed", "0", "-o", "-"]) for _ in range(args.repeat)]
+    first_byte = min(run[0] for run in runs)
+    return {f"startup.cli_generate[n={count}]": {
+        "first_byte_seconds": first_byte,
+        "total_seconds": min(run[1] for run in runs),
+        "interpreter_seconds": interpreter,
+        "over_interpreter_seconds": first_byte - interpreter,
+    }}
+
+BENCHMARKS = {
+    "generation": bench_generation,
+    "tree": bench_tree_building,
+    "serialize": bench_serialization,
+    "memory": bench_peak_memory,
+    "file_write": bench_file_write,
+    "startup": bench_startup,
+}
+
+
+# Reporting
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """
+    Prints every lower-is-better metric next to it's baseline value
+
+    Args:
+        results (dict): This run's results
+        baseline (dict): The saved results to compare against
+        tolerance (float): How much worse (as a fraction) a metric can get before it counts as a regression
+
+    Returns:
+        bool: True if nothing regressed
+    """
+    ok = True
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            if not metric.endswith(("_seconds", "_bytes")):
+                continue
+            before = baseline.get(name, {}).get(metric)
+            if not before:
+                print(f"{name:45} {metric:20} {value:14.6g}  (no baseline)")
+                continue
+            ratio = value / before
+            regressed = ratio > 1 + tolerance
+            ok = ok and not regressed
+            print(f"{name:45} {metric:20} {value:14.6g}  {ratio:6.2f}x baseline{'  REGRESSION' if regressed else ''}")
+    return ok
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Runs the htmlshapeart benchmark suite")
+    parser.add_argument("--max-count", type=int, default=100000, help="largest shape count (serialization runs 1e2 up to this, default 100000)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing, the fastest is reported (default 3)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="only run these benchmarks")
+    parser.add_argument("--output", metavar="FILE", help="write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare against results saved with --output")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before a metric counts as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results.update(BENCHMARKS[name](args))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "numpy": np.__version__ if np is not None else None,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "max_count": args.max_count,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+        return 0 if compare(results, baseline, args.tolerance) else 1
+
+    for name, metrics in results.items():
+        print(f"{name:45} " + "  ".join(f"{metric}={value:.6g}" for metric, value in metrics.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
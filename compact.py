@@ -0,0 +1,360 @@
+"""
+compact.py
+
+Compact output: the same tree rendered with as few bytes as possible, looking exactly the same in a browser.
+
+    - no indentation. Inside <svg> and <g> there is no whitespace between elements at all (SVG doesn't render it),
+      elsewhere a single newline is kept wherever the normal output has whitespace, so text still flows the same way
+    - colours as short hex (#f00 rather than rgb(255, 0, 0)), numbers trimmed (1 rather than 1.0, .5 rather than 0.5)
+    - fill-opacity left out where it is 1 (the default) and no ancestor sets one, shapes closed with /> rather than a closing tag
+      (only fill-opacity attributes, and style attributes that mention it, count: not stylesheets)
+    - comments left out
+    - optionally, shapes that share a fill and fill-opacity are grouped:
+        group="g": runs of consecutive shapes with the same fill are wrapped in <g fill="..">, which they inherit it from
+        group="css": every fill used more than once becomes a CSS class (in a <style> in the first <svg>), and shapes use class=".."
+          Note that classes are document wide, so pick a class_prefix that no other stylesheet on the page uses.
+
+Only shapes without extra attributes (besides an id) are grouped, anything styled by it's own attributes is left as it is.
+ShapeStream shapes are grouped by "g" but not by "css", as the stream can only be pulled once.
+Subclasses with their own iter_chunks() (or their own _get_attribute_string()) that this module doesn't know about are output
+the normal way.
+
+Usage:
+    html = doc.root.string(compact=True)
+    doc.output(compact=Compact(group="g"))
+    print(compare_sizes(doc.root, Compact(group="css")))
+
+Types / Tuples:
+    Compact: The compact output options (group, class_prefix)
+    SizeReport: The sizes of the normal and compact output (normal_bytes, compact_bytes, saved_bytes)
+Classes:
+    CompactRenderer: Renders an HtmlComponent tree compactly
+Functions:
+    compare_sizes(element, compact=True) -> SizeReport: Measures how many bytes compact output saves
+"""
+
+from collections import namedtuple, Counter
+from typing import Iterator
+
+from html_f import (HtmlComponent, Comment, Raw, CircleShape, RectangleShape, EllipseShape, ShapeTable, ShapeStream,
+                    SvgCanvas, SvgText, rgb, _as_value, _plain)
+
+Compact = namedtuple("Compact", ["group", "class_prefix"])
+Compact.__new__.__defaults__ = (None, "f") # group (None, "g" or "css"), class_prefix
+
+SizeReport = namedtuple("SizeReport", ["normal_bytes", "compact_bytes", "saved_bytes"])
+
+_SVG_CONTAINERS = frozenset(("svg", "g", "defs")) # elements whose whitespace between children is never rendered
+_SHAPES = (CircleShape, RectangleShape, EllipseShape)
+
+
+# Formatting
+
+def _number(value) -> str:
+    '''a number with as few characters as possible: 1.0 -> 1, 0.5 -> .5'''
+    value = _as_value(value)
+    if isinstance(value, float):
+        if value.is_integer():
+            return str(int(value))
+        text = repr(value)
+        if text.startswith("0."):
+            return text[1:]
+        if text.startswith("-0."):
+            return "-" + text[2:]
+        return text
+    return str(value)
+
+def _color(color) -> str:
+    '''an rgb as short hex where possible (#f00), otherwise 6 digit hex (or rgb() if it isn't 3 bytes)'''
+    red, green, blue = [_as_value(value) for value in color]
+    if not all(isinstance(value, int) and 0 <= value <= 255 for value in (red, green, blue)):
+        return f"rgb({_number(red)},{_number(green)},{_number(blue)})"
+    if red % 17 == 0 and green % 17 == 0 and blue % 17 == 0:
+        return f"#{red // 17:x}{green // 17:x}{blue // 17:x}"
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+def _value(value) -> str:
+    '''an attribute value, compacted if it is a colour or number'''
+    if isinstance(value, rgb):
+        return _color(value)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return _number(value)
+    return f"{value}"
+
+def _attribute_string(attributes: dict) -> str:
+    return "".join([f" {key}=\"{_value(value)}\"" for key, value in attributes.items()])
+
+def _fill_key(fill, fill_opacity, inherited: bool = False) -> tuple:
+    '''
+    the (fill, fill-opacity) key shapes are grouped by, as compact strings. fill-opacity is None where it is the default,
+    unless inherited (an ancestor sets a fill-opacity, which the shape would get instead)
+    '''
+    opacity = _number(fill_opacity)
+    return (_color(fill), None if opacity == "1" and not inherited else opacity)
+
+def _sets_fill_opacity(element: HtmlComponent) -> bool:
+    '''whether an element sets a fill-opacity that it's children inherit'''
+    attributes = element._attributes
+    return bool(attributes) and ("fill-opacity" in attributes or "fill-opacity" in f"{attributes.get('style', '')}")
+
+def _fill_attributes(key: tuple) -> str:
+    fill, opacity = key
+    if opacity is None:
+        return f' fill="{fill}"'
+    return f' fill="{fill}" fill-opacity="{opacity}"'
+
+
+class CompactRenderer:
+    """
+    Renders an HtmlComponent tree compactly (see the module docstring for what that means)
+
+    Instance Variables:
+        group (str): None, "g" or "css"
+        class_prefix (str): The start of every CSS class name when grouping with "css"
+
+    Methods:
+        iter_chunks(self, element) -> Iterator[str]: Yields the compact HTML of element as fragments
+    """
+
+    def __init__(self, compact: Compact = None):
+        """
+        Args:
+            compact (Compact, optional): The options. Defaults to Compact() (no grouping).
+
+        Raises:
+            ValueError: If group isn't None, "g" or "css"
+        """
+        if compact is None or compact is True:
+            compact = Compact()
+        if compact.group not in (None, "g", "css"):
+            raise ValueError(f"unknown compact group: {compact.group!r} (use None, \"g\" or \"css\")")
+        self.group = compact.group
+        self.class_prefix = compact.class_prefix
+        self._classes = {} # fill key -> CSS class, when grouping with "css"
+        self._style_written = False
+        self._inherited = 0 # how many ancestors of the element being rendered set a fill-opacity
+
+    # Shapes as units
+    # every shape becomes a (key, start) unit: key is it's fill key (or None if it can't be grouped, in which case start is
+    # complete HTML) and start is the element up to where it's fill and closing /> go
+
+    def _shape_unit(self, shape: HtmlComponent) -> tuple:
+        x, y = shape.position
+        if isinstance(shape, CircleShape):
+            start = f'<circle cx="{_number(x)}" cy="{_number(y)}" r="{_number(shape.radius)}"'
+            own = ("cx", "cy", "r")
+        elif isinstance(shape, RectangleShape):
+            start = f'<rect x="{_number(x)}" y="{_number(y)}" width="{_number(shape.width)}" height="{_number(shape.height)}"'
+            own = ("x", "y", "width", "height")
+        else:
+            start = f'<ellipse cx="{_number(x)}" cy="{_number(y)}" rx="{_number(shape.rx)}" ry="{_number(shape.ry)}"'
+            own = ("cx", "cy", "rx", "ry")
+
+        key = _fill_key(shape.fill, shape.fill_opacity, self._inherited > 0)
+        if shape._attributes:
+            # the shape's own values win over matching keys in the attributes Dict, the same as the normal output
+            start += _attribute_string({name: value for name, value in shape._attributes.items()
+                                        if name not in own and name not in ("fill", "fill-opacity")})
+        if not _plain(shape):
+            return None, start + _fill_attributes(key) + "/>"
+        return key, start
+
+    def _row_unit(self, row: tuple) -> tuple:
+        sha, x, y, rad, rx, ry, w, h, red, green, blue, opacity = row
+        if sha == ShapeTable.CIRCLE:
+            start = f'<circle cx="{_number(x)}" cy="{_number(y)}" r="{_number(rad)}"'
+        elif sha == ShapeTable.RECTANGLE:
+            start = f'<rect x="{_number(x)}" y="{_number(y)}" width="{_number(w)}" height="{_number(h)}"'
+        elif sha == ShapeTable.ELLIPSE:
+            start = f'<ellipse cx="{_number(x)}" cy="{_number(y)}" rx="{_number(rx)}" ry="{_number(ry)}"'
+        else:
+            raise ValueError(f"Incorrect SHA: {sha}")
+        return _fill_key((red, green, blue), opacity, self._inherited > 0), start
+
+    def _units(self, element: HtmlComponent) -> Iterator[tuple]:
+        '''the units of a child of an svg container, a ShapeTable or ShapeStream giving one per shape'''
+        if isinstance(element, _SHAPES):
+            yield self._shape_unit(element)
+        elif isinstance(element, ShapeTable):
+            for row in element.rows():
+                yield self._row_unit(row)
+        elif isinstance(element, ShapeStream):
+            for component in element.components():
+                yield from self._units(component)
+        elif not isinstance(element, Comment):
+            yield None, "".join(self.iter_chunks(element, _root=False))
+
+    def _svg_children(self, children: list) -> Iterator[str]:
+        '''the children of an svg container, shapes grouped as asked for'''
+        units = (unit for element in children for unit in self._units(element))
+
+        if self.group != "g":
+            classes = self._classes
+            for key, start in units:
+                if key is None:
+                    yield start
+                elif key in classes:
+                    yield start + f' class="{classes[key]}"/>'
+                else:
+                    yield start + _fill_attributes(key) + "/>"
+            return
+
+        # runs of 2 or more shapes with the same key go in a <g>. The first shape of a run waits until the next one shows if it is a run
+        run_key = None
+        waiting = None # the start of the first shape of the current run, if it is still alone
+        for key, start in units:
+            if key is not None and key == run_key:
+                if waiting is not None:
+                    yield f"<g{_fill_attributes(key)}>" + waiting + "/>"
+                    waiting = None
+                yield start + "/>"
+                continue
+
+            # the current run is over
+            if waiting is not None:
+                yield waiting + _fill_attributes(run_key) + "/>"
+            elif run_key is not None:
+                yield "</g>"
+            waiting = None
+            run_key = key
+            if key is None:
+                yield start
+            else:
+                waiting = start
+
+        if waiting is not None:
+            yield waiting + _fill_attributes(run_key) + "/>"
+        elif run_key is not None:
+            yield "</g>"
+
+    # CSS classes
+    def _assign_classes(self, root: HtmlComponent) -> None:
+        '''counts the fills in the tree, and gives every fill used more than once a class (the most used get the shortest names)'''
+        counts = Counter()
+        has_svg = False
+        stack = [(root, self._inherited > 0)] # (element, whether an ancestor sets a fill-opacity)
+        while stack:
+            element, inherited = stack.pop()
+            if isinstance(element, _SHAPES):
+                if _plain(element):
+                    counts[_fill_key(element.fill, element.fill_opacity, inherited)] += 1
+            elif isinstance(element, ShapeTable):
+                for row in element.rows():
+                    counts[_fill_key(row[8:11], row[11], inherited)] += 1
+            elif isinstance(element, HtmlComponent) and not isinstance(element, ShapeStream):
+                has_svg = has_svg or element.tag == "svg"
+                inherited = inherited or _sets_fill_opacity(element)
+                stack.extend((child, inherited) for child in element._children or ())
+
+        if not has_svg:
+            return # nowhere to put the <style>
+        for number, (key, count) in enumerate(counts.most_common()):
+            if count < 2:
+                break
+            self._classes[key] = f"{self.class_prefix}{number:x}"
+
+    def _style(self) -> str:
+        '''the <style> with every class, written once, in the first <svg>'''
+        self._style_written = True
+        rules = []
+        for (fill, opacity), name in self._classes.items():
+            rule = f".{name}{{fill:{fill}" + (f";fill-opacity:{opacity}" if opacity is not None else "") + "}"
+            rules.append(rule)
+        return "<style>" + "".join(rules) + "</style>"
+
+    # Elements
+    def _attributes(self, element: HtmlComponent) -> str:
+        '''the compact attribute string of an element that uses the standard layout'''
+        own = None
+        if isinstance(element, SvgCanvas):
+            own = {"width": element.size.width, "height": element.size.height}
+        elif isinstance(element, SvgText):
+            own = {"x": element.x, "y": element.y}
+        elif type(element)._get_attribute_string is not HtmlComponent._get_attribute_string:
+            return element._get_attribute_string() # a subclass this module doesn't know about
+        attributes = element._attributes or {}
+        if own:
+            attributes = {**attributes, **own}
+        return _attribute_string(attributes)
+
+    def iter_chunks(self, element: HtmlComponent, _root: bool = True) -> Iterator[str]:
+        """
+        Yields the compact HTML of element and it's children as fragments
+
+        Args:
+            element (HtmlComponent): The element
+
+        Yields:
+            str: The next fragment
+        """
+        if _root:
+            # the element may be inside a tree, what it's ancestors set still applies to it
+            self._inherited = 0
+            ancestor = element.parent
+            while ancestor is not None:
+                self._inherited += _sets_fill_opacity(ancestor)
+                ancestor = ancestor.parent
+        if _root and self.group == "css":
+            self._classes.clear()
+            self._style_written = False
+            self._assign_classes(element)
+
+        if isinstance(element, Comment):
+            return
+        if isinstance(element, Raw):
+            yield element.text
+            return
+        if isinstance(element, (ShapeTable, ShapeStream)) or isinstance(element, _SHAPES):
+            yield from self._svg_children([element])
+            return
+        if type(element).iter_chunks is not HtmlComponent.iter_chunks:
+            yield from element.iter_chunks() # a subclass this module doesn't know about
+            return
+
+        yield f"<{element.tag}{self._attributes(element)}>"
+        if not element._paired:
+            return
+
+        # whitespace around the content is kept as a single newline (it can matter to how text flows), except where SVG ignores it
+        in_svg = element.tag in _SVG_CONTAINERS
+        newline = "" if in_svg else "\n"
+        for content in element.get_content():
+            if element.indented_content == True:
+                yield newline
+            yield f"{content}"
+
+        sets_opacity = _sets_fill_opacity(element)
+        self._inherited += sets_opacity
+        try:
+            if in_svg:
+                if self._classes and not self._style_written and element.tag == "svg":
+                    yield self._style()
+                yield from self._svg_children(element._children or ())
+            else:
+                for child in element._children or ():
+                    if isinstance(child, Comment):
+                        continue
+                    yield "\n"
+                    yield from self.iter_chunks(child, _root=False)
+        finally:
+            self._inherited -= sets_opacity
+
+        if element.indented_content == True:
+            yield newline
+        yield f"</{element.tag}>"
+
+
+def compare_sizes(element: HtmlComponent, compact: Compact = True) -> SizeReport:
+    """
+    Measures the normal and compact output of element (as UTF-8), without keeping either
+
+    Args:
+        element (HtmlComponent): The element
+        compact (Compact, optional): The compact options. Defaults to True (Compact()).
+
+    Returns:
+        SizeReport: The sizes in bytes, and how many the compact output saves
+    """
+    normal = sum(len(chunk.encode("utf-8")) for chunk in element.iter_chunks())
+    small = sum(len(chunk.encode("utf-8")) for chunk in CompactRenderer(compact).iter_chunks(element))
+    return SizeReport(normal, small, normal - small)
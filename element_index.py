@@ -0,0 +1,462 @@
+"""
+element_index.py
+
+Indexes over a tree of HtmlComponents by tag, id and attribute value, for finding elements ("every <text>", "the shape
+with id sun", "every shape filled rgb(255, 0, 0)") without walking the whole tree, plus simple CSS-like selectors on top.
+
+Tags and ids are indexed for every element. Any other attribute is indexed the first time it is looked up (one pass over
+the tree), and kept from then on. Attribute values are compared as they are written in the HTML, so fill=rgb(255, 0, 0)
+finds the shapes with fill="rgb(255, 0, 0)". Results are in the order the elements were indexed: document order for a
+tree built with add() / extend(), but an element inserted before others, or whose looked up value changed, comes later.
+
+Usually used through HtmlComponent.find_by_id() / find_all() / select(), which build the index of an element's subtree on
+first use, and keep it up to date as elements are added, removed or changed (see HtmlComponent.element_index).
+The shapes inside a ShapeTable or ShapeStream are not separate elements, so they are not indexed.
+
+Selectors:
+    tag, *, #id, .class, [attribute], [attribute=value] (value optionally "quoted"), combined like circle.big[fill="red"]
+    "a b" for b anywhere below a, "a > b" for b directly below a, and "a, b" for either
+
+Usage:
+    sun = doc.find_by_id("sun")
+    labels = doc.find_all(tag="text")
+    reds = canvas.find_all(attr={"fill": rgb(255, 0, 0)})
+    big = doc.select("svg > circle.big, svg > rect[fill-opacity='1.0']")
+
+Classes:
+    ElementIndex: The indexes over one element and everything below it
+Functions:
+    parse_selector(selector) -> list: A selector as a list of alternatives, each a list of (combinator, compound) steps
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+_MISSING = object()
+
+_SELECTOR_TOKEN = re.compile(r"""
+    \s*(?P<combinator>[>,])\s*
+  | (?P<space>\s+)
+  | (?P<tag>\*|[A-Za-z][\w-]*)
+  | \#(?P<id>[\w-]+)
+  | \.(?P<class>[\w-]+)
+  | \[\s*(?P<name>[\w:-]+)\s*(?:=\s*(?:"(?P<double>[^"]*)"|'(?P<single>[^']*)'|(?P<bare>[^\]\s]+))\s*)?\]
+""", re.VERBOSE)
+
+
+class _Compound:
+    '''one compound selector, like circle#sun.big[fill]: everything it says about a single element'''
+    __slots__ = ("tag", "id", "classes", "attributes")
+
+    def __init__(self):
+        self.tag = None
+        self.id = None
+        self.classes = []
+        self.attributes = [] # (name, value as a str, or None for just having the attribute)
+
+    def matches(self, element) -> bool:
+        if self.tag is not None and element.tag != self.tag:
+            return False
+        if self.id is None and not self.classes and not self.attributes:
+            return True
+        attributes = element.get_attributes()
+        if self.id is not None and f"{attributes.get('id', '')}" != self.id:
+            return False
+        if self.classes:
+            classes = f"{attributes.get('class', '')}".split()
+            if any(name not in classes for name in self.classes):
+                return False
+        for name, value in self.attributes:
+            if name not in attributes or (value is not None and f"{attributes[name]}" != value):
+                return False
+        return True
+
+
+def parse_selector(selector: str) -> list:
+    """
+    Parses a selector (see the module docstring for what is supported)
+
+    Args:
+        selector (str): The selector
+
+    Raises:
+        ValueError: If the selector is empty or uses anything that isn't supported
+
+    Returns:
+        list: The alternatives (split on ","), each a list of (combinator, _Compound) steps from left to right,
+            where the combinator (" " or ">") says how the step relates to the one before (None for the first)
+    """
+    alternatives = []
+    steps = []
+    combinator = None
+    compound = None
+    position = 0
+    text = selector.strip()
+    while position < len(text):
+        match = _SELECTOR_TOKEN.match(text, position)
+        if match is None:
+            raise ValueError(f"unsupported selector {selector!r} (at {text[position:position + 10]!r})")
+        position = match.end()
+        kind = match.lastgroup if match.lastgroup not in ("double", "single", "bare") else "name"
+
+        if kind in ("combinator", "space"):
+            if compound is None and (kind == "space" or match.group("combinator") == ">"):
+                raise ValueError(f"unsupported selector {selector!r} (nothing before {match.group(0).strip() or 'a space'!r})")
+            if compound is not None:
+                steps.append((combinator, compound))
+                compound = None
+            if kind == "combinator" and match.group("combinator") == ",":
+                if not steps:
+                    raise ValueError(f"unsupported selector {selector!r} (empty alternative)")
+                alternatives.append(steps)
+                steps = []
+                combinator = None
+            else:
+                combinator = ">" if kind == "combinator" else " "
+            continue
+
+        if compound is None:
+            compound = _Compound()
+        if kind == "tag":
+            if compound.tag is not None or compound.id is not None or compound.classes or compound.attributes:
+                raise ValueError(f"unsupported selector {selector!r} (the tag has to come first)")
+            compound.tag = None if match.group("tag") == "*" else match.group("tag")
+        elif kind == "id":
+            compound.id = match.group("id")
+        elif kind == "class":
+            compound.classes.append(match.group("class"))
+        else:
+            value = match.group("double")
+            if value is None:
+                value = match.group("single")
+            if value is None:
+                value = match.group("bare")
+            compound.attributes.append((match.group("name"), value))
+
+    if compound is None:
+        raise ValueError(f"unsupported selector {selector!r} (it ends without an element)")
+    steps.append((combinator, compound))
+    alternatives.append(steps)
+    return alternatives
+
+def _matches_steps(element, steps: list, last: int) -> bool:
+    '''whether the elements above element match steps[:last + 1], given element matches steps[last + 1] (right to left, like a browser)'''
+    if last < 0:
+        return True
+    combinator = steps[last + 1][0]
+    compound = steps[last][1]
+    ancestor = element.parent
+    while ancestor is not None:
+        if compound.matches(ancestor) and _matches_steps(ancestor, steps, last - 1):
+            return True
+        if combinator == ">":
+            return False
+        ancestor = ancestor.parent
+    return False
+
+
+class ElementIndex:
+    """
+    Indexes by tag, id and attribute value over an element and everything below it
+
+    Instance Variables:
+        root (HtmlComponent): The element the index is over
+
+    Methods:
+        add_tree(self, element) -> None: Indexes an element and everything below it
+        remove_tree(self, element) -> None: Takes an element and everything below it out
+        update(self, element) -> None: Re-indexes an element after it's tag or attributes changed
+        rebuild(self) -> None: Indexes the whole tree again (after changing a children list directly)
+        find_by_id(self, id) -> HtmlComponent: The first element with an id
+        find_all(self, tag=None, attr=None) -> list: The elements with a tag and / or attribute values
+        select(self, selector) -> list: The elements a selector matches
+        select_one(self, selector) -> HtmlComponent: The first element a selector matches
+    """
+
+    __slots__ = ("root", "_tags", "_elements", "_ids", "_id_of", "_attributes", "_values")
+
+    def __init__(self, root):
+        """
+        Args:
+            root (HtmlComponent): The element to index, with everything below it
+        """
+        self.root = root
+        self._tags = {} # tag -> {element: None}, a dict as an insertion ordered set
+        self._elements = {} # element -> it's tag when indexed (every indexed element is in here)
+        self._ids = {} # id -> {element: None}
+        self._id_of = {} # element -> it's id when indexed, for elements with one
+        self._attributes = {} # attribute name -> value -> {element: None}, for the attributes looked up so far
+        self._values = {} # attribute name -> element -> the keys it is listed under
+        self.add_tree(root)
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def __contains__(self, element) -> bool:
+        return element in self._elements
+
+    # Updating
+    def _keys(self, name: str, value: Any) -> tuple:
+        '''the keys an attribute value is listed under: it's text, or each class name for the class attribute'''
+        if name == "class":
+            return tuple(f"{value}".split())
+        return (f"{value}",)
+
+    def _add_values(self, name: str, element, value: Any) -> None:
+        keys = self._keys(name, value)
+        buckets = self._attributes[name]
+        for key in keys:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {}
+            bucket[element] = None
+        self._values[name][element] = keys
+
+    def _remove_values(self, name: str, element) -> None:
+        keys = self._values[name].pop(element, None)
+        if keys is None:
+            return
+        buckets = self._attributes[name]
+        for key in keys:
+            bucket = buckets[key]
+            del bucket[element]
+            if not bucket:
+                del buckets[key]
+
+    def _add(self, element) -> None:
+        '''indexes one element'''
+        tag = element.tag
+        self._elements[element] = tag
+        bucket = self._tags.get(tag)
+        if bucket is None:
+            bucket = self._tags[tag] = {}
+        bucket[element] = None
+
+        # ids only ever come from the attributes Dict, so there's no need to build every attribute for them
+        own = element._attributes
+        if own:
+            element_id = own.get("id")
+            if element_id is not None:
+                self._set_id(element, f"{element_id}")
+        if self._attributes:
+            attributes = element.get_attributes()
+            for name in self._attributes:
+                if name in attributes:
+                    self._add_values(name, element, attributes[name])
+
+    def _set_id(self, element, element_id: str) -> None:
+        self._id_of[element] = element_id
+        bucket = self._ids.get(element_id)
+        if bucket is None:
+            bucket = self._ids[element_id] = {}
+        bucket[element] = None
+
+    def _remove_id(self, element) -> None:
+        element_id = self._id_of.pop(element, None)
+        if element_id is not None:
+            bucket = self._ids[element_id]
+            del bucket[element]
+            if not bucket:
+                del self._ids[element_id]
+
+    def _remove(self, element) -> None:
+        '''takes one element out'''
+        tag = self._elements.pop(element, _MISSING)
+        if tag is _MISSING:
+            return
+        bucket = self._tags[tag]
+        del bucket[element]
+        if not bucket:
+            del self._tags[tag]
+        self._remove_id(element)
+        for name in self._attributes:
+            self._remove_values(name, element)
+
+    def add_tree(self, element) -> None:
+        """
+        Indexes an element and everything below it
+
+        Args:
+            element (HtmlComponent): The element
+        """
+        stack = [element]
+        while stack:
+            element = stack.pop()
+            if element not in self._elements:
+                self._add(element)
+            children = element._children
+            if children:
+                # reversed, so the elements are indexed in document order
+                stack.extend(reversed(children))
+
+    def remove_tree(self, element) -> None:
+        """
+        Takes an element and everything below it out of the index
+
+        Args:
+            element (HtmlComponent): The element
+        """
+        stack = [element]
+        while stack:
+            element = stack.pop()
+            self._remove(element)
+            if element._children:
+                stack.extend(element._children)
+
+    def update(self, element) -> None:
+        """
+        Re-indexes an element after it's tag or attributes changed. Only the values that changed are touched,
+        so the element keeps it's place in the order of everything else. Does nothing if the element isn't indexed.
+
+        Args:
+            element (HtmlComponent): The element
+        """
+        tag = self._elements.get(element, _MISSING)
+        if tag is _MISSING:
+            return
+        if element.tag != tag:
+            bucket = self._tags[tag]
+            del bucket[element]
+            if not bucket:
+                del self._tags[tag]
+            self._elements[element] = element.tag
+            bucket = self._tags.get(element.tag)
+            if bucket is None:
+                bucket = self._tags[element.tag] = {}
+            bucket[element] = None
+
+        own = element._attributes
+        element_id = own.get("id") if own else None
+        element_id = None if element_id is None else f"{element_id}"
+        if self._id_of.get(element) != element_id:
+            self._remove_id(element)
+            if element_id is not None:
+                self._set_id(element, element_id)
+
+        if self._attributes:
+            attributes = element.get_attributes()
+            for name in self._attributes:
+                keys = self._keys(name, attributes[name]) if name in attributes else None
+                if self._values[name].get(element) != keys:
+                    self._remove_values(name, element)
+                    if keys is not None:
+                        self._add_values(name, element, attributes[name])
+
+    def rebuild(self) -> None:
+        """Indexes the whole tree again. Only needed after changing a children list directly, rather than with add() / remove()"""
+        names = list(self._attributes)
+        self._tags.clear()
+        self._elements.clear()
+        self._ids.clear()
+        self._id_of.clear()
+        self._attributes.clear()
+        self._values.clear()
+        self.add_tree(self.root)
+        for name in names:
+            self._attribute_index(name)
+
+    def _attribute_index(self, name: str) -> Dict[str, dict]:
+        '''value -> elements for an attribute, built with one pass over the indexed elements the first time it is asked for'''
+        buckets = self._attributes.get(name)
+        if buckets is None:
+            buckets = self._attributes[name] = {}
+            self._values[name] = {}
+            for element in self._elements:
+                attributes = element.get_attributes()
+                if name in attributes:
+                    self._add_values(name, element, attributes[name])
+        return buckets
+
+    # Looking up
+    def find_by_id(self, id: str):
+        """
+        Returns the first element with an id
+
+        Args:
+            id (str): The id
+
+        Returns:
+            HtmlComponent: The element, or None if there isn't one
+        """
+        bucket = self._ids.get(f"{id}")
+        return next(iter(bucket)) if bucket else None
+
+    def find_all(self, tag: str = None, attr: Dict[str, Any] = None) -> list:
+        """
+        Returns the elements with a tag and / or attribute values
+
+        Args:
+            tag (str, optional): The tag. Defaults to None (any tag).
+            attr (Dict[str, Any], optional): Attribute values the elements must all have, compared as they are written in the HTML.
+                A value of None only needs the element to have the attribute. Defaults to None.
+
+        Returns:
+            list: The elements
+        """
+        compound = _Compound()
+        compound.tag = tag
+        for name, value in (attr or {}).items():
+            if name == "id" and value is not None:
+                compound.id = f"{value}"
+            else:
+                compound.attributes.append((name, None if value is None else f"{value}"))
+        return list(self._matching(compound))
+
+    def _candidates(self, compound: _Compound) -> Iterable:
+        '''the smallest indexed set of elements that has everything compound matches (and probably some more)'''
+        if compound.id is not None:
+            return self._ids.get(compound.id, ())
+        for name, value in compound.attributes:
+            if value is not None and name != "class":
+                return self._attribute_index(name).get(value, ())
+        if compound.classes:
+            return self._attribute_index("class").get(compound.classes[0], ())
+        if compound.tag is not None:
+            return self._tags.get(compound.tag, ())
+        for name, _ in compound.attributes:
+            if name != "class":
+                self._attribute_index(name)
+                return self._values[name]
+        return self._elements
+
+    def _matching(self, compound: _Compound) -> Iterable:
+        # listed first, as matching can look up attributes and so build an attribute index (changing the dicts being looked through)
+        return [element for element in list(self._candidates(compound)) if compound.matches(element)]
+
+    def select(self, selector: str) -> list:
+        """
+        Returns the elements a selector matches (see the module docstring for what is supported).
+        Elements above the index's root count when matching, like they do in a browser's querySelectorAll().
+
+        Args:
+            selector (str): The selector
+
+        Raises:
+            ValueError: If the selector isn't supported
+
+        Returns:
+            list: The elements
+        """
+        found = {}
+        for steps in parse_selector(selector):
+            last = len(steps) - 2
+            for element in self._matching(steps[-1][1]):
+                if element not in found and _matches_steps(element, steps, last):
+                    found[element] = None
+        return list(found)
+
+    def select_one(self, selector: str):
+        """
+        Returns the first element a selector matches
+
+        Args:
+            selector (str): The selector
+
+        Raises:
+            ValueError: If the selector isn't supported
+
+        Returns:
+            HtmlComponent: The element, or None if nothing matches
+        """
+        found = self.select(selector)
+        return found[0] if found else None
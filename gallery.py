@@ -0,0 +1,250 @@
+"""
+gallery.py
+
+Batch generation of many independent art pages.
+
+Every page is an HtmlDocument with an SvgCanvas of random shapes made from its own PyArtConfig and seed.
+The pages are built and rendered in a process pool, and the finished HTML is written to disk by a thread pool,
+so writing one page overlaps with rendering the next ones. A page that fails is reported in the result and the
+rest of the batch carries on.
+
+Usage:
+    python gallery.py art_1 art_2 art_3 --count 500 --seed 7 --workers 4
+    python gallery.py --jobs jobs.json --directory out
+
+    jobs.json is a list of {"name": ..., "config": {PyArtConfig keyword: value, ...}, "count": ..., "seed": ...}
+    where everything except name is optional.
+
+Types / Tuples:
+    GalleryPage: One page to generate (name, art_config, count, seed). art_config is a PyArtConfig or a dict of PyArtConfig keywords
+Classes:
+    GalleryResult: What happened to a batch (written pages, failures and throughput)
+Functions:
+    page_config(page) -> PyArtConfig: The PyArtConfig a page is generated with
+    build_page(page) -> HtmlDocument: Builds a page's HtmlDocument
+    render_gallery(pages, ...) -> GalleryResult: Builds, renders and writes a batch of pages
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from random import Random
+from typing import Dict, List, Iterable
+
+from html_f import HtmlDocument, HtmlComponent, SvgCanvas, Comment, Size
+from s_gen import PyArtConfig, RandomShape, iter_random_shapes
+
+GalleryPage = namedtuple("GalleryPage", ["name", "art_config", "count", "seed"])
+GalleryPage.__new__.__defaults__ = (None, 100, None) # art_config (PyArtConfig defaults), count, seed (unseeded)
+
+
+class GalleryResult:
+    """
+    What happened to a batch of pages
+
+    Instance Variables:
+        written (List[str]): The files that were written, in the order they finished
+        failures (Dict[str, str]): The names of the pages that failed, and why
+        seconds (float): How long the whole batch took
+    """
+
+    def __init__(self, written: List[str], failures: Dict[str, str], seconds: float):
+        self.written = written
+        self.failures = failures
+        self.seconds = seconds
+
+    @property
+    def documents_per_second(self) -> float:
+        '''pages written per second'''
+        return len(self.written) / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self) -> str:
+        lines = [f"{len(self.written)} pages written, {len(self.failures)} failed in {self.seconds:.2f}s ({self.documents_per_second:.1f} documents/s)"]
+        lines += [f"    {name}: {error}" for name, error in self.failures.items()]
+        return "\n".join(lines)
+
+
+def page_config(page: GalleryPage) -> PyArtConfig:
+    """
+    Returns the PyArtConfig a page is generated with
+
+    Args:
+        page (GalleryPage): The page
+
+    Raises:
+        TypeError: If the page's art_config is a dict that isn't valid PyArtConfig keywords (or values)
+
+    Returns:
+        PyArtConfig: The page's own art_config, one made from it's dict of PyArtConfig keywords, or the defaults if it has none
+    """
+    if page.art_config is None:
+        return PyArtConfig()
+    if isinstance(page.art_config, dict):
+        return PyArtConfig(**page.art_config)
+    return page.art_config
+
+def build_page(page: GalleryPage, lazy: bool = False) -> HtmlDocument:
+    """
+    Builds the HtmlDocument for a page (without writing it)
+
+    Args:
+        page (GalleryPage): The page
+        lazy (bool, optional): Generate the shapes only while the document is output (see SvgCanvas.add_shapes) instead of now.
+            Lazy and normal pages with the same seed are identical. Defaults to False.
+
+    Raises:
+        TypeError: If the page's art_config is a dict that isn't valid PyArtConfig keywords (see page_config)
+
+    Returns:
+        HtmlDocument: The page's document
+    """
+    art_config = page_config(page)
+
+    doc = HtmlDocument(page.name)
+    doc.head.add(HtmlComponent(tag="title", content=os.path.basename(page.name), indented_content=False))
+    svg = doc.body.add(SvgCanvas(Size(500, 300)))
+    svg.add(Comment("Define SVG drawing box"))
+    if lazy:
+        # a fresh generator every time the page is output, so a seeded page is the same every time
+        svg.add_shapes(lambda: iter_random_shapes(art_config, page.count, Random(page.seed)))
+        return doc
+
+    rand = Random(page.seed)
+    for _ in range(page.count):
+        svg.add(RandomShape(art_config, rand).as_html_component())
+    return doc
+
+def _render_page(page: GalleryPage) -> (str, str):
+    '''runs in a worker process: returns the page's file name and HTML'''
+    doc = build_page(page)
+    # iter_chunks rather than string(), there is no point filling the render cache of a document that is thrown away
+    return doc._doc_name, "".join(doc.root.iter_chunks())
+
+def _write_page(path: str, html: str) -> str:
+    '''runs in a writer thread: writes a rendered page to disk'''
+    with open(path, "w") as file:
+        file.write(html)
+    return path
+
+def render_gallery(pages: Iterable[GalleryPage], workers: int = None, io_threads: int = 4, directory: str = None) -> GalleryResult:
+    """
+    Builds, renders and writes a batch of pages. Rendering happens in a pool of processes and writing in a pool of threads.
+    Pages that fail (in either, or with an art_config that isn't valid) are reported in the result without stopping the others.
+    If the process pool breaks (like a worker being killed), the pages that haven't been rendered yet are all reported as failed.
+
+    Args:
+        pages (Iterable[GalleryPage]): The pages to generate
+        workers (int, optional): The number of rendering processes. Defaults to None (one per CPU).
+        io_threads (int, optional): The number of writing threads. Defaults to 4.
+        directory (str, optional): The directory to write the pages into. Defaults to None (page names are used as they are).
+
+    Raises:
+        ValueError: If two pages would be written to the same file (pages are told apart by name)
+
+    Returns:
+        GalleryResult: The written files, the failures and the throughput
+    """
+    start = time.perf_counter()
+    written = []
+    failures = {}
+
+    pages = list(pages)
+    if directory is not None:
+        pages = [page._replace(name=os.path.join(directory, page.name)) for page in pages]
+    # HtmlDocument adds the .html, so "art" and "art.html" are the same file
+    files = [page.name if page.name.endswith(".html") else page.name + ".html" for page in pages]
+    duplicates = sorted({file for file in files if files.count(file) > 1}) if len(set(files)) < len(files) else []
+    if duplicates:
+        raise ValueError(f"more than one page would be written to {', '.join(duplicates)}")
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers) as renderers, ThreadPoolExecutor(max_workers=io_threads) as writers:
+        # keep a few pages per process in flight, rather than holding every rendered page in memory at once
+        window = 2 * workers
+        queue = iter(pages)
+        rendering = {}
+        writing = {}
+
+        def submit_next() -> None:
+            for page in queue:
+                try:
+                    rendering[renderers.submit(_render_page, page)] = page.name
+                    return
+                except BrokenProcessPool as error:
+                    # a worker died, so nothing else can be rendered. Every page left fails rather than the whole batch
+                    failures[page.name] = f"{type(error).__name__}: {error}"
+
+        for _ in range(window):
+            submit_next()
+
+        while rendering or writing:
+            done, _ = wait(list(rendering) + list(writing), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in rendering:
+                    name = rendering.pop(future)
+                    submit_next()
+                    try:
+                        path, html = future.result()
+                    except Exception as error:
+                        failures[name] = f"{type(error).__name__}: {error}"
+                        continue
+                    writing[writers.submit(_write_page, path, html)] = name
+                else:
+                    name = writing.pop(future)
+                    try:
+                        written.append(future.result())
+                    except Exception as error:
+                        failures[name] = f"{type(error).__name__}: {error}"
+
+    return GalleryResult(written, failures, time.perf_counter() - start)
+
+
+def _pages_from_args(args) -> List[GalleryPage]:
+    '''the pages asked for on the command line'''
+    pages = []
+    for index, name in enumerate(args.names):
+        seed = None if args.seed is None else args.seed + index
+        pages.append(GalleryPage(name, None, args.count, seed))
+
+    if args.jobs is not None:
+        with open(args.jobs) as file:
+            jobs = json.load(file)
+        for job in jobs:
+            # the config is only made into a PyArtConfig when the page is built, so a bad one only fails it's own page
+            pages.append(GalleryPage(job["name"], job.get("config"), job.get("count", args.count), job.get("seed")))
+    return pages
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generates a batch of art pages in parallel")
+    parser.add_argument("names", nargs="*", help="names of the pages to generate with the default PyArtConfig")
+    parser.add_argument("--jobs", metavar="FILE", help="JSON list of pages: {name, config, count, seed}")
+    parser.add_argument("--count", type=int, default=100, help="shapes per page (default 100)")
+    parser.add_argument("--seed", type=int, help="seed of the first named page, the next ones get seed+1, seed+2, ... (default unseeded)")
+    parser.add_argument("--workers", type=int, help="rendering processes (default one per CPU)")
+    parser.add_argument("--threads", type=int, default=4, help="writing threads (default 4)")
+    parser.add_argument("--directory", help="directory to write the pages into")
+    args = parser.parse_args(argv)
+
+    pages = _pages_from_args(args)
+    if not pages:
+        parser.error("no pages given (pass names or --jobs)")
+
+    try:
+        result = render_gallery(pages, workers=args.workers, io_threads=args.threads, directory=args.directory)
+    except ValueError as error:
+        parser.error(str(error))
+    print(result)
+    return 1 if result.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -13,26 +13,43 @@ HTML Component of A4
 Types / Tuples:
     Size: The namedtuple containing the size information for an Svg Canvas
     Position: The namedtuple containing x and y coordinates
+    CullResult: The namedtuple of how many shapes SvgCanvas.cull() removed (removed, off_canvas, covered)
     rgb: The namedtuple representing an rgb value
 Classes:
     HtmlDocument: Essentially the main Html handler. It is in charge of file I/O and generating the content of the file on large.
+    ChildList: The list of an HtmlComponent's children, with constant time removal
     HtmlComponent: The Super Class for Html elements. You could theoretically make any Html e3lement with it as is, but it is designed for use with created subclasses.
+        Elements can be looked up by id, tag, attribute or simple CSS selector with find_by_id(), find_all() and select() (see element_index)
     Raw (HtmlComponent): The HtmlComponent SubClass for raw text. Does not support children.
     Comment (HtmlComponent): The HtmlComponent SubClass for comments. Does not support children.
-    SvgCanvas (HtmlComponent): The HtmlComponent SubClass representation of an svg element
+    SvgCanvas (HtmlComponent): The HtmlComponent SubClass representation of an svg element, with a spatial index over it's shapes
     CircleShape (HtmlComponent) : The HtmlComponent SubClass representation of an svg Circle
+    ShapeTable (HtmlComponent): The HtmlComponent SubClass holding many circles, rectangles and ellipses as columns instead of one object per shape
+    ShapeStream (HtmlComponent): The HtmlComponent SubClass that pulls shapes from an iterable only while being output, instead of storing them
     
 
 Version 1.2
 
 """
 
-from collections import namedtuple
-from typing import Dict
+import os
+import threading
+from collections import namedtuple, deque
+from collections.abc import MutableSequence
+from functools import partial
+from itertools import islice
+from math import floor, ceil
+from operator import add, is_not
+from types import MappingProxyType
+from typing import Dict, Any, Iterable, Mapping
+
+from element_index import ElementIndex
+from spatial_index import ShapeIndex
 
 # Typing Stuff
 
 Size = namedtuple("Size", ["width", "height"])
+CullResult = namedtuple("CullResult", ["removed", "off_canvas", "covered"]) # shape counts from SvgCanvas.cull()
 Position = namedtuple("Position", ["x", "y"])
 
 rgb = namedtuple("rgb", ["red", "green", "blue"]) # lowercase on purpose. Pep8 folk chill out
@@ -41,9 +58,42 @@ def rgb_str(object) -> str:
     return f"rgb({object.red}, {object.green}, {object.blue})"
 rgb.__repr__ = rgb_str
 
+# Interning
+# big canvases repeat the same colours and positions a lot, so shapes share one rgb / Position object per value instead of one each.
+# the caches stop growing at _INTERN_LIMIT values so that canvases of unique values don't pay for a huge cache
+_INTERN_LIMIT = 65536
+_interned = {rgb: {}, Position: {}}
+def _intern(value):
+    '''returns the shared copy of an rgb or Position value (anything else is returned unchanged)'''
+    cache = _interned.get(type(value))
+    if cache is None:
+        return value
+    shared = cache.get(value)
+    if shared is None:
+        if len(cache) < _INTERN_LIMIT:
+            cache[value] = value
+        return value
+    return shared
+
 
 # Classes
 
+_NO_CHILDREN = () # shared placeholder for an HtmlComponent's children until it gets some
+_UNTRACKED = frozenset(("parent", "_children", "_render_cache", "_child_spans", "_spatial_index", "_element_index")) # HtmlComponent instance variables that don't change the element's own HTML
+_SPLICE_MIN_CHILDREN = 128 # elements with at least this many children keep where each child's HTML is in their own, see HtmlComponent.string()
+_SPLICE_MAX_CHANGED = 16 # splicing more changed children than this back in costs about the same as rendering the element again
+_indexing = False # whether any HtmlComponent.element_index has been built. Until one is, changes don't look for indexes to keep up to date
+
+def _element_indexes(element) -> list:
+    '''the ElementIndexes element is in: the ones of element and of everything above it'''
+    indexes = []
+    while element is not None:
+        index = getattr(element, "_element_index", None)
+        if index is not None:
+            indexes.append(index)
+        element = getattr(element, "parent", None)
+    return indexes
+
 class HtmlDocument:
     '''
     An HTML Document Handler
@@ -55,7 +105,12 @@ class HtmlDocument:
 
     Methods:
         gen_art(self) -> None: Generates the circles required for a4 part 1
-        output(self) -> None: writes the HTML to the file
+        output(self, workers=None, compact=None) -> None: writes the HTML to the file (compact=True for compact HTML)
+        aoutput(self, block_size=16384) -> None: (async) writes the HTML to the file without blocking the event loop
+        find_by_id(self, id) -> HtmlComponent: The first element in the document with an id
+        find_all(self, tag=None, attr=None) -> list: The elements in the document with a tag and / or attribute values
+        select(self, selector) -> list: The elements in the document a simple CSS selector matches
+        select_one(self, selector) -> HtmlComponent: The first element select() would return
     '''
 
     def __init__(self, document_name: str = "document") -> None:   
@@ -77,8 +132,8 @@ class HtmlDocument:
         # update root, header, and body
         self._generate_skeleton()
         
-        # open file for writing
-        self._open_file()
+        # the file is opened for writing when something is first written to it (see _open_file), so building a document doesn't touch the disk
+        self._file = None
 
     
     # Document Methods
@@ -105,25 +160,246 @@ class HtmlDocument:
 
         svg.gen_art()
 
+    # Lookup Methods (see HtmlComponent.element_index)
+    def find_by_id(self, id: str) -> "HtmlComponent":
+        '''returns the first element in the document with an id, or None'''
+        return self.root.find_by_id(id)
+
+    def find_all(self, tag: str = None, attr: Dict[str, Any] = None) -> list:
+        '''returns the elements in the document with a tag and / or attribute values (see HtmlComponent.find_all)'''
+        return self.root.find_all(tag, attr)
+
+    def select(self, selector: str) -> list:
+        '''returns the elements in the document a simple CSS selector matches (see HtmlComponent.select)'''
+        return self.root.select(selector)
+
+    def select_one(self, selector: str) -> "HtmlComponent":
+        '''returns the first element in the document a simple CSS selector matches, or None'''
+        return self.root.select_one(selector)
+
 
     # File I/O Methods
-    def output(self) -> None:
-        self._write(content=self.root.string(), end_char="")
+    def output(self, workers: int = None, compact=None) -> None:
+        '''
+        writes the HTML to the file, streaming it fragment by fragment instead of building the whole string first
+
+        Args:
+            workers (int, optional): The number of processes used to render large elements (like a big SvgCanvas). Defaults to None (render in this process only).
+            compact (bool | compact.Compact, optional): Write compact HTML, without indentation and with grouped fills (see the compact module). Defaults to None (normal HTML).
+        '''
+        self.root.write_to(self._open_file(), workers=workers, compact=compact)
+
+    async def aoutput(self, block_size: int = 16384) -> None:
+        '''
+        writes the HTML to the file from a coroutine without blocking the event loop.
+        The HTML is rendered a block at a time on the event loop (see HtmlComponent.aiter_chunks), while opening the file
+        and writing each block happen in the loop's default executor, overlapping with rendering the next block.
+
+        Args:
+            block_size (int, optional): Roughly how many characters are rendered between giving the event loop control back. Defaults to 16384.
+        '''
+        import asyncio # only needed for async output, so not imported with the module
+
+        loop = asyncio.get_running_loop()
+        file = await loop.run_in_executor(None, self._open_file)
+
+        writing = None
+        async for block in self.root.aiter_chunks(block_size=block_size):
+            # wait for the previous block to be written before starting the next, so the blocks stay in order
+            if writing is not None:
+                await writing
+            writing = loop.run_in_executor(None, file.write, block)
+        if writing is not None:
+            await writing
+        await loop.run_in_executor(None, file.flush)
+
     def _write(self, content: str, end_char: str ="\n") -> None:
         '''writes the given content to self._doc_name'''
-        self._file.write(content+end_char)
+        self._open_file().write(content+end_char)
 
-    def _open_file(self) -> None:
-        '''opens the file self._doc_name'''
-        self._file = open(self._doc_name, "w")
+    def _open_file(self):
+        '''opens the file self._doc_name, if it isn't open already, and returns it'''
+        if self._file is None:
+            self._file = open(self._doc_name, "w")
+        return self._file
     
     def _close_file(self) -> None:
         '''closes the file self._doc_name'''
-        self._file.close() # close and write file
+        if self._file is not None:
+            self._file.close() # close and write file
 
     def __del__(self):
         self._close_file()
 
+_REMOVED = object() # what a removed child is replaced with in a ChildList, until the list is next compacted
+_live = partial(is_not, _REMOVED) # whether a ChildList item is a child (runs in C, so skipping removed children costs next to nothing)
+
+class ChildList(MutableSequence):
+    """
+    The children of an HtmlComponent: a list that keeps it's order, but removes any child in constant time.
+
+    A removed child is only replaced by a placeholder, and the placeholders are cleared out in one go the next time the list
+    is iterated over or used by index. Finding a child to remove uses a Dict of where every child is, built by the first
+    remove(). So removing k children of n costs O(k) plus one O(n) pass, instead of O(k*n).
+    Removing children while iterating over the list is safe: a loop skips the children removed ahead of it.
+
+    Supports everything a list does (it is a MutableSequence), with these additions:
+
+    Methods:
+        insert_many(self, index, elements) -> None: Inserts every element before index, in order
+        remove_where(self, predicate) -> list: Removes every child predicate(child) is true for, returning them in order
+    """
+    __slots__ = ("_items", "_positions", "_removed")
+
+    def __init__(self, elements: Iterable = ()):
+        """
+        Args:
+            elements (Iterable, optional): The first children. Defaults to none.
+        """
+        self._items = list(elements)
+        self._positions = None # child -> it's index in _items (the first, if it is in there twice), built by the first remove()
+        self._removed = 0 # how many placeholders are in _items
+
+    def _compact(self) -> None:
+        '''clears out the placeholders, so the indexes in _items are the children's indexes again'''
+        if self._removed:
+            self._items = [element for element in self._items if element is not _REMOVED]
+            self._removed = 0
+            if self._positions is not None:
+                self._positions = self._index_positions()
+
+    def _index_positions(self) -> dict:
+        '''where every child is, counting backwards so children in the list twice get their first index'''
+        items = self._items
+        return {items[index]: index for index in range(len(items) - 1, -1, -1)}
+
+    def __len__(self) -> int:
+        return len(self._items) - self._removed
+
+    def __iter__(self):
+        # compacting makes a new list, so a loop that is already going keeps it's own list (and still sees it's placeholders)
+        self._compact()
+        return filter(_live, self._items)
+
+    def __reversed__(self):
+        self._compact()
+        return filter(_live, reversed(self._items))
+
+    def __contains__(self, element) -> bool:
+        if self._positions is None:
+            self._compact()
+            self._positions = self._index_positions()
+        return element in self._positions
+
+    def __getitem__(self, index):
+        self._compact()
+        return self._items[index]
+
+    def __setitem__(self, index, value) -> None:
+        self._compact()
+        self._items[index] = value
+        self._positions = None
+
+    def __delitem__(self, index) -> None:
+        self._compact()
+        del self._items[index]
+        self._positions = None
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (ChildList, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ChildList({list(self)!r})"
+
+    def __reduce__(self):
+        # pickled as just the children, without the placeholders or positions
+        return (ChildList, (list(self),))
+
+    def append(self, element) -> None:
+        items = self._items
+        if self._positions is not None and element not in self._positions:
+            self._positions[element] = len(items)
+        items.append(element)
+
+    def extend(self, elements: Iterable) -> None:
+        items = self._items
+        start = len(items)
+        items.extend(elements)
+        if self._positions is not None:
+            positions = self._positions
+            for index in range(start, len(items)):
+                positions.setdefault(items[index], index)
+
+    def insert(self, index: int, element) -> None:
+        self.insert_many(index, (element,))
+
+    def insert_many(self, index: int, elements: Iterable) -> None:
+        """
+        Inserts every element before index, in order, in one go (rather than shifting the list along once per element)
+
+        Args:
+            index (int): Where to insert the elements, like list.insert()
+            elements (Iterable): The elements
+        """
+        self._compact()
+        self._items[index:index] = list(elements)
+        self._positions = None
+
+    def remove(self, element) -> None:
+        """
+        Removes the first occurrence of element, in constant time
+
+        Args:
+            element: The child to remove
+
+        Raises:
+            ValueError: If element isn't in the list
+        """
+        if self._positions is None:
+            self._compact()
+            self._positions = self._index_positions()
+        index = self._positions.pop(element, None)
+        if index is None:
+            # a child in the list more than once only has it's first position kept, so any later ones are searched for
+            for index, item in enumerate(self._items):
+                if item is element:
+                    break
+            else:
+                raise ValueError("ChildList.remove(x): x not in list")
+        self._items[index] = _REMOVED
+        self._removed += 1
+
+    def clear(self) -> None:
+        self._items = []
+        self._positions = None
+        self._removed = 0
+
+    def remove_where(self, predicate) -> list:
+        """
+        Removes every child predicate(child) is true for, in a single pass
+
+        Args:
+            predicate (Callable[[Any], bool]): Whether to remove a child
+
+        Returns:
+            list: The removed children, in order
+        """
+        kept = []
+        removed = []
+        for element in self:
+            if predicate(element):
+                removed.append(element)
+            else:
+                kept.append(element)
+        if removed:
+            self._items = kept
+            self._removed = 0
+            self._positions = None
+        return removed
+
+
 class HtmlComponent:
     '''
     The SuperClass for all HTML Element Classes. Designed for creating hyper-specific HTML object abstractions with ease via use of subclasses.  
@@ -135,15 +411,48 @@ class HtmlComponent:
 
         Instance Variables:
             parent (HtmlComponent): The object above in the Hierachy
-            children (list[HtmlComponet]):  The objects below in the Hierarchy
+            children (ChildList[HtmlComponent]):  The objects below in the Hierarchy
             attributes (Dict[str,str]): The attributes of the HTML element
 
         Methods:
             add(self, element): Makes the provided element a child of this HtmlComponent object
+            extend(self, elements): Makes every provided element a child, in order, updating the children list and cached HTML once
+            insert_many(self, index, elements): Makes every provided element a child, inserted before the child at index
             new_sub_element(self, HtmlComponent_subclass, **kwargs): Creates a new instance of HtmlComponent_subclass and makes it a child of this object, and passes all **kwargs to the the constructor.
-            remove(self): Removes this HtmlComponent from the Hierarchy, and all of it's children
+            remove(self): Removes this HtmlComponent from the Hierarchy, and all of it's children (which stay it's children). Constant time
+            remove_where(self, predicate): Removes every child predicate(child) is true for, in one pass
+            clear(self): Removes every child
+            set_attribute(self, name, value): Sets an HTML attribute (use this rather than changing the attributes Dict directly, see invalidate())
+            invalidate(self): Forgets the cached HTML of this object and every object above it. Only needed after changing the attributes Dict or children list directly
+            get_attributes(self): A read only view of the attributes as they are output, the attributes Dict with any class specific attributes (like a circle's cx) on top
+            find_by_id(self, id): The first element below (or this one) with an id, using element_index
+            find_all(self, tag=None, attr=None): The elements below (and this one) with a tag and / or attribute values, using element_index
+            select(self, selector): The elements below (and this one) a simple CSS selector matches, using element_index
+            select_one(self, selector): The first element select() would return
             get_content(self): A generator that yields the initial HTML content
-            string(self, indentation=0): Generates and returns the HTML for this object and all of it's childen. The indentation argument is intended as an internal argument only
+            iter_chunks(self, indentation=0): A generator that yields the HTML for this object and all of it's children as fragments, in document order
+            write_to(self, fp, indentation=0, workers=None, compact=None): Streams the HTML for this object and all of it's children into the file object fp
+            iter_blocks(self, indentation=0, block_size=16384): A generator that yields the HTML joined into blocks of about block_size characters
+            aiter_chunks(self, indentation=0, block_size=16384): An async generator that yields the HTML in blocks, giving the event loop control between them
+            string(self, indentation=0, workers=None, compact=None): Generates and returns the HTML for this object and all of it's childen. The indentation argument is intended as an internal argument only
+
+        Parallel Rendering:
+            Passing workers=N to write_to() or string() splits the children of any element with a lot of them (32768 or more, like an SvgCanvas
+            full of shapes) into chunks that are rendered in a pool of N processes, then put back in order. The output is identical to rendering
+            in one process. N is capped at the CPUs the process may use, so with only one everything is rendered in this process.
+
+        Element Index:
+            element_index (ElementIndex) is built over this object and everything below it the first time find_by_id(), find_all() or select() is used,
+            then kept up to date by add(), remove(), set_attribute() and setting instance variables, so lookups don't walk the tree.
+            After changing the children list directly call element_index.rebuild(), and after changing the attributes Dict directly call invalidate().
+
+        Rendering Cache:
+            string() remembers the HTML it returns for every object in the tree. Setting any instance variable, add(), remove() and set_attribute()
+            forget the cached HTML of the changed object and the objects above it only, so re-rendering after a small edit only redoes that path.
+            Redoing an object on the path joins it's children's HTML again, which costs as much as it has children, except for objects with a lot
+            of children (like an SvgCanvas full of shapes): those remember where each child's HTML is, and only splice the changed children back in.
+            Either way, building the new string costs as much as it is long.
+            iter_chunks() and write_to() reuse cached HTML where there is some, but never cache anything themselves (so streaming stays small).
 
     Reference for use as a SuperClass:  
         Class Variables:
@@ -151,14 +460,23 @@ class HtmlComponent:
             indented_content (bool): Override this to set a new default value.
             _paired (bool): Whether or not the class' main element is paired by default. Override this to set a new default.
         Methods designed to be changed based upon implementation:
-            get_content(self): This is the generator that yields the HTML content. It is used in the default string() method in generating the HTML. It needs to return something that is a string or has a string representation.
-            _get_attribute_string(self): This returns the string of attribute's used in the HTML tag. It is used in string() to generate the HTML. If you have any specific/required attributes, it useful to override this and update them in the attributes Dict, and then call super's method.  
+            get_content(self): This is the generator that yields the HTML content. It is used in the default iter_chunks() method in generating the HTML. It needs to return something that is a string or has a string representation.
+            _get_attribute_string(self): This returns the string of attribute's used in the HTML tag. It is used in iter_chunks() to generate the HTML. If you have any specific/required attributes, it useful to override this and pass them to super's method as a Dict, which outputs them on top of the attributes Dict.  
+            _class_attributes(self): Returns the Dict of specific/required attributes passed to _get_attribute_string(), so get_attributes() (and the element index) see them too.
+            __slots__: Declare any new instance variables in the subclass' __slots__ to keep instances small.
+            iter_chunks(self, indentation_level=0): Override this (not string()) if the subclass needs completely custom HTML. string() and write_to() are both built on top of it.
     
     '''
 
     tag = "HtmlComponent"
     indented_content = True
     _paired = True
+    _element_index = None # only set (in __dict__) on elements that have had their element_index built
+    _child_spans = None # only set (in __dict__) on elements with a lot of children, see string()
+
+    # slots keep big trees small. __dict__ is kept so the tag / paired / indented_content overrides still work per instance,
+    # but it is only created for instances that actually use one.
+    __slots__ = ("parent", "_children", "_content", "_attributes", "_render_cache", "__dict__")
 
     def __init__(self, parent=None, content: any = None, attributes: Dict[str, str]=None, tag: str = None, paired: bool = None, indented_content: bool = None):
         """
@@ -176,13 +494,13 @@ class HtmlComponent:
         # public
         # element hierarchy
         self.parent = parent
-        self.children = []
+        # most elements (shapes) never get children, so the list is only created when it is first used (see the children property)
+        self._children = _NO_CHILDREN
 
         # html properties
         self._content = content
-        if attributes is None:
-            attributes = {}
-        self.attributes = attributes
+        # the attributes Dict is only created when it is first used (see the attributes property)
+        self._attributes = attributes
         # tag override
         if tag is not None:
             self.tag = tag
@@ -193,6 +511,98 @@ class HtmlComponent:
         if indented_content is not None:
             self.indented_content = indented_content
     
+    def __new__(cls, *args, **kwargs):
+        element = super().__new__(cls)
+        # the cached (indentation_level, html) from string(). Set here rather than in __init__ because subclasses set their own instance variables before calling super().__init__()
+        object.__setattr__(element, "_render_cache", None)
+        return element
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # parent and the render cache are left out so that pickling an element (like sending it to another process to be rendered)
+        # only takes it and what is below it, rather than the whole tree
+        state = {}
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get("__slots__", ()):
+                if name not in ("parent", "_render_cache", "__dict__") and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        state.update(self.__dict__)
+        # the element index is over the tree in this process, and the child spans go with the render cache
+        state.pop("_element_index", None)
+        state.pop("_child_spans", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        object.__setattr__(self, "parent", None)
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
+        # reconnect the children, whose parent (this object) was left out when they were pickled
+        for element in self._children or ():
+            if isinstance(element, HtmlComponent):
+                object.__setattr__(element, "parent", self)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """I overrode this so that changing anything that ends up in the HTML also forgets the cached HTML"""
+        object.__setattr__(self, name, value)
+        if name not in _UNTRACKED:
+            if self._render_cache is not None or self._child_spans is not None:
+                self.invalidate()
+            elif _indexing:
+                for index in _element_indexes(self):
+                    index.update(self)
+
+    def invalidate(self) -> None:
+        """
+        Forgets the cached HTML of the HtmlComponent and every HtmlComponent above it in the Hierarchy.
+        Called automatically when an instance variable is set or the Hierarchy is changed with add() / remove(),
+        so it only needs calling by hand after changing the attributes Dict or children list in place.
+        Also brings the element up to date in any element index it is in.
+        """
+        if _indexing:
+            for index in _element_indexes(self):
+                index.update(self)
+        if self._child_spans is not None:
+            self._child_spans = None
+        if self._render_cache is None:
+            # string() caches children before their parent, so nothing above has a cache either (or it already knows this element changed)
+            return
+        self._render_cache = None
+
+        # everything above only changed by what is below it, so an element that keeps it's children's spans just notes which child changed
+        child, element = self, self.parent
+        while element is not None:
+            spans = getattr(element, "_child_spans", None)
+            if spans is not None:
+                spans[4][child] = None
+            if element._render_cache is None:
+                break
+            element._render_cache = None
+            child, element = element, element.parent
+
+    @property
+    def children(self) -> "ChildList":
+        '''The objects below in the Hierarchy'''
+        if self._children is _NO_CHILDREN:
+            self._children = ChildList()
+        return self._children
+
+    @children.setter
+    def children(self, children: list) -> None:
+        # kept as a ChildList, so that removing children stays constant time whatever list they are given in
+        if children is not None and not isinstance(children, ChildList):
+            children = ChildList(children)
+        self._children = children
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        '''The Dict of attributes for the HTML Element'''
+        if self._attributes is None:
+            self._attributes = {}
+        return self._attributes
+
+    @attributes.setter
+    def attributes(self, attributes: Dict[str, str]) -> None:
+        self._attributes = attributes
+
     def add(self, element):
         """
         Makes the given element a child of the HtmlComponent object. 
@@ -206,21 +616,235 @@ class HtmlComponent:
         if not isinstance(element, HtmlComponent):
             return None
         
-        element.parent = self
+        _set_parent(element, self)
 
-        self.children.append(element)
+        children = self.children
+        if children._positions is None:
+            # add() is called once per shape while building big trees, so it skips the method call when there are no positions to keep up
+            children._items.append(element)
+        else:
+            children.append(element)
+        if _indexing:
+            for index in _element_indexes(self):
+                index.add_tree(element)
+        self.invalidate()
 
         return element
 
+    def extend(self, elements: Iterable) -> list:
+        """
+        Makes every given element a child of the HtmlComponent object, in order. The same as calling add() for each one,
+        but the children list and the cached HTML are only updated once.
+
+        Args:
+            elements (Iterable[HtmlComponent]): The elements. Anything that isn't an HtmlComponent is skipped, like add() does
+
+        Returns:
+            list: The elements that were added
+        """
+        return self.insert_many(None, elements)
+
+    def insert_many(self, index: int, elements: Iterable) -> list:
+        """
+        Makes every given element a child of the HtmlComponent object, inserted in order before the child at index
+
+        Args:
+            index (int): Where to insert the elements, like list.insert(). None adds them after the last child.
+            elements (Iterable[HtmlComponent]): The elements. Anything that isn't an HtmlComponent is skipped, like add() does
+
+        Returns:
+            list: The elements that were added
+        """
+        children = self.children
+        if children is None:
+            return []
+        elements = [element for element in elements if isinstance(element, HtmlComponent)]
+        for element in elements:
+            # parent is one of the instance variables that doesn't affect the HTML, so __setattr__ can be skipped
+            _set_parent(element, self)
+
+        if index is None:
+            children.extend(elements)
+        else:
+            children.insert_many(index, elements)
+        self._children_added(elements)
+        if _indexing:
+            for element_index in _element_indexes(self):
+                for element in elements:
+                    element_index.add_tree(element)
+        self.invalidate()
+        return elements
+
     def remove(self):
-        """Removes element and any sub elements from the hierarchy"""
-        if self.parent is not None and isinstance(self.parent, HtmlComponent):
-            self.parent.children.remove(self)
-        
-        for child in self.children:
-            if isinstance(child, HtmlComponent):
-                child.remove()
-    
+        """
+        Removes the element from the hierarchy (and with it, all of it's children).
+        The element keeps it's children, so it can be added somewhere else as it is.
+        """
+        parent = self.parent
+        if parent is not None and isinstance(parent, HtmlComponent):
+            parent.children.remove(self)
+            if _indexing:
+                for index in _element_indexes(parent):
+                    index.remove_tree(self)
+            self.parent = None
+            parent._child_removed(self)
+            parent.invalidate()
+
+    def remove_where(self, predicate) -> list:
+        """
+        Removes every child that predicate(child) is true for, in a single pass over the children
+
+        Args:
+            predicate (Callable[[HtmlComponent], bool]): Whether to remove a child
+
+        Returns:
+            list: The removed children, in order
+        """
+        if not self._children:
+            return []
+        removed = self._children.remove_where(predicate)
+        if removed:
+            self._detach(removed)
+        return removed
+
+    def clear(self) -> list:
+        """
+        Removes every child
+
+        Returns:
+            list: The removed children, in order
+        """
+        if not self._children:
+            return []
+        removed = list(self._children)
+        self._children.clear()
+        self._detach(removed)
+        return removed
+
+    def _detach(self, elements: list) -> None:
+        '''the rest of removing elements that are already out of the children list'''
+        if _indexing:
+            for index in _element_indexes(self):
+                for element in elements:
+                    if isinstance(element, HtmlComponent):
+                        index.remove_tree(element)
+        for element in elements:
+            if isinstance(element, HtmlComponent):
+                _set_parent(element, None)
+        self._children_removed(elements)
+        self.invalidate()
+
+    def _child_removed(self, element) -> None:
+        '''called by remove() once element is out of the children list. For subclasses that keep track of their children (like SvgCanvas' spatial index)'''
+        pass
+
+    def _children_removed(self, elements: list) -> None:
+        '''called by remove_where() and clear() once elements are out of the children list. Calls _child_removed() for each by default'''
+        for element in elements:
+            self._child_removed(element)
+
+    def _children_added(self, elements: list) -> None:
+        '''called by extend() and insert_many() once elements are in the children list. For subclasses that keep track of their children'''
+        pass
+
+    def set_attribute(self, name: str, value: Any) -> None:
+        """
+        Sets an HTML attribute of the HtmlComponent, keeping the cached HTML up to date
+
+        Args:
+            name (str): The attribute name
+            value (Any): The attribute value
+        """
+        self.attributes[name] = value
+        self.invalidate()
+
+    def get_attributes(self) -> Mapping[str, Any]:
+        """
+        Returns the attributes of the HtmlComponent as they are output: the attributes Dict, with any class specific attributes on top.
+        The view can't be changed, so nothing can change the element's attributes behind the back of the render cache and
+        element index: use set_attribute() for that.
+
+        Returns:
+            Mapping[str, Any]: A read only view of the attributes
+        """
+        attributes = self._class_attributes()
+        if attributes is None:
+            return MappingProxyType(self._attributes or {})
+        if self._attributes:
+            return MappingProxyType({**self._attributes, **attributes})
+        return MappingProxyType(attributes)
+
+    def _class_attributes(self) -> Dict[str, Any]:
+        '''the class specific attributes output on top of the attributes Dict, for subclasses that have some (None for none)'''
+        return None
+
+    @property
+    def element_index(self) -> ElementIndex:
+        '''The ElementIndex over this object and everything below it, built on first use'''
+        global _indexing
+        index = self._element_index
+        if index is None:
+            _indexing = True
+            index = self._element_index = ElementIndex(self)
+        return index
+
+    def find_by_id(self, id: str):
+        """
+        Returns the first element with an id, out of the HtmlComponent and everything below it
+
+        Args:
+            id (str): The id
+
+        Returns:
+            HtmlComponent: The element, or None if there isn't one
+        """
+        return self.element_index.find_by_id(id)
+
+    def find_all(self, tag: str = None, attr: Dict[str, Any] = None) -> list:
+        """
+        Returns the elements with a tag and / or attribute values, out of the HtmlComponent and everything below it
+
+        Args:
+            tag (str, optional): The tag. Defaults to None (any tag).
+            attr (Dict[str, Any], optional): Attribute values the elements must all have, compared as they are output (so rgb(255, 0, 0) works).
+                A value of None only needs the element to have the attribute. Defaults to None.
+
+        Returns:
+            list: The elements, in document order unless elements were inserted before others or had a looked up attribute changed
+        """
+        return self.element_index.find_all(tag, attr)
+
+    def select(self, selector: str) -> list:
+        """
+        Returns the elements a simple CSS selector matches, out of the HtmlComponent and everything below it.
+        Supports tags, *, #id, .class, [attribute], [attribute=value], descendant ("a b"), child ("a > b") and "a, b" (see element_index)
+
+        Args:
+            selector (str): The selector
+
+        Raises:
+            ValueError: If the selector uses anything that isn't supported
+
+        Returns:
+            list: The elements, in the same order as find_all()
+        """
+        return self.element_index.select(selector)
+
+    def select_one(self, selector: str):
+        """
+        Returns the first element select() would return
+
+        Args:
+            selector (str): The selector
+
+        Raises:
+            ValueError: If the selector uses anything that isn't supported
+
+        Returns:
+            HtmlComponent: The element, or None if nothing matches
+        """
+        return self.element_index.select_one(selector)
+
     def get_content(self):
         """
         Yields the content of the HtmlComponent
@@ -234,48 +858,257 @@ class HtmlComponent:
                 yield self._content
 
     
-    def _get_attribute_string(self) -> str:
-        """Returns the string used in HtmlComponent.string()"""
-        attribute_string = "".join([f" {key}=\"{value}\"" for key, value in self.attributes.items()])
-        return attribute_string
-    
-    def string(self, indentation_level=0) -> str:
+    def _get_attribute_string(self, attributes: Dict[str, Any] = None) -> str:
         """
-        Coverts the HtmlComponent object and it's children to HTML
+        Returns the string used in HtmlComponent.iter_chunks()
 
         Args:
-            indentation_level (int, optional): Only used in recursion. Defaults to 0.
-
-        Returns:
-            str: The HTML
+            attributes (Dict[str, Any], optional): Attributes that are output on top of the attributes Dict (replacing any matching keys) without being written into it. Used by subclasses for their class specific attributes.
         """
+        if attributes is None:
+            attributes = self._attributes or {}
+        elif self._attributes:
+            attributes = {**self._attributes, **attributes}
+        attribute_string = "".join([f" {key}=\"{value}\"" for key, value in attributes.items()])
+        return attribute_string
+    
+    def _opening_html(self, indentation_level=0) -> str:
+        """Returns the opening tag and the content (everything before the children) used in HtmlComponent.iter_chunks()"""
         tabs = "    "*(indentation_level)
 
         attribute_str = self._get_attribute_string()
 
         html_string = tabs + f"<{self.tag}{attribute_str}>"
 
-        if self._paired:
-            for content in self.get_content():
-                # check if indentation is required
-                if self.indented_content == True:
-                    html_string += "\n"+tabs+"    "
-                html_string += content
-            for element in self.children:
-                # no matter if indented content is true or false, children content is placed on new line
-                html_string += "\n"+element.string(indentation_level=indentation_level+1)
-
-            # if indentation, create new line after for closing tag
+        if not self._paired:
+            return html_string + "\n"
+
+        for content in self.get_content():
+            # check if indentation is required
             if self.indented_content == True:
-                html_string += "\n"+tabs
+                html_string += "\n"+tabs+"    "
+            html_string += content
+        return html_string
 
-            html_string += f"</{self.tag}>"
-        else:
-            html_string += "\n"
-        
+    def _closing_html(self, indentation_level=0) -> str:
+        """Returns the closing tag (everything after the children) used in HtmlComponent.iter_chunks()"""
+        # if indentation, create new line after for closing tag
+        if self.indented_content == True:
+            return "\n"+"    "*(indentation_level)+f"</{self.tag}>"
+        return f"</{self.tag}>"
+
+    def iter_chunks(self, indentation_level=0):
+        """
+        Yields the HTML for the HtmlComponent object and it's children as fragments, in document order.
+        Joining every fragment gives exactly the output of string(), but nothing bigger than a single element's tag is ever held in memory.
+
+        Args:
+            indentation_level (int, optional): Only used in recursion. Defaults to 0.
+
+        Yields:
+            str: The next fragment of HTML
+        """
+        yield self._opening_html(indentation_level)
+
+        if not self._paired:
+            return
+
+        child_indentation = indentation_level+1
+        for element in self._children:
+            # no matter if indented content is true or false, children content is placed on new line
+            yield "\n"
+            # reuse the child's HTML from string() if it is still cached
+            cache = element._render_cache
+            if cache is not None and cache[0] == child_indentation:
+                yield cache[1]
+            else:
+                yield from element.iter_chunks(indentation_level=child_indentation)
+
+        yield self._closing_html(indentation_level)
+
+    async def aiter_chunks(self, indentation_level=0, block_size: int = 16384):
+        """
+        Yields the HTML for the HtmlComponent object and it's children in blocks of about block_size characters, for use from asyncio code.
+        Control goes back to the event loop between blocks, so rendering a big tree never holds the loop for longer than one block takes.
+
+        Args:
+            indentation_level (int, optional): The indentation of this element. Defaults to 0.
+            block_size (int, optional): Roughly how many characters to render before yielding a block. Defaults to 16384.
+
+        Yields:
+            str: The next block of HTML
+        """
+        import asyncio # only needed for async output, so not imported with the module
+
+        for block in self.iter_blocks(indentation_level=indentation_level, block_size=block_size):
+            yield block
+            await asyncio.sleep(0)
+
+    def iter_blocks(self, indentation_level=0, block_size: int = 16384):
+        """
+        Yields the HTML for the HtmlComponent object and it's children joined into blocks of about block_size characters.
+        Handy for sinks where every write has a cost of it's own (like chunks of an HTTP response).
+
+        Args:
+            indentation_level (int, optional): The indentation of this element. Defaults to 0.
+            block_size (int, optional): Roughly how many characters to put in a block. Defaults to 16384.
+
+        Yields:
+            str: The next block of HTML
+        """
+        cache = self._render_cache
+        if cache is not None and cache[0] == indentation_level:
+            yield cache[1]
+            return
+
+        block = []
+        size = 0
+        for chunk in self.iter_chunks(indentation_level=indentation_level):
+            block.append(chunk)
+            size += len(chunk)
+            if size >= block_size:
+                yield "".join(block)
+                block.clear()
+                size = 0
+        if block:
+            yield "".join(block)
+
+    def write_to(self, fp, indentation_level=0, workers: int = None, compact=None) -> None:
+        """
+        Streams the HTML for the HtmlComponent object and it's children into a file object, one fragment at a time.
+
+        Args:
+            fp (TextIO): Anything with a write(str) method, like an open file
+            indentation_level (int, optional): The indentation of this element. Defaults to 0.
+            workers (int, optional): The number of processes used to render elements with a lot of children. Defaults to None (render in this process only).
+            compact (bool | compact.Compact, optional): Write compact HTML instead (see the compact module). indentation_level and workers are not used. Defaults to None.
+        """
+        if compact:
+            from compact import CompactRenderer # compact imports this module, so it can't be imported at the top
+            write = fp.write
+            for chunk in CompactRenderer(compact).iter_chunks(self):
+                write(chunk)
+            return
+
+        cache = self._render_cache
+        if cache is not None and cache[0] == indentation_level:
+            fp.write(cache[1])
+            return
+
+        write = fp.write
+        if workers is not None and workers > 1:
+            with _ParallelRenderer(self, workers) as renderer:
+                for chunk in renderer.iter_chunks(self, indentation_level):
+                    write(chunk)
+            return
+
+        for chunk in self.iter_chunks(indentation_level=indentation_level):
+            write(chunk)
+
+    def string(self, indentation_level=0, workers: int = None, compact=None) -> str:
+        """
+        Coverts the HtmlComponent object and it's children to HTML.
+        The result is cached until this object or anything below it changes.
+
+        Args:
+            indentation_level (int, optional): Only used in recursion. Defaults to 0.
+            workers (int, optional): The number of processes used to render elements with a lot of children. The parallel result is not cached. Defaults to None (render in this process only).
+            compact (bool | compact.Compact, optional): Return compact HTML instead (see the compact module). It is not cached, and indentation_level and workers are not used. Defaults to None.
+
+        Returns:
+            str: The HTML
+        """
+        if compact:
+            from compact import CompactRenderer # compact imports this module, so it can't be imported at the top
+            return "".join(CompactRenderer(compact).iter_chunks(self))
+
+        cache = self._render_cache
+        if cache is not None and cache[0] == indentation_level:
+            return cache[1]
+
+        if workers is not None and workers > 1:
+            with _ParallelRenderer(self, workers) as renderer:
+                return "".join(renderer.iter_chunks(self, indentation_level))
+
+        spans = self._child_spans
+        if spans is not None:
+            html_string = self._splice_children(spans) if spans[0] == indentation_level else None
+            if html_string is not None:
+                self._render_cache = (indentation_level, html_string)
+                return html_string
+            self._child_spans = None
+
+        children = self._children
+        if children and len(children) >= _SPLICE_MIN_CHILDREN and self._paired and type(self).iter_chunks is HtmlComponent.iter_chunks:
+            return self._render_spans(indentation_level)
+
+        # render (and cache) the children first, so that iter_chunks() just joins their cached HTML
+        if children:
+            for element in children:
+                element.string(indentation_level=indentation_level+1)
+
+        html_string = "".join(self.iter_chunks(indentation_level=indentation_level))
+        self._render_cache = (indentation_level, html_string)
         return html_string
+
+    def _render_spans(self, indentation_level: int) -> str:
+        '''string() for an element with a lot of children, noting where each child's HTML ends so a changed child can be spliced back in'''
+        opening = self._opening_html(indentation_level)
+        pieces = [opening]
+        ends = []
+        position = len(opening)
+        for element in self._children:
+            html = element.string(indentation_level=indentation_level+1)
+            pieces.append("\n")
+            pieces.append(html)
+            position += len(html) + 1
+            ends.append(position)
+        pieces.append(self._closing_html(indentation_level))
+
+        html_string = "".join(pieces)
+        self._render_cache = (indentation_level, html_string)
+        # [indentation_level, html, where the first child's "\n" starts, where each child's HTML ends, the children that changed since]
+        self._child_spans = [indentation_level, html_string, len(opening), ends, {}]
+        return html_string
+
+    def _splice_children(self, spans: list) -> str:
+        '''the element's HTML with the changed children's new HTML put in place of their old, or None if it is better to render it all again'''
+        indentation_level, html, start, ends, changed = spans
+        if len(changed) > _SPLICE_MAX_CHANGED:
+            return None
+        items = getattr(self._children, "_items", self._children)
+        try:
+            changes = sorted((items.index(element), element) for element in changed)
+        except ValueError:
+            return None
+
+        pieces = []
+        position = 0
+        shifts = []
+        for index, element in changes:
+            begin = (ends[index - 1] if index else start) + 1
+            end = ends[index]
+            new = element.string(indentation_level=indentation_level+1)
+            pieces.append(html[position:begin])
+            pieces.append(new)
+            position = end
+            if len(new) != end - begin:
+                shifts.append((index, len(new) - (end - begin)))
+        pieces.append(html[position:])
+        html = "".join(pieces)
+
+        # every end after a changed child moves by how much longer it (and every changed child before it) got, in one pass
+        total = 0
+        for (index, shift), (stop, _) in zip(shifts, shifts[1:] + [(len(ends), 0)]):
+            total += shift
+            ends[index:stop] = map(partial(add, total), islice(ends, index, stop))
+        spans[1] = html
+        changed.clear()
+        return html
     
 
+_set_parent = HtmlComponent.parent.__set__ # sets an element's parent without going through HtmlComponent.__setattr__
+
 class Comment(HtmlComponent):
     """
     An HTML Comment HtmlComponent
@@ -285,9 +1118,11 @@ class Comment(HtmlComponent):
     Instance Variables:
         text (str): The content of the comment
 
-    Overrides the string method
+    Overrides the iter_chunks method
     """
     _paired = False
+    __slots__ = ("text",)
+
     def __init__(self, text: str, parent: HtmlComponent=None):
         """
         Creates a new HTML comment. 
@@ -298,10 +1133,8 @@ class Comment(HtmlComponent):
             text (str): The content of the comment.
             parent (HtmlComponent, optional): The parent HtmlComponent. Defaults to None.
         """
+        super().__init__(parent=parent)
         self.text = text
-
-        if parent is not None:
-            self.parent = parent
         
         self.children = None 
 
@@ -309,10 +1142,9 @@ class Comment(HtmlComponent):
         '''Cannot add children to a Comment element. If called, this returns None'''
         return None
     
-    def string(self, indentation_level=0):
+    def iter_chunks(self, indentation_level=0):
         tabs = "    "*(indentation_level)
-        html_string = tabs+f"<!--{self.text}-->"
-        return html_string
+        yield tabs+f"<!--{self.text}-->"
     
 class Raw(HtmlComponent):
     """
@@ -325,6 +1157,8 @@ class Raw(HtmlComponent):
     If I want to work on this for fun outside of this assignment, I would include this in the main implementation. Otherwise, this works for now.
 
     """
+    __slots__ = ("text",)
+
     def __init__(self, text: str, parent: HtmlComponent=None):
         """
         Creates Raw Text that can be put between children HtmlComponents 
@@ -333,10 +1167,8 @@ class Raw(HtmlComponent):
             text (str): The text content
             parent (HtmlComponent, optional): Parent HtmlComponent. Defaults to None.
         """
+        super().__init__(parent=parent)
         self.text = text
-
-        if parent is not None:
-            self.parent = parent
         
         self.children = None 
 
@@ -344,18 +1176,9 @@ class Raw(HtmlComponent):
         '''Cannot add children to a Comment element. If called, this returns None'''
         return None
     
-    def string(self, indentation_level=0):
-        html_string = ""
+    def iter_chunks(self, indentation_level=0):
         tabs = "    "*(indentation_level)
-        first_line = True
-
-        for line in self.text.splitlines():
-            if first_line == False:
-                html_string += "\n"
-            html_string += tabs+line
-            first_line = False
-
-        return html_string
+        yield "\n".join([tabs+line for line in self.text.splitlines()])
 
 
 class CircleShape(HtmlComponent):
@@ -363,13 +1186,14 @@ class CircleShape(HtmlComponent):
     An SVG Circle HtmlComponent
 
     Note: key attributes relating to the circles properties contained within the instance's attributes Dict are 
-    overwritten by the corresponding instance variables by _get_attribute_string in order to update them before output
+    overridden by the corresponding instance variables when output (the attributes Dict itself is left unchanged)
 
     """
     tag="circle"
     indented_content = False
+    __slots__ = ("position", "radius", "fill", "fill_opacity")
 
-    def __init__(self, position: Position, radius: int, fill: rgb = rgb(255,0,0), fill_opacity: float = 1.0, attributes: Dict[str, str] = {}, **kwargs):
+    def __init__(self, position: Position, radius: int, fill: rgb = rgb(255,0,0), fill_opacity: float = 1.0, attributes: Dict[str, str] = None, **kwargs):
         """
         An SVG Circle HtmlComponent
 
@@ -378,27 +1202,40 @@ class CircleShape(HtmlComponent):
             radius (int): the circle's radius
             fill (rgb, optional): the circle's colour. Defaults to bright red.
             fill_opacity (float, optional): the fill opacity. Defaults to 1.0.
-            attributes (Dict[str, str], optional): any HTML attributes. Defaults to {}.
+            attributes (Dict[str, str], optional): any HTML attributes. Defaults to None (no extra attributes).
         
         Extra keywords are passed to HtmlComponent
         """
-        self.position = position
+        self.position = _intern(position)
         self.radius = radius
-        self.fill = fill
+        self.fill = _intern(fill)
         self.fill_opacity = fill_opacity
-        self.attributes = attributes
 
-        super().__init__(**kwargs)
+        super().__init__(attributes=attributes, **kwargs)
+
+    def _class_attributes(self) -> Dict[str, Any]:
+        # class specific attributes, output on top of the attributes Dict
+        return {
+            "cx": self.position.x,
+            "cy": self.position.y,
+            "r": self.radius,
+            "fill": self.fill,
+            "fill-opacity": self.fill_opacity
+        }
 
     def _get_attribute_string(self) -> str:
-        # update attributes with necessry class specific attributes
-        self.attributes["cx"] = self.position.x
-        self.attributes["cy"] = self.position.y
-        self.attributes["r"] = self.radius
-        self.attributes["fill"] = str(self.fill)
-        self.attributes["fill-opacity"] = self.fill_opacity
+        return super()._get_attribute_string(self._class_attributes())
+
+    def bounding_box(self) -> tuple:
+        '''the (x_min, y_min, x_max, y_max) of the circle'''
+        x, y = self.position
+        return (x - self.radius, y - self.radius, x + self.radius, y + self.radius)
 
-        return super()._get_attribute_string()
+    def contains_point(self, x: float, y: float) -> bool:
+        '''whether the point (x, y) is inside the circle (or on it's edge)'''
+        dx = x - self.position.x
+        dy = y - self.position.y
+        return dx*dx + dy*dy <= self.radius*self.radius
 
 # Make a Rectangle Class
 class RectangleShape(HtmlComponent):
@@ -406,13 +1243,14 @@ class RectangleShape(HtmlComponent):
     An SVG Rectangle HtmlComponent
 
     Note: key attributes relating to the rectangle's properties contained within the instance's attributes Dict are 
-    overwritten by the corresponding instance variables by _get_attribute_string in order to update them before output
+    overridden by the corresponding instance variables when output (the attributes Dict itself is left unchanged)
 
     """
     tag="rect"
     indented_content = False
+    __slots__ = ("position", "width", "height", "fill", "fill_opacity")
 
-    def __init__(self, position: Position, width: int, height: int, fill: rgb = rgb(255,0,0), fill_opacity: float = 1.0, attributes: Dict[str, str] = {}, **kwargs):
+    def __init__(self, position: Position, width: int, height: int, fill: rgb = rgb(255,0,0), fill_opacity: float = 1.0, attributes: Dict[str, str] = None, **kwargs):
         """
         An SVG Rectangle HtmlComponent
 
@@ -422,29 +1260,41 @@ class RectangleShape(HtmlComponent):
             height (int): the rectangle's height
             fill (rgb, optional): the rectangle's colour. Defaults to bright red.
             fill_opacity (float, optional): the fill opacity. Defaults to 1.0.
-            attributes (Dict[str, str], optional): any HTML attributes. Defaults to {}.
+            attributes (Dict[str, str], optional): any HTML attributes. Defaults to None (no extra attributes).
         
         Extra keywords are passed to HtmlComponent
         """
-        self.position = position
+        self.position = _intern(position)
         self.width = width
         self.height = height
-        self.fill = fill
+        self.fill = _intern(fill)
         self.fill_opacity = fill_opacity
-        self.attributes = attributes
 
-        super().__init__(**kwargs)
+        super().__init__(attributes=attributes, **kwargs)
+
+    def _class_attributes(self) -> Dict[str, Any]:
+        # class specific attributes, output on top of the attributes Dict
+        return {
+            "x": self.position.x,
+            "y": self.position.y,
+            "width": self.width,
+            "height": self.height,
+            "fill": self.fill,
+            "fill-opacity": self.fill_opacity
+        }
 
     def _get_attribute_string(self) -> str:
-        # update attributes with necessry class specific attributes
-        self.attributes["x"] = self.position.x
-        self.attributes["y"] = self.position.y
-        self.attributes["width"] = self.width
-        self.attributes["height"] = self.height
-        self.attributes["fill"] = str(self.fill)
-        self.attributes["fill-opacity"] = self.fill_opacity
+        return super()._get_attribute_string(self._class_attributes())
 
-        return super()._get_attribute_string()
+    def bounding_box(self) -> tuple:
+        '''the (x_min, y_min, x_max, y_max) of the rectangle'''
+        x, y = self.position
+        return (x, y, x + self.width, y + self.height)
+
+    def contains_point(self, x: float, y: float) -> bool:
+        '''whether the point (x, y) is inside the rectangle (or on it's edge)'''
+        x_min, y_min, x_max, y_max = self.bounding_box()
+        return x_min <= x <= x_max and y_min <= y <= y_max
 
 # Make an Ellipse Class
 class EllipseShape(HtmlComponent):
@@ -452,13 +1302,14 @@ class EllipseShape(HtmlComponent):
     An SVG Ellipse HtmlComponent
 
     Note: key attributes relating to the ellipse's properties contained within the instance's attributes Dict are 
-    overwritten by the corresponding instance variables by _get_attribute_string in order to update them before output
+    overridden by the corresponding instance variables when output (the attributes Dict itself is left unchanged)
 
     """
     tag="ellipse"
     indented_content = False
+    __slots__ = ("position", "rx", "ry", "fill", "fill_opacity")
 
-    def __init__(self, position: Position, rx: int, ry: int, fill: rgb = rgb(255,0,0), fill_opacity: float = 1.0, attributes: Dict[str, str] = {}, **kwargs):
+    def __init__(self, position: Position, rx: int, ry: int, fill: rgb = rgb(255,0,0), fill_opacity: float = 1.0, attributes: Dict[str, str] = None, **kwargs):
         """
         An SVG Ellipse HtmlComponent 
 
@@ -468,29 +1319,524 @@ class EllipseShape(HtmlComponent):
             ry (int): the ellipses's y radius
             fill (rgb, optional): the ellipse's colour. Defaults to bright red.
             fill_opacity (float, optional): the fill opacity. Defaults to 1.0.
-            attributes (Dict[str, str], optional): any HTML attributes. Defaults to {}.
+            attributes (Dict[str, str], optional): any HTML attributes. Defaults to None (no extra attributes).
         
         Extra keywords are passed to HtmlComponent
         """
-        self.position = position
+        self.position = _intern(position)
         self.rx = rx
         self.ry = ry
-        self.fill = fill
+        self.fill = _intern(fill)
         self.fill_opacity = fill_opacity
-        self.attributes = attributes
 
-        super().__init__(**kwargs)
+        super().__init__(attributes=attributes, **kwargs)
+
+    def _class_attributes(self) -> Dict[str, Any]:
+        # class specific attributes, output on top of the attributes Dict
+        return {
+            "cx": self.position.x,
+            "cy": self.position.y,
+            "rx": self.rx,
+            "ry": self.ry,
+            "fill": self.fill,
+            "fill-opacity": self.fill_opacity
+        }
 
     def _get_attribute_string(self) -> str:
-        # update attributes with necessry class specific attributes
-        self.attributes["cx"] = self.position.x
-        self.attributes["cy"] = self.position.y
-        self.attributes["rx"] = self.rx
-        self.attributes["ry"] = self.ry
-        self.attributes["fill"] = str(self.fill)
-        self.attributes["fill-opacity"] = self.fill_opacity
+        return super()._get_attribute_string(self._class_attributes())
+
+    def bounding_box(self) -> tuple:
+        '''the (x_min, y_min, x_max, y_max) of the ellipse'''
+        x, y = self.position
+        return (x - self.rx, y - self.ry, x + self.rx, y + self.ry)
+
+    def contains_point(self, x: float, y: float) -> bool:
+        '''whether the point (x, y) is inside the ellipse (or on it's edge)'''
+        if self.rx <= 0 or self.ry <= 0:
+            return x == self.position.x and y == self.position.y
+        dx = (x - self.position.x) / self.rx
+        dy = (y - self.position.y) / self.ry
+        return dx*dx + dy*dy <= 1
+
+class ShapeTable(HtmlComponent):
+    """
+    Many SVG circles, rectangles and ellipses stored as columns (struct of arrays) rather than as one HtmlComponent each.
+    Add it to an SvgCanvas like any other child; it outputs exactly the same lines that the matching
+    CircleShape / RectangleShape / EllipseShape children would, without ever creating those objects.
+    Cannot have children HtmlComponents.
+
+    Class Variables:
+        CIRCLE, RECTANGLE, ELLIPSE (int): The shape type codes used in the SHA column (the same ones s_gen uses)
+        COLUMNS (tuple[str]): The column names, in order
 
-        return super()._get_attribute_string()
+    Instance Variables:
+        columns (Dict[str, Sequence]): One equally sized list (or NumPy array) per column:
+            SHA (int): The type of shape
+            X, Y (int): Position (the centre for circles and ellipses, the corner for rectangles)
+            RAD (int): Circle radius
+            RX, RY (int): Ellipse radii
+            W, H (int): Rectangle width and height
+            R, G, B (int): The fill colour
+            OP (float): The fill opacity
+        chunk_size (int): How many shapes are formatted together per yielded fragment
+
+    Methods:
+        add_shape(self, shape) -> None: Appends a CircleShape, RectangleShape or EllipseShape as a new row
+        component(self, index) -> HtmlComponent: Returns the row at index as a CircleShape, RectangleShape or EllipseShape
+        shape_row(cls, shape) -> tuple: Returns the row a CircleShape, RectangleShape or EllipseShape would be stored as
+        row(self, index) -> tuple: Returns the row at index as a tuple of python values, in COLUMNS order
+        rows(self) -> Iterator[tuple]: Yields every row as a tuple, in order
+        row_bounding_box(cls, row) -> tuple: Returns the (x_min, y_min, x_max, y_max) of a row's shape
+        row_html(cls, row, indentation=0) -> str: Returns the HTML line of a row
+        from_components(cls, shapes) -> ShapeTable: Creates a ShapeTable from CircleShape, RectangleShape and EllipseShape objects
+
+    Note: an empty ShapeTable still takes up the line its parent puts it on
+    """
+    tag = "shapes"
+    __slots__ = ("columns", "chunk_size")
+
+    CIRCLE = 0
+    RECTANGLE = 1
+    ELLIPSE = 3
+
+    COLUMNS = ("SHA", "X", "Y", "RAD", "RX", "RY", "W", "H", "R", "G", "B", "OP")
+
+    # str.format templates, indexed by the position of the value in COLUMNS
+    _templates = {
+        CIRCLE: '<circle cx="{1}" cy="{2}" r="{3}" fill="rgb({8}, {9}, {10})" fill-opacity="{11}"></circle>',
+        RECTANGLE: '<rect x="{1}" y="{2}" width="{6}" height="{7}" fill="rgb({8}, {9}, {10})" fill-opacity="{11}"></rect>',
+        ELLIPSE: '<ellipse cx="{1}" cy="{2}" rx="{4}" ry="{5}" fill="rgb({8}, {9}, {10})" fill-opacity="{11}"></ellipse>',
+    }
+
+    def __init__(self, columns: Dict[str, Any] = None, chunk_size: int = 4096, parent: HtmlComponent = None):
+        """
+        Creates a new ShapeTable
+
+        Args:
+            columns (Dict[str, Sequence], optional): One equally sized list or NumPy array per name in COLUMNS. Defaults to an empty table.
+            chunk_size (int, optional): How many shapes are formatted together per yielded fragment. Defaults to 4096.
+            parent (HtmlComponent, optional): The parent HtmlComponent. Defaults to None.
+
+        Raises:
+            ValueError: If a column is missing or the columns are not all the same length
+        """
+        super().__init__(parent=parent)
+        self.children = None
+
+        if columns is None:
+            columns = {key: [] for key in self.COLUMNS}
+
+        missing = [key for key in self.COLUMNS if key not in columns]
+        if missing:
+            raise ValueError(f"ShapeTable is missing columns: {', '.join(missing)}")
+        if len({len(columns[key]) for key in self.COLUMNS}) > 1:
+            raise ValueError("ShapeTable columns must all be the same length")
+
+        self.columns = {key: columns[key] for key in self.COLUMNS}
+        self.chunk_size = chunk_size
+
+    def __len__(self) -> int:
+        return len(self.columns["SHA"])
+
+    def add(self) -> None:
+        '''Cannot add children to a ShapeTable element. If called, this returns None'''
+        return None
+
+    def add_shape(self, shape: HtmlComponent) -> None:
+        """
+        Appends a shape to the end of the table
+
+        Args:
+            shape (CircleShape | RectangleShape | EllipseShape): The shape to copy into the table
+
+        Raises:
+            ValueError: If the shape is not a CircleShape, RectangleShape or EllipseShape
+        """
+        for key, value in zip(self.COLUMNS, self.shape_row(shape)):
+            column = self.columns[key]
+            if not hasattr(column, "append"): # NumPy arrays can't grow in place
+                column = self.columns[key] = _as_list(column)
+            column.append(value)
+        self.invalidate()
+
+    @classmethod
+    def shape_row(cls, shape: HtmlComponent) -> tuple:
+        """
+        Returns the row a shape would be stored as (unused columns are 0)
+
+        Args:
+            shape (CircleShape | RectangleShape | EllipseShape): The shape
+
+        Raises:
+            ValueError: If the shape is not a CircleShape, RectangleShape or EllipseShape
+
+        Returns:
+            tuple: The row's values, in COLUMNS order
+        """
+        if isinstance(shape, CircleShape):
+            row = (cls.CIRCLE, shape.position.x, shape.position.y, shape.radius, 0, 0, 0, 0)
+        elif isinstance(shape, RectangleShape):
+            row = (cls.RECTANGLE, shape.position.x, shape.position.y, 0, 0, 0, shape.width, shape.height)
+        elif isinstance(shape, EllipseShape):
+            row = (cls.ELLIPSE, shape.position.x, shape.position.y, 0, shape.rx, shape.ry, 0, 0)
+        else:
+            raise ValueError(f"ShapeTable cannot hold {type(shape).__name__}")
+        return row + (shape.fill.red, shape.fill.green, shape.fill.blue, shape.fill_opacity)
+
+    @classmethod
+    def from_components(cls, shapes: Iterable[HtmlComponent], **kwargs) -> "ShapeTable":
+        """
+        Creates a ShapeTable from CircleShape, RectangleShape and EllipseShape objects
+
+        Args:
+            shapes (Iterable[HtmlComponent]): The shapes, in paint order
+
+        Extra keywords are passed to the ShapeTable constructor
+
+        Returns:
+            ShapeTable: The new table
+        """
+        table = cls(**kwargs)
+        for shape in shapes:
+            table.add_shape(shape)
+        return table
+
+    def component(self, index: int) -> HtmlComponent:
+        """
+        Returns the row at index as a standalone shape HtmlComponent
+
+        Args:
+            index (int): The row
+
+        Returns:
+            HtmlComponent: The CircleShape, RectangleShape or EllipseShape
+        """
+        sha, x, y, rad, rx, ry, w, h, r, g, b, op = self.row(index)
+        if sha == self.CIRCLE:
+            return CircleShape(Position(x, y), rad, rgb(r, g, b), op)
+        elif sha == self.RECTANGLE:
+            return RectangleShape(Position(x, y), w, h, rgb(r, g, b), op)
+        elif sha == self.ELLIPSE:
+            return EllipseShape(Position(x, y), rx, ry, rgb(r, g, b), op)
+
+        raise ValueError(f"Incorrect SHA: {sha}")
+
+    def row(self, index: int) -> tuple:
+        """
+        Returns the row at index
+
+        Args:
+            index (int): The row
+
+        Returns:
+            tuple: The row's python values, in COLUMNS order
+        """
+        return tuple([_as_value(self.columns[key][index]) for key in self.COLUMNS])
+
+    def rows(self):
+        """
+        Yields every row, converting chunk_size rows at a time
+
+        Yields:
+            tuple: The next row's python values, in COLUMNS order
+        """
+        for start in range(0, len(self), self.chunk_size):
+            yield from zip(*[_as_list(self.columns[key][start:start+self.chunk_size]) for key in self.COLUMNS])
+
+    @classmethod
+    def row_bounding_box(cls, row: tuple) -> tuple:
+        """
+        Returns the bounding box of a row's shape (the same as the matching shape's bounding_box())
+
+        Args:
+            row (tuple): The row, as from row() or rows()
+
+        Raises:
+            ValueError: If the row's SHA is not a known shape
+
+        Returns:
+            tuple: (x_min, y_min, x_max, y_max)
+        """
+        sha, x, y, rad, rx, ry, w, h = row[:8]
+        if sha == cls.CIRCLE:
+            return (x - rad, y - rad, x + rad, y + rad)
+        elif sha == cls.RECTANGLE:
+            return (x, y, x + w, y + h)
+        elif sha == cls.ELLIPSE:
+            return (x - rx, y - ry, x + rx, y + ry)
+        raise ValueError(f"Incorrect SHA: {sha}")
+
+    @classmethod
+    def row_html(cls, row: tuple, indentation_level=0) -> str:
+        """
+        Returns the HTML line of a row's shape (the same line the table outputs for it)
+
+        Args:
+            row (tuple): The row, as from row() or rows()
+            indentation_level (int, optional): The indentation of the line. Defaults to 0.
+
+        Raises:
+            ValueError: If the row's SHA is not a known shape
+
+        Returns:
+            str: The line, without a newline
+        """
+        template = cls._templates.get(row[0])
+        if template is None:
+            raise ValueError(f"Incorrect SHA: {row[0]}")
+        return "    "*(indentation_level) + template.format(*row)
+
+    def iter_chunks(self, indentation_level=0):
+        tabs = "    "*(indentation_level)
+        templates = {sha: tabs+template for sha, template in self._templates.items()}
+
+        for start in range(0, len(self), self.chunk_size):
+            # slice before converting so that only chunk_size rows are ever python objects at once
+            columns = [_as_list(self.columns[key][start:start+self.chunk_size]) for key in self.COLUMNS]
+            try:
+                lines = "\n".join([templates[row[0]].format(*row) for row in zip(*columns)])
+            except KeyError as error:
+                raise ValueError(f"Incorrect SHA: {error.args[0]}") from None
+
+            # lines are separated the same way a parent separates it's children
+            if start > 0:
+                yield "\n"
+            yield lines
+
+class ShapeStream(HtmlComponent):
+    """
+    Shapes that are pulled from a source (any iterable) only while the HTML is being output, and never stored.
+    Add it to an SvgCanvas (see SvgCanvas.add_shapes) to stream any number of shapes straight to a file with flat memory use.
+    Cannot have children HtmlComponents.
+
+    The source can yield:
+        HtmlComponents (CircleShape, ShapeTable, ...), which are output as they are
+        anything with an as_shape_table() method (like s_gen.RandomShapeBatch), output as a ShapeTable
+        anything with an as_html_component() method (like s_gen.RandomShape), output as that HtmlComponent
+
+    Instance Variables:
+        source (Iterable | Callable[[], Iterable]): The shape source. If it is callable, it is called for a fresh iterable every time the stream is output.
+            Otherwise it is iterated directly, so a generator only outputs it's shapes once.
+
+    Note: like the other elements, string() caches the output, so only write_to() / HtmlDocument.output() keep memory flat.
+    An empty source still takes up the line its parent puts it on.
+    """
+    tag = "shapes"
+    __slots__ = ("source",)
+
+    def __init__(self, source, parent: HtmlComponent = None):
+        """
+        Creates a new ShapeStream
+
+        Args:
+            source (Iterable | Callable[[], Iterable]): The shape source
+            parent (HtmlComponent, optional): The parent HtmlComponent. Defaults to None.
+        """
+        super().__init__(parent=parent)
+        self.source = source
+        self.children = None
+
+    def add(self) -> None:
+        '''Cannot add children to a ShapeStream element. If called, this returns None'''
+        return None
+
+    def components(self):
+        """
+        Pulls the shapes from the source as HtmlComponents, one at a time
+
+        Raises:
+            ValueError: If the source yields something that isn't a shape
+
+        Yields:
+            HtmlComponent: The next shape
+        """
+        source = self.source() if callable(self.source) else self.source
+        for shape in source:
+            if isinstance(shape, HtmlComponent):
+                yield shape
+            elif hasattr(shape, "as_shape_table"):
+                yield shape.as_shape_table()
+            elif hasattr(shape, "as_html_component"):
+                yield shape.as_html_component()
+            else:
+                raise ValueError(f"ShapeStream cannot output {type(shape).__name__}")
+
+    def iter_chunks(self, indentation_level=0):
+        first = True
+        for component in self.components():
+            # shapes are separated the same way a parent separates it's children
+            if not first:
+                yield "\n"
+            yield from component.iter_chunks(indentation_level=indentation_level)
+            first = False
+
+def _as_list(column) -> list:
+    '''Converts a column (list or NumPy array) into a list of python values'''
+    if hasattr(column, "tolist"):
+        return column.tolist()
+    return list(column)
+
+def _as_value(value):
+    '''Converts a NumPy scalar into the matching python value'''
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# Parallel Rendering
+
+# a child list is only split across processes once it has at least this many elements. Starting the pool and sending the
+# HTML back costs as much as rendering a few thousand shapes, and 20000 shapes still didn't gain (see benchmarks/bench_parallel.py)
+_PARALLEL_MIN_CHILDREN = 32768
+
+# child lists shared with forked workers. Filled in before the pool starts, so the workers inherit them instead of having them pickled
+_forked_children = []
+_forked_lock = threading.Lock()
+
+def _usable_cpus() -> int:
+    '''how many CPUs this process may run on (which can be fewer than the machine has, like in a container)'''
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError: # not on every platform
+        return os.cpu_count() or 1
+
+def _render_element(element: HtmlComponent, indentation_level: int) -> str:
+    '''renders an element without caching the result (the cache would be thrown away with the worker anyway)'''
+    cache = element._render_cache
+    if cache is not None and cache[0] == indentation_level:
+        return cache[1]
+    return "".join(element.iter_chunks(indentation_level=indentation_level))
+
+def _render_forked_range(list_index: int, start: int, stop: int, indentation_level: int) -> str:
+    '''runs in a forked worker: renders part of a child list the worker inherited'''
+    return "\n".join([_render_element(element, indentation_level) for element in _forked_children[list_index][start:stop]])
+
+def _render_pickled(elements: list, indentation_level: int) -> str:
+    '''runs in a spawned worker: renders elements that were pickled over to it'''
+    return "\n".join([_render_element(element, indentation_level) for element in elements])
+
+class _ParallelRenderer:
+    """
+    Renders an HtmlComponent tree in document order, with the children of any element that has at least _PARALLEL_MIN_CHILDREN
+    of them rendered in chunks by a process pool. Used by HtmlComponent.write_to() and HtmlComponent.string() when given workers.
+
+    Where fork is available the workers inherit the tree and are only sent index ranges, otherwise each chunk of elements is pickled over.
+    There are never more workers than CPUs this process may run on, and with only one everything is rendered in this process:
+    processes taking turns on one CPU only add the cost of the pool.
+    """
+
+    def __init__(self, root: HtmlComponent, workers: int):
+        # only needed for parallel rendering, so not imported with the module
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(workers, _usable_cpus())
+        self.workers = workers
+        self._list_indexes = {}
+        self._big_lists = []
+
+        # find the child lists worth splitting up
+        stack = [root] if workers > 1 else []
+        while stack:
+            element = stack.pop()
+            children = element._children
+            if not children:
+                continue
+            if len(children) >= _PARALLEL_MIN_CHILDREN:
+                self._list_indexes[id(children)] = len(self._big_lists)
+                self._big_lists.append(children)
+            else:
+                stack.extend(children)
+
+        self._forked = "fork" in multiprocessing.get_all_start_methods()
+        self._executor = None
+        if not self._big_lists:
+            return
+
+        if not self._forked:
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context())
+            return
+
+        _forked_lock.acquire()
+        try:
+            _forked_children[:] = self._big_lists
+            self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork"))
+        except BaseException:
+            _forked_children.clear()
+            _forked_lock.release()
+            raise
+
+    def __enter__(self) -> "_ParallelRenderer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        '''shuts the pool down'''
+        if self._executor is None:
+            return
+        self._executor.shutdown()
+        self._executor = None
+        if self._forked:
+            _forked_children.clear()
+            _forked_lock.release()
+
+    def iter_chunks(self, element: HtmlComponent, indentation_level: int):
+        """
+        Yields the HTML for element and it's children as fragments, in document order (the same fragments joined as HtmlComponent.iter_chunks())
+
+        Args:
+            element (HtmlComponent): The element to render
+            indentation_level (int): The indentation of the element
+
+        Yields:
+            str: The next fragment of HTML
+        """
+        cache = element._render_cache
+        if cache is not None and cache[0] == indentation_level:
+            yield cache[1]
+            return
+
+        # only elements using the standard layout can have their children rendered elsewhere
+        if type(element).iter_chunks is not HtmlComponent.iter_chunks or not element._paired or not element._children:
+            yield from element.iter_chunks(indentation_level=indentation_level)
+            return
+
+        yield element._opening_html(indentation_level)
+
+        children = element._children
+        list_index = self._list_indexes.get(id(children))
+        if list_index is None:
+            for child in children:
+                yield "\n"
+                yield from self.iter_chunks(child, indentation_level+1)
+        else:
+            for html in self._render_list(list_index, children, indentation_level+1):
+                yield "\n"
+                yield html
+
+        yield element._closing_html(indentation_level)
+
+    def _render_list(self, list_index: int, children: list, indentation_level: int):
+        '''yields the rendered chunks of a big child list in order, keeping only a few chunks in flight at once'''
+        chunk_size = max(256, len(children) // (self.workers * 8))
+        window = self.workers * 2
+        pending = deque()
+
+        for start in range(0, len(children), chunk_size):
+            stop = start + chunk_size
+            if self._forked:
+                future = self._executor.submit(_render_forked_range, list_index, start, stop, indentation_level)
+            else:
+                future = self._executor.submit(_render_pickled, children[start:stop], indentation_level)
+            pending.append(future)
+
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
 
 
 # Make a SvgCanvas class with tags as svg
@@ -501,13 +1847,22 @@ class SvgCanvas(HtmlComponent):
     Instance Variable:
         size (Size): the size of the canvas
         attributes (Dict[str, str]): HTML Attributes
+        spatial_index (ShapeIndex): A grid over the shape children's bounding boxes for point, rectangle and nearest queries.
+            Built on first use, then kept up to date by add() and remove(). After moving or resizing a shape call
+            spatial_index.update(shape). Shapes in a ShapeTable or ShapeStream child are not indexed.
     
     Methods
         gen_art(self) -> None: Generates the circles required by Assignment Part 1
+        add_shapes(self, source) -> ShapeStream: Adds shapes that are pulled from source only while the canvas is being output
+        cull(self, off_canvas=True, covered=True) -> CullResult: Removes shapes that can't be seen
+        write_tiles(self, directory, tile_size=Size(512, 512), workers=None) -> List[str]: Writes the canvas as a grid of SVG tiles and an index page
+        write_png(self, path, scale=1.0, background=rgb(255, 255, 255)) -> None: Draws the canvas' shapes into a PNG file (needs NumPy)
     
     """
     tag="svg"
-    def __init__(self, size: Size, attributes: Dict[str, str] = {}, **kwargs):
+    __slots__ = ("size", "_spatial_index")
+
+    def __init__(self, size: Size, attributes: Dict[str, str] = None, **kwargs):
         """
         An SVG Html Element
 
@@ -519,14 +1874,165 @@ class SvgCanvas(HtmlComponent):
         Extra keywords are passed to HtmlComponent
         """
         self.size = size
-        self.attributes = attributes
-        super().__init__(**kwargs)
+        self._spatial_index = None # only built when it is first used
+        super().__init__(attributes=attributes, **kwargs)
 
     
+    def _class_attributes(self) -> Dict[str, Any]:
+        return {"width": self.size.width, "height": self.size.height}
+
     def _get_attribute_string(self) -> str:
-        self.attributes["width"] = self.size.width
-        self.attributes["height"] = self.size.height
-        return super()._get_attribute_string()
+        return super()._get_attribute_string(self._class_attributes())
+
+    @property
+    def spatial_index(self) -> ShapeIndex:
+        '''The ShapeIndex over the shape children, built on first use'''
+        if self._spatial_index is None:
+            self._spatial_index = ShapeIndex(self._children or ())
+        return self._spatial_index
+
+    def add(self, element):
+        element = super().add(element)
+        if element is not None and self._spatial_index is not None:
+            self._spatial_index.insert(element)
+        return element
+
+    def _child_removed(self, element) -> None:
+        if self._spatial_index is not None:
+            self._spatial_index.remove(element)
+
+    def _children_removed(self, elements: list) -> None:
+        if self._spatial_index is not None and not self._children:
+            # nothing left to index, so it's cheaper to start over on next use than to take every shape out
+            self._spatial_index = None
+            return
+        super()._children_removed(elements)
+
+    def _children_added(self, elements: list) -> None:
+        if self._spatial_index is not None:
+            for element in elements:
+                self._spatial_index.insert(element)
+
+    def insert_many(self, index: int, elements: Iterable) -> list:
+        if index is not None:
+            # the index keeps shapes in paint order, which inserting before other shapes changes, so it is rebuilt on next use instead
+            self._spatial_index = None
+        return super().insert_many(index, elements)
+
+    def write_tiles(self, directory: str, tile_size: Size = Size(512, 512), workers: int = None) -> list:
+        """
+        Writes the canvas as a grid of standalone SVG tiles, plus an index.html that loads them lazily (see tiles.TiledCanvas)
+
+        Args:
+            directory (str): Where to write the files (created if needed)
+            tile_size (Size, optional): The size of a tile. Defaults to 512x512.
+            workers (int, optional): The number of processes to write tiles in. Defaults to None (write them in this process).
+
+        Returns:
+            List[str]: The paths of the tiles, row by row, followed by the index page
+        """
+        from tiles import TiledCanvas # tiles imports this module, so it can't be imported at the top
+
+        return TiledCanvas(self, tile_size).write(directory, workers=workers)
+
+    def write_png(self, path: str, scale: float = 1.0, background: rgb = rgb(255, 255, 255)) -> None:
+        """
+        Draws the canvas' circles, rectangles and ellipses into a PNG file, for thumbnails and previews (see raster.rasterize)
+
+        Args:
+            path (str): The file to write
+            scale (float, optional): How much to scale the canvas by, like 0.25 for a quarter size thumbnail. Defaults to 1.0.
+            background (rgb, optional): The colour behind the shapes. Defaults to white. None gives a transparent background.
+
+        Raises:
+            ImportError: If NumPy is not installed
+        """
+        from raster import rasterize, write_png # raster imports this module, so it can't be imported at the top
+
+        write_png(path, rasterize(self, scale=scale, background=background))
+
+    def cull(self, off_canvas: bool = True, covered: bool = True) -> CullResult:
+        """
+        Removes shape children that can't be seen, without changing a single pixel of the rendered image:
+        shapes that are entirely outside the canvas, and shapes whose every pixel is covered by one fully opaque shape later in paint order.
+
+        Only plain CircleShape / RectangleShape / EllipseShape children are considered, with no attributes besides an id
+        (anything else could be styled, transformed or stroked into places the test doesn't know about).
+        A canvas with attributes of it's own (like a viewBox) is left alone, as it's coordinates might not be pixels.
+        Shapes in a ShapeTable or ShapeStream child are not culled.
+
+        Args:
+            off_canvas (bool, optional): Remove shapes entirely outside the canvas. Defaults to True.
+            covered (bool, optional): Remove shapes covered by a later opaque shape. Defaults to True.
+
+        Returns:
+            CullResult: How many shapes were removed, in total and for each reason
+        """
+        if not self._children or not _plain(self):
+            return CullResult(0, 0, 0)
+
+        width, height = self.size
+        children = self._children
+        shapes = [(position, element) for position, element in enumerate(children)
+                  if isinstance(element, _CULLABLE) and _plain(element)]
+
+        dropped = set()
+        off_count = 0
+        if off_canvas:
+            for position, element in shapes:
+                x_min, y_min, x_max, y_max = element.bounding_box()
+                if x_max <= 0 or y_max <= 0 or x_min >= width or y_min >= height:
+                    dropped.add(position)
+            off_count = len(dropped)
+
+        covered_count = 0
+        if covered:
+            # every opaque shape can hide the ones painted before it
+            occluders = ShapeIndex()
+            order = {}
+            for position, element in shapes:
+                if position not in dropped and element.fill_opacity >= 1:
+                    occluders.insert(element)
+                    order[element] = position
+
+            for position, element in shapes:
+                if position in dropped:
+                    continue
+                # the pixels the shape touches (anti-aliased edges included), clipped to the canvas
+                x_min, y_min, x_max, y_max = element.bounding_box()
+                x_min, y_min = max(floor(x_min), 0), max(floor(y_min), 0)
+                x_max, y_max = min(ceil(x_max), width), min(ceil(y_max), height)
+                corners = ((x_min, y_min), (x_max, y_min), (x_min, y_max), (x_max, y_max))
+                for occluder in occluders.in_rect(x_min, y_min, x_max, y_max):
+                    # every shape is convex, so covering the corners of the pixel box covers all of it
+                    if order[occluder] > position and all(occluder.contains_point(x, y) for x, y in corners):
+                        dropped.add(position)
+                        covered_count += 1
+                        break
+
+        if dropped:
+            kept = []
+            removed = []
+            for position, element in enumerate(children):
+                (removed if position in dropped else kept).append(element)
+            self._children = ChildList(kept)
+            # takes them out of the spatial index and any element index too
+            self._detach(removed)
+
+        return CullResult(len(dropped), off_count, covered_count)
+
+    def add_shapes(self, source) -> "ShapeStream":
+        """
+        Adds shapes that are pulled from source only while the canvas is being output, so they never all exist in memory at once.
+        See ShapeStream for what the source can yield.
+
+        Args:
+            source (Iterable | Callable[[], Iterable]): The shape source, such as a generator of RandomShapes
+
+        Returns:
+            ShapeStream: The ShapeStream child holding the source
+        """
+        return self.add(ShapeStream(source))
 
     def gen_art(self) -> None:
         '''Generates circles required by Part 1'''
@@ -539,13 +2045,21 @@ class SvgCanvas(HtmlComponent):
             self.add(circle_red)
             self.add(circle_blue)
 
+_CULLABLE = (CircleShape, RectangleShape, EllipseShape)
+_PLAIN_ATTRIBUTES = frozenset(("id",)) # attributes that don't change where (or whether) an element is drawn
+
+def _plain(element: HtmlComponent) -> bool:
+    '''whether element has no attributes that could change where it is drawn'''
+    return not element._attributes or all(name in _PLAIN_ATTRIBUTES for name in element._attributes)
+
 class SvgText(HtmlComponent):
     """
     SVG Text HtmlComponent
 
-    Note: key attributes in attributes Dict are overwritten by corresponding instance variables upon output
+    Note: key attributes in attributes Dict are overridden by corresponding instance variables upon output
     """
     tag = "text"
+    __slots__ = ("x", "y")
 
     def __init__(self, position: Position, content: str = None, indented_content: bool = False, parent: HtmlComponent = None, **kwargs):
         """
@@ -560,14 +2074,14 @@ class SvgText(HtmlComponent):
         self.x = position.x
         self.y = position.y 
         self.indented_content = indented_content
-        self.parent = parent
 
-        super().__init__(content=content, **kwargs)
+        super().__init__(parent=parent, content=content, **kwargs)
+
+    def _class_attributes(self) -> Dict[str, Any]:
+        return {"x": self.x, "y": self.y}
 
     def _get_attribute_string(self) -> str:
-        self.attributes["x"] = self.x
-        self.attributes["y"] = self.y
-        return super()._get_attribute_string()
+        return super()._get_attribute_string(self._class_attributes())
 
     
 if __name__ == "__main__":
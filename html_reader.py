@@ -0,0 +1,579 @@
+"""
+html_reader.py
+
+Reads HTML written by HtmlDocument.output() (or any HtmlComponent's write_to() / string()) back into HtmlComponents, so
+generated files can be re-processed (recoloured, culled, tiled, ...) and written out again. Writing what was read gives
+back exactly the same file.
+
+The file is read a chunk at a time and parsed as it goes: only the elements that are still open (one per level of the
+document) and the text of the current element are held while parsing. read_html() keeps what it reads, so it's memory
+grows with the tree it returns (shape_tables=True keeps runs of plain shapes as ShapeTable columns instead of objects).
+iter_shapes() keeps nothing, so it can pull the shapes out of a file of any size.
+
+Elements come back as the classes that would have written them: SvgCanvas, CircleShape, RectangleShape, EllipseShape,
+SvgText and Comment where the tag and attributes fit (in the order those classes write them), a plain HtmlComponent
+(with the same tag, attributes and content) for anything else, and Raw for loose lines of text between elements.
+HTML void elements (img, br, meta, ...) are always read as unpaired, any other element only when nothing after it's
+opening tag fits it being paired (like HtmlComponent(tag="span", paired=False) writes). Markup that isn't on a line of
+it's own (like "<b>bold</b> text" in a Raw) is kept as text. Compact output (see the compact module) can't be read back.
+One layout writes exactly the same text as another and can't always be told apart: an element with indented_content=False
+whose children are only Raws, starting with an empty one (like Raw("")), inside an element with the same tag, is read as
+an unpaired element.
+
+Usage:
+    doc = read_document("art.html", document_name="recoloured")
+    svg = doc.body.children[0]
+    ...
+    doc.output()
+
+    write_shape_file("art.shapes", iter_shapes("art.html"))
+
+Functions:
+    read_html(source, shape_tables=False, chunk_size=65536) -> HtmlComponent: Reads a file back into an HtmlComponent tree
+    read_document(source, document_name="document", shape_tables=False) -> HtmlDocument: Reads a file written by HtmlDocument.output()
+    iter_shapes(source, chunk_size=65536) -> Iterator[HtmlComponent]: Yields every circle, rectangle and ellipse in a file, keeping nothing
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from html_f import (HtmlDocument, HtmlComponent, SvgCanvas, CircleShape, RectangleShape, EllipseShape, ShapeTable,
+                    SvgText, Comment, Raw, Position, Size, rgb)
+
+# elements that never have a closing tag, always read as unpaired
+_VOID = frozenset(("area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"))
+
+_OPEN_TAG = re.compile(r'<([^\s<>/"=]+)((?: [^\s<>"=]+="[^"]*")*)>\Z')
+_CLOSE_TAG = re.compile(r'</([^\s<>/"=]+)>\Z')
+_ATTRIBUTE = re.compile(r' ([^\s<>"=]+)="([^"]*)"')
+# a tag or comment. Shapes (with nothing between their tags) are matched whole, as they are most of a big file
+_TAG = re.compile(r'<(circle|rect|ellipse)((?: [^\s<>"=]+="[^"]*")*)></\1>|<!--.*?-->|</?[A-Za-z][^<>"]*(?:"[^"]*"[^<>"]*)*>', re.S)
+_CUT_OFF_TAG = re.compile(r'<(?:!-?|/|/?[A-Za-z][^<>"]*(?:"[^"]*"[^<>"]*)*(?:"[^"]*)?)?\Z')
+_RGB = re.compile(r'rgb\(([^,]*), ([^,]*), ([^,)]*)\)\Z')
+
+# the attributes each shape class writes after the attributes Dict, in order
+_SHAPE_ATTRIBUTES = {
+    "circle": ("cx", "cy", "r", "fill", "fill-opacity"),
+    "rect": ("x", "y", "width", "height", "fill", "fill-opacity"),
+    "ellipse": ("cx", "cy", "rx", "ry", "fill", "fill-opacity"),
+}
+_SHAPES = (CircleShape, RectangleShape, EllipseShape)
+
+
+# Tokens
+def _tag_token(source: str) -> tuple:
+    '''a tag as a token: ("open", tag, attributes, source), ("close", tag, source), ("comment", text, source), or ("text", source) if it isn't in the form HtmlComponent writes.
+    _tokens() also makes ("leaf", tag, attributes, source) tokens, for an element with nothing between it's tags'''
+    if source.startswith("<!--"):
+        return ("comment", source[4:-3], source)
+    match = _CLOSE_TAG.match(source)
+    if match:
+        return ("close", match.group(1), source)
+    match = _OPEN_TAG.match(source)
+    if match:
+        pairs = _ATTRIBUTE.findall(match.group(2))
+        attributes = dict(pairs)
+        if len(attributes) == len(pairs): # a repeated attribute couldn't be written back the same
+            return ("open", match.group(1), attributes, source)
+    return ("text", source)
+
+def _first_cut_off(buffer: str, start: int, stop: int) -> int:
+    '''the first "<" between start and stop that starts a tag or comment the end of buffer cuts off, or -1'''
+    index = buffer.find("<", start, stop)
+    while index >= 0:
+        if buffer.startswith("<!--", index):
+            if buffer.find("-->", index + 4) < 0:
+                return index
+        elif _CUT_OFF_TAG.match(buffer, index):
+            return index
+        index = buffer.find("<", index + 1, stop)
+    return -1
+
+def _tokens(file, chunk_size: int) -> Iterator[tuple]:
+    '''splits the file into text and tag tokens, reading it chunk_size characters at a time'''
+    buffer = ""
+    while True:
+        more = file.read(chunk_size)
+        buffer += more
+        position = 0
+        cut = -1
+        for match in _TAG.finditer(buffer):
+            start = match.start()
+            # a tag cut off by the end of the buffer could hide tags inside it (in a comment or attribute value), so stop before it
+            if more:
+                cut = _first_cut_off(buffer, position, start)
+                if cut >= 0:
+                    break
+            if start > position:
+                yield ("text", buffer[position:start])
+            if match.group(1) is None:
+                yield _tag_token(match.group())
+            else:
+                pairs = _ATTRIBUTE.findall(match.group(2))
+                attributes = dict(pairs)
+                source = match.group()
+                if len(attributes) == len(pairs):
+                    yield ("leaf", match.group(1), attributes, source)
+                else:
+                    yield ("text", source)
+            position = match.end()
+        else:
+            if more:
+                cut = _first_cut_off(buffer, position, len(buffer))
+
+        if not more:
+            if position < len(buffer):
+                yield ("text", buffer[position:])
+            return
+        # whatever is cut off is kept for the next chunk
+        end = len(buffer) if cut < 0 else cut
+        if end > position:
+            yield ("text", buffer[position:end])
+        buffer = buffer[end:]
+
+class _Tokens:
+    '''the tokens from _tokens(), with a way to put back tokens that were looked ahead at'''
+    __slots__ = ("tokens", "pending")
+
+    def __init__(self, tokens: Iterator[tuple]):
+        self.tokens = tokens
+        self.pending = deque()
+
+    def __iter__(self) -> "_Tokens":
+        return self
+
+    def __next__(self) -> tuple:
+        if self.pending:
+            return self.pending.popleft()
+        return next(self.tokens)
+
+    def put_back(self, tokens: List[tuple]) -> None:
+        self.pending.extendleft(reversed(tokens))
+
+def _markup_line(tokens: _Tokens, token: tuple) -> Optional[List[tuple]]:
+    '''
+    for a tag that starts a line where a child would: if the element it starts ends on the same line and the line goes on
+    after it (like "<b>bold</b> text" in a Raw), the element's tokens, as the line is text. Otherwise None, and nothing is used up
+    '''
+    seen = []
+    depth = 1 if token[0] == "open" and token[1] not in _VOID else 0
+    while depth:
+        following = next(tokens, None)
+        if following is None:
+            break
+        seen.append(following)
+        if following[0] == "text":
+            if "\n" in following[1]:
+                break # it goes on over more lines, so it's an element
+        elif following[0] == "open" and following[1] not in _VOID:
+            depth += 1
+        elif following[0] == "close":
+            depth -= 1
+
+    if depth == 0:
+        following = next(tokens, None)
+        if following is not None:
+            seen.append(following)
+            if following[0] != "text" or not following[1].startswith("\n"):
+                tokens.put_back(seen[-1:])
+                return [token] + seen[:-1]
+    tokens.put_back(seen)
+    return None
+
+
+# Elements
+def _number(text: str):
+    '''text as an int or float, if writing that number gives back the same text, otherwise None'''
+    if text.isdigit() and text.isascii() and (text[0] != "0" or text == "0"):
+        return int(text) # the usual case, without the round trip check
+    try:
+        value = int(text)
+    except ValueError:
+        try:
+            value = float(text)
+        except ValueError:
+            return None
+    return value if str(value) == text else None
+
+def _colour(text: str) -> Optional[rgb]:
+    '''text as an rgb, if writing it gives back the same text, otherwise None'''
+    match = _RGB.match(text)
+    if match is None:
+        return None
+    values = [_number(value) for value in match.groups()]
+    return None if None in values else rgb(*values)
+
+def _split_attributes(attributes: Dict[str, str], names: tuple):
+    '''(the attributes Dict, the values of names) if attributes ends with names in order, otherwise (None, None)'''
+    keys = tuple(attributes)
+    if keys == names: # no attributes Dict, the usual case
+        return None, list(attributes.values())
+    if keys[-len(names):] != names:
+        return None, None
+    rest = {key: attributes[key] for key in keys[:-len(names)]}
+    return rest or None, [attributes[name] for name in names]
+
+def _shape(tag: str, attributes: Dict[str, str]) -> Optional[HtmlComponent]:
+    '''the CircleShape, RectangleShape or EllipseShape that writes this tag, or None if none does'''
+    rest, values = _split_attributes(attributes, _SHAPE_ATTRIBUTES[tag])
+    if values is None:
+        return None
+    fill, opacity = _colour(values[-2]), _number(values[-1])
+    numbers = [_number(value) for value in values[:-2]]
+    if fill is None or opacity is None or None in numbers:
+        return None
+    if tag == "circle":
+        return CircleShape(Position(numbers[0], numbers[1]), numbers[2], fill, opacity, attributes=rest)
+    if tag == "rect":
+        return RectangleShape(Position(numbers[0], numbers[1]), numbers[2], numbers[3], fill, opacity, attributes=rest)
+    return EllipseShape(Position(numbers[0], numbers[1]), numbers[2], numbers[3], fill, opacity, attributes=rest)
+
+def _element(tag: str, attributes: Dict[str, str], content: Optional[str], indented: bool, children: list) -> HtmlComponent:
+    '''the HtmlComponent (subclass where one fits) that writes an element with this tag, attributes, content and children'''
+    element = None
+    if tag in _SHAPE_ATTRIBUTES and not children and content is None and not indented:
+        element = _shape(tag, attributes)
+    elif tag == "svg":
+        rest, values = _split_attributes(attributes, ("width", "height"))
+        size = None if values is None else [_number(value) for value in values]
+        if size is not None and None not in size:
+            element = SvgCanvas(Size(*size), attributes=rest, content=content, **({} if indented else {"indented_content": False}))
+    elif tag == "text":
+        rest, values = _split_attributes(attributes, ("x", "y"))
+        if values is not None:
+            # x and y are kept as written when they aren't plain numbers (like "50%")
+            x, y = [value if _number(value) is None else _number(value) for value in values]
+            element = SvgText(Position(x, y), content=content, indented_content=indented, attributes=rest)
+
+    if element is None:
+        element = HtmlComponent(tag=tag, attributes=attributes or None, content=content,
+                                indented_content=None if indented else False)
+    element.extend(children)
+    return element
+
+def _raws(text: str, tabs: str) -> list:
+    '''the Raws that write text (each "\\n" and it's lines) between two children at the indentation tabs'''
+    if not text:
+        return []
+    if not text.startswith("\n"):
+        raise ValueError(f"unexpected text {text[:40]!r} between elements")
+    raws = []
+    lines = [] # indented lines, which can all go in one Raw
+    for line in text[1:].split("\n"):
+        if line.startswith(tabs):
+            lines.append(line[len(tabs):])
+            continue
+        if line:
+            raise ValueError(f"text {text[:40]!r} between elements isn't indented like a Raw")
+        # an empty line is something that wrote nothing (like Raw("") or an empty ShapeTable)
+        if lines:
+            raws.append(Raw("\n".join(lines)))
+            lines = []
+        raws.append(Raw(""))
+    if lines:
+        raws.append(Raw("\n".join(lines)))
+    return raws
+
+
+class _Frame:
+    '''an element that has been opened but not closed yet'''
+    __slots__ = ("tag", "attributes", "level", "paired", "started", "first_text", "children", "table")
+
+    def __init__(self, tag: str, attributes: Dict[str, str], level: int):
+        self.tag = tag
+        self.attributes = attributes
+        self.level = level
+        self.paired = None # whether it has a closing tag, decided at the first tag after it (see _unpaired)
+        self.started = False # whether a child has been seen
+        self.first_text = "" # the text between the opening tag and the first child
+        self.children = []
+        self.table = None # the ShapeTable that plain shapes are being collected into (shape_tables only)
+
+
+def _unpaired(frame: _Frame, parent: Optional[_Frame], gap: str, token: tuple) -> bool:
+    '''whether a just opened element is an unpaired one (paired=False, which writes "<tag>\\n" and nothing else),
+    given the text and the tag after it. Otherwise the gap is it's content or the start of it's first child'''
+    if not gap.startswith("\n") or gap[1:2] not in ("", "\n"):
+        return False
+    if token[0] == "close" and token[1] == frame.tag:
+        # it's own closing tag (then the line it starts is indented like the element), unless it is the closing tag of a parent with the same tag
+        return parent is not None and parent.tag == frame.tag and gap[gap.rfind("\n")+1:] != "    "*frame.level
+    # what's left is the parent's, which starts it's own lines. Unless the tag starts a line like a child of this element would
+    return token[0] == "close" or not gap.endswith("\n" + "    "*(frame.level + 1))
+
+
+def _elements(tokens: Iterator[tuple], keep: bool, shape_tables: bool = False) -> Iterator[HtmlComponent]:
+    """
+    Builds elements from tokens, yielding each one once it is closed (so children come before their parent, and the root last)
+
+    Args:
+        tokens (Iterator[tuple]): The tokens from _tokens()
+        keep (bool): Add every element to it's parent. Otherwise elements are only yielded, and the yielded parents have no children.
+        shape_tables (bool, optional): Collect runs of plain shapes into ShapeTables (only when keeping). Defaults to False.
+
+    Raises:
+        ValueError: If the tokens aren't laid out the way HtmlComponent writes them
+
+    Yields:
+        HtmlComponent: The next closed element
+    """
+    tokens = _Tokens(tokens)
+    stack = []
+    text = [] # everything since the last tag that was part of the tree
+    inline = [] # the open tags of markup that is being kept as text
+    done = False
+    after_unpaired = False # an unpaired element is written with a newline after it
+
+    def finished(element: HtmlComponent) -> None:
+        if not keep or not stack:
+            return
+        frame = stack[-1]
+        if shape_tables and type(element) in _SHAPES and not element._attributes:
+            if frame.table is None or frame.children[-1] is not frame.table:
+                frame.table = ShapeTable()
+                frame.children.append(frame.table)
+            frame.table.add_shape(element)
+        else:
+            frame.children.append(element)
+
+    def take_text() -> str:
+        gap = "".join(text)
+        text.clear()
+        if after_unpaired:
+            if not gap.startswith("\n"):
+                raise ValueError("missing the newline after an unpaired element")
+            gap = gap[1:]
+        return gap
+
+    for token in tokens:
+        kind = token[0]
+        if kind == "text":
+            text.append(token[1])
+            continue
+
+        if inline:
+            text.append(token[-1])
+            if kind == "open" and token[1] not in _VOID:
+                inline.append(token[1])
+            elif kind == "close" and token[1] == inline[-1]:
+                inline.pop()
+            continue
+
+        if stack and stack[-1].paired is None:
+            frame = stack[-1]
+            frame.paired = not _unpaired(frame, stack[-2] if len(stack) > 1 else None, "".join(text), token)
+            if not frame.paired:
+                # it wasn't a parent after all, the token (and the text before it) belong to the element above
+                stack.pop()
+                element = HtmlComponent(tag=frame.tag, attributes=frame.attributes or None, paired=False)
+                finished(element)
+                yield element
+                after_unpaired = True
+                if not stack:
+                    done = True
+
+        if done:
+            raise ValueError("there is more than one top level element")
+
+        if not stack:
+            # the top level element, indented by the text before it
+            if kind not in ("open", "leaf"):
+                raise ValueError(f"expected an element, found {token[-1][:40]!r}")
+            indentation = "".join(text)
+            text.clear()
+            if indentation.strip(" ") or len(indentation) % 4:
+                raise ValueError(f"unexpected text {indentation[:40]!r} before the first element")
+            level = len(indentation) // 4
+            if kind == "leaf":
+                yield _element(token[1], token[2], None, False, [])
+                done = True
+            elif token[1] in _VOID:
+                yield HtmlComponent(tag=token[1], attributes=token[2] or None, paired=False)
+                done = after_unpaired = True
+            else:
+                stack.append(_Frame(token[1], token[2], level))
+            continue
+
+        frame = stack[-1]
+        parent_tabs = "    "*frame.level
+        tabs = parent_tabs + "    "
+
+        if kind == "close":
+            if token[1] != frame.tag:
+                text.append(token[-1]) # a stray closing tag, kept as text
+                continue
+            gap = take_text()
+            after_unpaired = False
+            if not frame.started:
+                if gap == "\n" + parent_tabs:
+                    indented, content = True, None
+                elif gap.startswith("\n" + tabs) and gap.endswith("\n" + parent_tabs) and len(gap) >= len(tabs) + len(parent_tabs) + 2:
+                    indented, content = True, gap[len(tabs)+1:len(gap)-len(parent_tabs)-1]
+                else:
+                    indented, content = False, gap or None
+            else:
+                last_line = gap.rfind("\n")
+                indented = last_line >= 0 and gap[last_line+1:] == parent_tabs
+                first = frame.first_text
+                if indented and first and not first.startswith("\n"):
+                    # the content isn't indented, so the last line is an empty one from a last child that wrote nothing (like Raw("")),
+                    # rather than the one the closing tag starts
+                    indented = False
+                if keep:
+                    frame.children.extend(_raws(gap[:last_line] if indented else gap, tabs))
+                if not indented:
+                    content = first or None
+                elif not first:
+                    content = None
+                elif first.startswith("\n" + tabs):
+                    content = first[len(tabs)+1:]
+                else:
+                    # nothing was written as content, it's an empty line from a first child that wrote nothing (like Raw(""))
+                    content = None
+                    if keep:
+                        frame.children[0:0] = _raws(first, tabs)
+
+            stack.pop()
+            element = _element(frame.tag, frame.attributes, content, indented, frame.children)
+            finished(element)
+            yield element
+            if not stack:
+                done = True
+            continue
+
+        # an opening tag, comment or shape, which is a child if it starts a line at the child indentation
+        if len(text) > 1:
+            text[:] = ["".join(text)]
+        if not text or not text[0].endswith("\n" + tabs):
+            text.append(token[-1])
+            if kind == "open" and token[1] not in _VOID:
+                inline.append(token[1])
+            continue
+        line = _markup_line(tokens, token)
+        if line is not None:
+            # markup with text after it on the same line, which is a Raw's text rather than a child
+            text.extend([line_token[-1] for line_token in line])
+            continue
+
+        gap = take_text()[:-len(tabs)-1]
+        if frame.started:
+            raws = _raws(gap, tabs)
+            if keep:
+                frame.children.extend(raws)
+        else:
+            frame.started = True
+            frame.first_text = gap
+        after_unpaired = False
+
+        if kind == "leaf":
+            element = _element(token[1], token[2], None, False, [])
+            finished(element)
+            yield element
+        elif kind == "comment":
+            element = Comment(token[1])
+            finished(element)
+            yield element
+        elif token[1] in _VOID:
+            element = HtmlComponent(tag=token[1], attributes=token[2] or None, paired=False)
+            finished(element)
+            yield element
+            after_unpaired = True
+        else:
+            stack.append(_Frame(token[1], token[2], frame.level + 1))
+
+    if len(stack) == 1 and stack[0].paired is None and "".join(text) == "\n":
+        # the top level element is an unpaired one
+        frame = stack.pop()
+        yield HtmlComponent(tag=frame.tag, attributes=frame.attributes or None, paired=False)
+        done = after_unpaired = True
+    if stack:
+        raise ValueError(f"the file ends before <{stack[-1].tag}> is closed")
+    rest = "".join(text)
+    if not done or rest != ("\n" if after_unpaired else ""):
+        raise ValueError("expected a single top level element" if not done else f"unexpected text {rest[:40]!r} after the last element")
+
+
+def _open(source):
+    '''source as an open text file, and whether it needs closing'''
+    if isinstance(source, str):
+        return open(source, "r"), True
+    return source, False
+
+
+# Reading
+def read_html(source, shape_tables: bool = False, chunk_size: int = 65536) -> HtmlComponent:
+    """
+    Reads HTML written by HtmlComponent.write_to() / string() back into HtmlComponents
+
+    Args:
+        source (str | TextIO): The file name, or an open text file
+        shape_tables (bool, optional): Keep runs of circles, rectangles and ellipses without extra attributes as ShapeTables
+            rather than one object each. Uses far less memory, but the shapes in a table aren't separate children. Defaults to False.
+        chunk_size (int, optional): How many characters are read at once. Defaults to 65536.
+
+    Raises:
+        ValueError: If the file isn't laid out the way HtmlComponent writes HTML, so it couldn't be written back the same
+
+    Returns:
+        HtmlComponent: The top level element, which writes exactly the file that was read (given the indentation_level
+            it was written at, which is read from the file. It is 0 for anything written by HtmlDocument.output())
+    """
+    file, close = _open(source)
+    try:
+        root = None
+        for root in _elements(_tokens(file, chunk_size), keep=True, shape_tables=shape_tables):
+            pass
+        return root
+    finally:
+        if close:
+            file.close()
+
+def read_document(source, document_name: str = "document", shape_tables: bool = False) -> HtmlDocument:
+    """
+    Reads a file written by HtmlDocument.output() back into an HtmlDocument
+
+    Args:
+        source (str | TextIO): The file name, or an open text file
+        document_name (str, optional): The name of the new document, which output() writes to. Defaults to "document".
+        shape_tables (bool, optional): Keep runs of plain shapes as ShapeTables (see read_html). Defaults to False.
+
+    Raises:
+        ValueError: If the file isn't an <html> element with a <head> and <body>, or couldn't be written back the same
+
+    Returns:
+        HtmlDocument: The document
+    """
+    root = read_html(source, shape_tables=shape_tables)
+    children = {child.tag: child for child in reversed(root._children or ()) if type(child) is HtmlComponent}
+    if root.tag != "html" or "head" not in children or "body" not in children:
+        raise ValueError("the file isn't an HTML document with a head and body")
+
+    doc = HtmlDocument(document_name)
+    doc.root, doc.head, doc.body = root, children["head"], children["body"]
+    return doc
+
+def iter_shapes(source, chunk_size: int = 65536) -> Iterator[HtmlComponent]:
+    """
+    Yields every circle, rectangle and ellipse in a file, in document order, without keeping anything else.
+    Memory stays flat however big the file is, so this is the way to move a big file's shapes into a
+    ShapeTable (ShapeTable.from_components) or shape file (shape_file.write_shape_file).
+
+    Args:
+        source (str | TextIO): The file name, or an open text file
+        chunk_size (int, optional): How many characters are read at once. Defaults to 65536.
+
+    Raises:
+        ValueError: If the file isn't laid out the way HtmlComponent writes HTML
+
+    Yields:
+        HtmlComponent: The next CircleShape, RectangleShape or EllipseShape
+    """
+    file, close = _open(source)
+    try:
+        for element in _elements(_tokens(file, chunk_size), keep=False):
+            if type(element) in _SHAPES:
+                yield element
+    finally:
+        if close:
+            file.close()
@@ -0,0 +1,176 @@
+"""
+htmlshapeart.py
+
+The command line entry point. `generate` writes one art page of random shapes, streaming the HTML out while the shapes are
+still being generated, so memory stays flat however many shapes are asked for.
+
+Starting up is kept quick: only the modules needed to write the start of the page are imported before it is written, and
+flushed, so the first bytes go out before NumPy (and s_gen) are even imported. The shapes are generated in the same fixed
+blocks as s_gen.generate_shapes(), so a seed gives the same page whatever the number of --jobs. With --jobs every block is
+generated and rendered in a pool of processes, and written out in order.
+Without NumPy the shapes are generated one RandomShape at a time instead (seeded pages then differ from NumPy ones, and --jobs is not used).
+
+Usage:
+    python -m htmlshapeart generate --count 1000000 --seed 7 --jobs 8 -o out.html
+    python -m htmlshapeart generate --count 500 --sha 0,3 --r 200,255 --op 0.5,1 -o - | gzip > art.html.gz
+
+Functions:
+    main(argv=None) -> int: Runs the command line
+"""
+
+import argparse
+import os
+import sys
+from collections import deque
+
+from html_f import HtmlDocument, HtmlComponent, SvgCanvas, ShapeStream, Comment, Size
+
+# the PyArtConfig ranges that are flags, with what they are for
+_RANGES = {
+    "X": "x position",
+    "Y": "y position",
+    "RAD": "circle radius",
+    "RX": "ellipse x radius",
+    "RY": "ellipse y radius",
+    "W": "rectangle width",
+    "H": "rectangle height",
+    "R": "red",
+    "G": "green",
+    "B": "blue",
+    "OP": "fill opacity",
+}
+
+
+class _Rendered(HtmlComponent):
+    '''HTML rendered ahead of time (by a worker process), output as it is'''
+    __slots__ = ("html",)
+
+    def __init__(self, html: str):
+        super().__init__()
+        self.html = html
+        self.children = None
+
+    def iter_chunks(self, indentation_level=0):
+        yield self.html
+
+
+def _range_type(name: str):
+    '''the argparse type of a "min,max" flag, floats for OP and ints for the rest'''
+    convert = float if name == "OP" else int
+
+    def parse(value: str) -> tuple:
+        parts = value.split(",")
+        try:
+            low, high = convert(parts[0]), convert(parts[1])
+        except (ValueError, IndexError):
+            raise argparse.ArgumentTypeError(f"must be two {convert.__name__}s as min,max") from None
+        if len(parts) != 2 or low > high:
+            raise argparse.ArgumentTypeError("must be min,max with min no larger than max")
+        return (low, high)
+    return parse
+
+def _shape_codes(value: str) -> list:
+    '''the argparse type of --sha'''
+    try:
+        codes = [int(code) for code in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("must be comma separated shape codes") from None
+    if any(code not in (0, 1, 3) for code in codes):
+        raise argparse.ArgumentTypeError("shape codes must be 0 (circle), 1 (rectangle) or 3 (ellipse)")
+    return codes
+
+def _render_block(config_data: dict, size: int, block_seed, indentation_level: int) -> str:
+    '''generates and renders one block of shapes, in a worker process when generating with --jobs'''
+    from html_f import ShapeTable
+    from s_gen import _generate_block
+
+    return "".join(ShapeTable(_generate_block(config_data, size, block_seed)).iter_chunks(indentation_level))
+
+def _shapes(args, config: dict, indentation_level: int, flush):
+    '''the ShapeStream source: flushes what is written so far, then yields the shapes block by block'''
+    flush()
+    # imported only now, NumPy is the slowest part of starting up and nothing before the shapes needs it
+    from random import Random
+    from s_gen import PyArtConfig, iter_random_shapes, _plain_config, _plan_blocks, np
+
+    art_config = PyArtConfig(**config)
+    if np is None:
+        yield from iter_random_shapes(art_config, args.count, Random(args.seed))
+        return
+
+    _, sizes, block_seeds = _plan_blocks(args.count, args.seed)
+    blocks = [(size, block_seed) for size, block_seed in zip(sizes, block_seeds) if size > 0]
+    config_data = _plain_config(art_config)
+
+    if args.jobs is None or args.jobs <= 1 or len(blocks) <= 1:
+        for size, block_seed in blocks:
+            yield _Rendered(_render_block(config_data, size, block_seed, indentation_level))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(max_workers=min(args.jobs, len(blocks)))
+    try:
+        # keep a couple of blocks per process in flight, rather than every rendered block in memory at once
+        pending = deque()
+        for size, block_seed in blocks:
+            pending.append(executor.submit(_render_block, config_data, size, block_seed, indentation_level))
+            if len(pending) >= 2 * args.jobs:
+                yield _Rendered(pending.popleft().result())
+        while pending:
+            yield _Rendered(pending.popleft().result())
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _generate(args) -> int:
+    config = {name: getattr(args, name.lower()) for name in _RANGES if getattr(args, name.lower()) is not None}
+    if args.sha is not None:
+        config["SHA"] = args.sha
+
+    to_stdout = args.output == "-"
+    title = "art" if to_stdout else os.path.splitext(os.path.basename(args.output))[0]
+
+    doc = HtmlDocument(title)
+    doc.head.add(HtmlComponent(tag="title", content=title, indented_content=False))
+    canvas = doc.body.add(SvgCanvas(Size(args.width, args.height)))
+    canvas.add(Comment("Define SVG drawing box"))
+
+    file = sys.stdout if to_stdout else open(args.output, "w")
+    try:
+        # the shapes are children of the canvas, which is in <body> in <html>
+        canvas.add(ShapeStream(_shapes(args, config, 3, file.flush)))
+        doc.root.write_to(file)
+        file.flush()
+    except BrokenPipeError:
+        # whatever was reading stdout stopped (like head), point stdout somewhere harmless so exiting doesn't complain again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        if not to_stdout:
+            file.close()
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="htmlshapeart", description="Generates art from random circles, rectangles and ellipses")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="write an art page of random shapes")
+    generate.add_argument("-o", "--output", default="-", help="file to write the page to, - for stdout (default -)")
+    generate.add_argument("--count", type=int, default=100, help="how many shapes (default 100)")
+    generate.add_argument("--seed", type=int, help="seed for a reproducible page (default unseeded)")
+    generate.add_argument("--jobs", type=int, help="processes to generate and render the shapes in (default 1)")
+    generate.add_argument("--width", type=int, default=500, help="canvas width (default 500)")
+    generate.add_argument("--height", type=int, default=300, help="canvas height (default 300)")
+    generate.add_argument("--sha", type=_shape_codes, metavar="CODES", help="comma separated shapes to use, 0=circle 1=rectangle 3=ellipse (default 0,1,3)")
+    for name, description in _RANGES.items():
+        generate.add_argument(f"--{name.lower()}", type=_range_type(name), metavar="MIN,MAX", help=f"{description} range")
+    args = parser.parse_args(argv)
+
+    if args.count < 0:
+        generate.error("--count can't be negative")
+    return _generate(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,299 @@
+"""
+raster.py
+
+A software rasterizer for SvgCanvases, for thumbnails and previews without a browser. The circles, rectangles and
+ellipses of a canvas are drawn into a NumPy pixel buffer with their fill and fill-opacity, and the pixels can be written
+as a PNG (encoded with zlib and struct from the standard library).
+
+Shapes are drawn front to back: the last shape painted is drawn first, and every pixel remembers how much of what is
+below it can still show through. Once that is too little to change the pixel's 8 bit value, nothing more is drawn there,
+so a big canvas of overlapping shapes only draws the few layers nearest the top. The result is the same as painting
+back to front (within one step of 8 bit rounding).
+
+Every shape is drawn with vectorized NumPy operations over it's bounding box. The edges are anti-aliased from their
+coverage of each pixel, exactly for rectangles and from the distance to the edge for circles and ellipses, which is
+close to how browsers draw them. Only the shapes themselves are drawn: the canvas' own attributes (like a viewBox),
+the attributes Dicts of shapes (like a transform or stroke) and any other elements (like SvgText) are not.
+
+Needs NumPy.
+
+Usage:
+    write_png("thumb.png", rasterize(canvas, scale=0.25))
+    canvas.write_png("art.png")
+
+Functions:
+    shape_columns(source) -> Dict[str, numpy.ndarray]: The shapes of an SvgCanvas (or any shape container) as columns, in paint order
+    rasterize(source, size=None, scale=1.0, background=rgb(255, 255, 255)) -> numpy.ndarray: Draws shapes into an array of pixels
+    png_bytes(pixels, compression_level=6) -> bytes: Encodes pixels as a PNG
+    write_png(path, pixels, compression_level=6) -> None: Writes pixels to a PNG file
+"""
+
+import struct
+import zlib
+from typing import Any, Dict
+
+from html_f import HtmlComponent, SvgCanvas, ShapeTable, ShapeStream, Size, rgb
+from s_gen import np
+
+# a pixel is finished once less than this much of what is below it shows through, less than half of an 8 bit step
+_OPAQUE_ENOUGH = 1 / 512
+# the size of the squares that keep track of which pixels are finished, so shapes over finished pixels are skipped
+_BLOCK = 16
+# how many shapes are checked against the finished squares at once
+_BATCH = 256
+
+
+def _require_numpy(name: str) -> None:
+    if np is None:
+        raise ImportError(f"{name} requires NumPy (pip install numpy)")
+
+
+# Collecting shapes
+def shape_columns(source) -> Dict[str, Any]:
+    """
+    Collects shapes into columns (in ShapeTable.COLUMNS layout), in paint order
+
+    Args:
+        source: An SvgCanvas (it's CircleShape, RectangleShape, EllipseShape, ShapeTable and ShapeStream children),
+            a ShapeTable or ShapeStream, anything with a columns dictionary (like s_gen.RandomShapeBatch or a
+            shape_file.ShapeFile's columns()), or an iterable of shapes
+
+    Raises:
+        ImportError: If NumPy is not installed
+
+    Returns:
+        Dict[str, numpy.ndarray]: One array per column, OP as floats and the rest as integers or floats
+    """
+    _require_numpy("shape_columns")
+    segments = []
+    rows = []
+
+    def flush_rows() -> None:
+        if rows:
+            segments.append({key: np.array(column) for key, column in zip(ShapeTable.COLUMNS, zip(*rows))})
+            rows.clear()
+
+    def collect(item) -> None:
+        if isinstance(item, dict):
+            flush_rows()
+            segments.append({key: np.asarray(item[key]) for key in ShapeTable.COLUMNS})
+        elif isinstance(item, ShapeTable) or isinstance(getattr(item, "columns", None), dict):
+            collect(item.columns)
+        elif isinstance(item, ShapeStream):
+            for component in item.components():
+                collect(component)
+        elif isinstance(item, SvgCanvas):
+            for element in item._children or ():
+                if isinstance(element, (ShapeTable, ShapeStream)) or hasattr(element, "bounding_box"):
+                    collect(element)
+        elif isinstance(item, HtmlComponent):
+            rows.append(ShapeTable.shape_row(item))
+        elif hasattr(item, "as_html_component"):
+            rows.append(ShapeTable.shape_row(item.as_html_component()))
+        else:
+            for shape in item:
+                collect(shape)
+
+    collect(source)
+    flush_rows()
+    if not segments:
+        return {key: np.zeros(0) for key in ShapeTable.COLUMNS}
+    return {key: np.concatenate([segment[key] for segment in segments]) for key in ShapeTable.COLUMNS}
+
+
+# Coverage
+def _edge_coverage(distance, normal_x, normal_y):
+    '''
+    how much of each pixel is inside an edge, treating the edge as a straight line across the pixel.
+    distance is from the pixel's centre to the edge (negative inside) and (normal_x, normal_y) the edge's outward unit normal.
+    The area of a unit square on one side of a line is exact: quadratic while the line cuts a corner, linear between.
+    '''
+    a, b = np.abs(normal_x), np.abs(normal_y)
+    a, b = np.maximum(a, b), np.minimum(a, b) # a >= b, so a is at least 1 / sqrt(2)
+    position = -distance # how far inside the edge the centre is
+    half_sum, half_difference = (a + b) / 2, (a - b) / 2
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # b is 0 for an edge along the pixel's sides, where only the linear part is used (the others are nan and thrown away)
+        corner = (position + half_sum) ** 2 / (2 * a * b) # only a corner of the pixel is inside
+        all_but_corner = 1 - (half_sum - position) ** 2 / (2 * a * b)
+        coverage = np.where(np.abs(position) <= half_difference, 0.5 + position / a, np.where(position < 0, corner, all_but_corner))
+        return np.clip(np.where(position <= -half_sum, 0, np.where(position >= half_sum, 1, coverage)), 0, 1)
+
+def _circle_coverage(cx: float, cy: float, r: float, xs, ys):
+    '''how much of each pixel (centres xs by ys) the circle covers'''
+    dx = (xs - cx)[np.newaxis, :]
+    dy = (ys - cy)[:, np.newaxis]
+    distance = np.sqrt(dx * dx + dy * dy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # the direction doesn't matter at the centre, the pixel is either well inside or the circle is tiny
+        normal_x = np.where(distance > 0, dx / distance, 1)
+        normal_y = np.where(distance > 0, dy / distance, 0)
+    return _edge_coverage(distance - r, normal_x, normal_y)
+
+def _ellipse_coverage(cx: float, cy: float, rx: float, ry: float, xs, ys):
+    '''how much of each pixel the ellipse covers, with the distance to the edge estimated from the gradient of it's equation'''
+    u = ((xs - cx) / rx)[np.newaxis, :]
+    v = ((ys - cy) / ry)[:, np.newaxis]
+    size = np.sqrt(u * u + v * v) # 1 on the edge
+    gradient_x, gradient_y = u / rx, v / ry
+    length = np.sqrt(gradient_x * gradient_x + gradient_y * gradient_y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # (size - 1) / |gradient of size|, the first order distance to the edge
+        distance = np.where(length > 0, (size - 1) * size / length, -np.inf)
+        normal_x = np.where(length > 0, gradient_x / length, 1)
+        normal_y = np.where(length > 0, gradient_y / length, 0)
+    return _edge_coverage(distance, normal_x, normal_y)
+
+def _rectangle_coverage(x: float, y: float, w: float, h: float, x_pixels, y_pixels):
+    '''how much of each pixel (left / top edges x_pixels by y_pixels) the rectangle covers, exactly'''
+    covered_x = np.clip(np.minimum(x + w, x_pixels + 1) - np.maximum(x, x_pixels), 0, 1)
+    covered_y = np.clip(np.minimum(y + h, y_pixels + 1) - np.maximum(y, y_pixels), 0, 1)
+    return covered_y[:, np.newaxis] * covered_x[np.newaxis, :]
+
+
+# Drawing
+def rasterize(source, size: Size = None, scale: float = 1.0, background: rgb = rgb(255, 255, 255)):
+    """
+    Draws the shapes of an SvgCanvas (or any source shape_columns() takes) into an array of pixels
+
+    Args:
+        source: The shapes, see shape_columns()
+        size (Size, optional): The size of the drawing before scaling. Defaults to None (the canvas' size, which is needed for anything else).
+        scale (float, optional): How much to scale everything by, like 0.25 for a quarter size thumbnail. Defaults to 1.0.
+        background (rgb, optional): The colour behind the shapes. Defaults to white (what a browser shows behind an svg).
+            None gives a transparent background, and RGBA pixels.
+
+    Raises:
+        ImportError: If NumPy is not installed
+        ValueError: If there is no size, or it (scaled) is less than a pixel
+
+    Returns:
+        numpy.ndarray: The pixels, (height, width, 3) or (height, width, 4) with a transparent background, as uint8
+    """
+    _require_numpy("rasterize")
+    if size is None:
+        if not isinstance(source, SvgCanvas):
+            raise ValueError("rasterize needs a size for anything but an SvgCanvas")
+        size = source.size
+    width, height = int(round(size.width * scale)), int(round(size.height * scale))
+    if width <= 0 or height <= 0:
+        raise ValueError(f"{size.width}x{size.height} scaled by {scale} is less than a pixel")
+
+    columns = shape_columns(source)
+
+    # drawn front to back: color holds what has been drawn so far (premultiplied), through what still shows through
+    blocks_down, blocks_across = -(-height // _BLOCK), -(-width // _BLOCK)
+    through = np.zeros((blocks_down * _BLOCK, blocks_across * _BLOCK), dtype=np.float32) # the padding is never drawn, so it starts finished
+    through[:height, :width] = 1
+    color = np.zeros((height, width, 3), dtype=np.float32)
+
+    sha = columns["SHA"]
+    x, y = columns["X"] * scale, columns["Y"] * scale
+    opacity = np.clip(columns["OP"].astype(np.float64), 0, 1)
+    fill = np.stack([columns["R"], columns["G"], columns["B"]], axis=1).astype(np.float32)
+
+    # every shape's bounding box, scaled, as (x_min, y_min, x_max, y_max). Anything that draws nothing gets an empty box
+    half_width = np.select([sha == ShapeTable.CIRCLE, sha == ShapeTable.ELLIPSE], [columns["RAD"], columns["RX"]], 0) * scale
+    half_height = np.select([sha == ShapeTable.CIRCLE, sha == ShapeTable.ELLIPSE], [columns["RAD"], columns["RY"]], 0) * scale
+    rectangles = sha == ShapeTable.RECTANGLE
+    box_width, box_height = columns["W"] * scale, columns["H"] * scale
+    x_min = np.where(rectangles, x, x - half_width)
+    y_min = np.where(rectangles, y, y - half_height)
+    x_max = np.where(rectangles, x + box_width, x + half_width)
+    y_max = np.where(rectangles, y + box_height, y + half_height)
+    # a zero radius, width or height draws nothing in SVG (and negative ones are errors)
+    visible = np.where(rectangles, (box_width > 0) & (box_height > 0),
+                       np.where(sha == ShapeTable.CIRCLE, half_width > 0, (half_width > 0) & (half_height > 0)))
+    visible &= np.isin(sha, (ShapeTable.CIRCLE, ShapeTable.RECTANGLE, ShapeTable.ELLIPSE)) & (opacity > 0)
+
+    # the pixels each box touches, clipped to the picture
+    column_start = np.clip(np.floor(x_min), 0, width).astype(np.int64)
+    row_start = np.clip(np.floor(y_min), 0, height).astype(np.int64)
+    column_stop = np.clip(np.ceil(x_max), 0, width).astype(np.int64)
+    row_stop = np.clip(np.ceil(y_max), 0, height).astype(np.int64)
+    visible &= (column_stop > column_start) & (row_stop > row_start)
+
+    order = np.flatnonzero(visible)[::-1]
+    for batch_start in range(0, len(order), _BATCH):
+        # which blocks still need drawing, summed so any box can be checked in one go
+        unfinished = (through.reshape(blocks_down, _BLOCK, blocks_across, _BLOCK).max(axis=(1, 3)) >= _OPAQUE_ENOUGH)
+        if not unfinished.any():
+            break
+        table = np.zeros((blocks_down + 1, blocks_across + 1), dtype=np.int64)
+        table[1:, 1:] = unfinished.cumsum(axis=0).cumsum(axis=1)
+
+        batch = order[batch_start:batch_start + _BATCH]
+        top, left = row_start[batch] // _BLOCK, column_start[batch] // _BLOCK
+        bottom, right = (row_stop[batch] - 1) // _BLOCK + 1, (column_stop[batch] - 1) // _BLOCK + 1
+        needed = table[bottom, right] - table[top, right] - table[bottom, left] + table[top, left] > 0
+
+        for index in batch[needed].tolist():
+            top, bottom, left, right = row_start[index], row_stop[index], column_start[index], column_stop[index]
+            if sha[index] == ShapeTable.RECTANGLE:
+                coverage = _rectangle_coverage(x[index], y[index], box_width[index], box_height[index],
+                                               np.arange(left, right, dtype=np.float32), np.arange(top, bottom, dtype=np.float32))
+            else:
+                xs = np.arange(left, right, dtype=np.float32) + 0.5
+                ys = np.arange(top, bottom, dtype=np.float32) + 0.5
+                if sha[index] == ShapeTable.CIRCLE:
+                    coverage = _circle_coverage(x[index], y[index], half_width[index], xs, ys)
+                else:
+                    coverage = _ellipse_coverage(x[index], y[index], half_width[index], half_height[index], xs, ys)
+
+            alpha = coverage.astype(np.float32) * np.float32(opacity[index])
+            shows_through = through[top:bottom, left:right]
+            color[top:bottom, left:right] += (shows_through * alpha)[:, :, np.newaxis] * fill[index]
+            shows_through *= 1 - alpha
+
+    through = through[:height, :width, np.newaxis]
+    if background is None:
+        coverage = 1 - through
+        with np.errstate(divide="ignore", invalid="ignore"):
+            straight = np.where(coverage > 0, color / coverage, 0)
+        pixels = np.concatenate([straight, coverage * 255], axis=2)
+    else:
+        pixels = color + through * np.array(background, dtype=np.float32)
+    return np.clip(np.rint(pixels), 0, 255).astype(np.uint8)
+
+
+# PNG
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+def png_bytes(pixels, compression_level: int = 6) -> bytes:
+    """
+    Encodes pixels as a PNG, with only the standard library (zlib and struct)
+
+    Args:
+        pixels (numpy.ndarray): (height, width, 3) RGB or (height, width, 4) RGBA uint8 pixels, like from rasterize()
+        compression_level (int, optional): The zlib compression level, 0 to 9. Defaults to 6.
+
+    Raises:
+        ValueError: If pixels isn't RGB or RGBA
+
+    Returns:
+        bytes: The PNG file
+    """
+    height, width, channels = pixels.shape
+    if channels not in (3, 4):
+        raise ValueError(f"PNG pixels need 3 (RGB) or 4 (RGBA) channels, not {channels}")
+    data = pixels.astype("uint8").tobytes()
+
+    stride = width * channels
+    # every row starts with it's filter type, 0 (none)
+    rows = b"".join([b"\x00" + data[start:start + stride] for start in range(0, height * stride, stride)])
+    header = struct.pack(">IIBBBBB", width, height, 8, 2 if channels == 3 else 6, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + _png_chunk(b"IHDR", header)
+            + _png_chunk(b"IDAT", zlib.compress(rows, compression_level)) + _png_chunk(b"IEND", b""))
+
+def write_png(path: str, pixels, compression_level: int = 6) -> None:
+    """
+    Writes pixels to a PNG file
+
+    Args:
+        path (str): The file to write
+        pixels (numpy.ndarray): RGB or RGBA uint8 pixels, like from rasterize()
+        compression_level (int, optional): The zlib compression level, 0 to 9. Defaults to 6.
+    """
+    with open(path, "wb") as file:
+        file.write(png_bytes(pixels, compression_level))
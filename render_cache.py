@@ -0,0 +1,319 @@
+"""
+render_cache.py
+
+A cache for generated shapes and rendered pages, so asking for the same artwork again (same PyArtConfig, count, seed and
+canvas size) doesn't generate and serialize it all over again.
+
+Everything is cached as bytes under a key that is a stable hash (SHA-256) of what went into making it: the config ranges,
+the count, the seed, the canvas size and RENDERER_VERSION. In front is an in-memory LRU that evicts the least recently
+used entries once the cached bytes go over it's size limit, and behind it (optionally) a content addressed store on disk,
+where every entry is a file named after it's key. Entries are written to both, so whatever the LRU evicts is still on disk.
+
+Only seeded work can be cached: without a seed the output is different every time.
+
+Usage:
+    cache = RenderCache(directory=".art_cache", max_memory_bytes=64 * 2**20)
+    html = cache.page_html(GalleryPage("art", PyArtConfig(R=(200, 255)), count=500, seed=7))
+    batch = cache.shapes(PyArtConfig(), 100000, seed=7)
+    print(cache.stats())
+
+Classes:
+    RenderCache: The LRU and disk store, with hit/miss/eviction counters
+Functions:
+    cache_key(kind, **parts) -> str: The stable hash key for a piece of work
+    page_key(page) -> str: The key of a GalleryPage's HTML
+    shapes_key(art_config, count, seed) -> str: The key of a generate_shapes() batch
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+from gallery import GalleryPage, build_page, page_config
+from s_gen import PyArtConfig, RandomShapeBatch, generate_shapes, np
+
+# Part of every key. Bump it whenever html_f or s_gen change their output for the same input, so old entries stop matching.
+RENDERER_VERSION = 2
+
+_CANVAS_SIZE = (500, 300) # the size of gallery pages' SvgCanvas
+
+
+def _config_data(art_config: PyArtConfig) -> Dict[str, list]:
+    '''the config as plain lists, with float ranges always as floats (so OP=(0, 1) and OP=(0.0, 1.0) hash the same)'''
+    data = {}
+    for key, value in art_config.get_config().items():
+        if key == "SHA":
+            # exactly as given: shapes are picked from SHA by index, so it's order and any repeats change the art
+            data[key] = list(value)
+        else:
+            convert = float if value.is_float else int
+            data[key] = [convert(value.min), convert(value.max)]
+    return data
+
+def cache_key(kind: str, **parts) -> str:
+    """
+    Returns the stable hash key for a piece of work
+
+    Args:
+        kind (str): What is being cached (e.g. "page" or "shapes")
+        **parts: Everything the output depends on, as JSON serializable values
+
+    Returns:
+        str: The hex SHA-256 of the kind, the parts and RENDERER_VERSION
+    """
+    description = json.dumps({"kind": kind, "version": RENDERER_VERSION, **parts}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+def page_key(page: GalleryPage) -> str:
+    """
+    Returns the key of a page's HTML (as made by gallery.build_page())
+
+    Args:
+        page (GalleryPage): The page, which must have a seed
+
+    Raises:
+        ValueError: If the page has no seed
+
+    Returns:
+        str: The key
+    """
+    if page.seed is None:
+        raise ValueError("only seeded pages can be cached")
+    art_config = page_config(page)
+    return cache_key("page", title=os.path.basename(page.name), config=_config_data(art_config),
+                     count=page.count, seed=page.seed, size=_CANVAS_SIZE)
+
+def shapes_key(art_config: PyArtConfig, count: int, seed: int) -> str:
+    """
+    Returns the key of a generate_shapes() batch
+
+    Args:
+        art_config (PyArtConfig): The configuration
+        count (int): How many shapes
+        seed (int): The seed
+
+    Raises:
+        ValueError: If seed is None
+
+    Returns:
+        str: The key
+    """
+    if seed is None:
+        raise ValueError("only seeded shapes can be cached")
+    return cache_key("shapes", config=_config_data(art_config), count=count, seed=seed)
+
+
+class RenderCache:
+    """
+    An in-memory LRU of bytes, bounded by size, in front of an optional content addressed store on disk.
+    Safe to share between threads (like art_server's workers). Two threads missing the same key at the same time both
+    render it, and the second put simply replaces the first.
+
+    Instance Variables:
+        directory (str): Where the disk store lives, or None for memory only
+        max_memory_bytes (int): How many bytes the LRU holds before evicting
+        hits (int): Gets answered from memory
+        disk_hits (int): Gets answered from disk (the entry is then moved back into memory)
+        misses (int): Gets that found nothing
+        evictions (int): Entries pushed out of memory to stay under max_memory_bytes
+
+    Methods:
+        get(self, key) -> Optional[bytes]: Returns the cached bytes for key, or None
+        put(self, key, data) -> None: Caches data under key
+        get_or_render(self, key, render) -> bytes: Returns the cached bytes for key, rendering and caching them on a miss
+        page_html(self, page) -> bytes: Returns the HTML of a seeded GalleryPage
+        shapes(self, art_config, count, seed) -> RandomShapeBatch: Returns generate_shapes(art_config, count, seed)
+        clear(self) -> None: Empties the LRU (the disk store is left alone)
+        stats(self) -> Dict[str, int]: Returns the counters and the LRU's size
+    """
+
+    def __init__(self, directory: str = None, max_memory_bytes: int = 64 * 2**20):
+        """
+        Args:
+            directory (str, optional): Where to keep the disk store (created if needed). Defaults to None (memory only).
+            max_memory_bytes (int, optional): How many bytes the LRU holds. Defaults to 64 MiB.
+        """
+        self.directory = directory
+        self.max_memory_bytes = max_memory_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict() # key -> bytes, least recently used first
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    # Disk store
+    def _path(self, key: str) -> str:
+        '''where key lives on disk, fanned out over 256 directories by the first 2 hex digits'''
+        return os.path.join(self.directory, key[:2], key)
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            return # same key, same content
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written to a temporary file and renamed into place, so a reader never sees half an entry
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+
+    # Memory LRU
+    def _remember(self, key: str, data: bytes) -> None:
+        '''puts data in the LRU as the most recently used entry, evicting as needed. Call with the lock held.'''
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        if len(data) > self.max_memory_bytes:
+            return # would evict everything else and still not fit
+        self._entries[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the cached bytes for key
+
+        Args:
+            key (str): The key
+
+        Returns:
+            Optional[bytes]: The cached bytes, or None on a miss
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Caches data under key, in memory and on disk
+
+        Args:
+            key (str): The key
+            data (bytes): The data
+        """
+        if self.directory is not None:
+            self._write_disk(key, data)
+        with self._lock:
+            self._remember(key, data)
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        """
+        Returns the cached bytes for key, calling render() and caching what it returns on a miss
+
+        Args:
+            key (str): The key
+            render (Callable[[], bytes]): Makes the bytes
+
+        Returns:
+            bytes: The cached or freshly rendered bytes
+        """
+        data = self.get(key)
+        if data is None:
+            data = render()
+            self.put(key, data)
+        return data
+
+    def clear(self) -> None:
+        """Empties the LRU, the disk store is left alone"""
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the counters and the LRU's size
+
+        Returns:
+            Dict[str, int]: hits, disk_hits, misses, evictions, entries and memory_bytes
+        """
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._entries), "memory_bytes": self._memory_bytes}
+
+    # Cached work
+    def page_html(self, page: GalleryPage) -> bytes:
+        """
+        Returns the HTML of a page, the same as gallery.build_page(page) would output, as UTF-8
+
+        Args:
+            page (GalleryPage): The page, which must have a seed
+
+        Raises:
+            ValueError: If the page has no seed
+
+        Returns:
+            bytes: The page's HTML
+        """
+        def render() -> bytes:
+            # iter_chunks rather than string(), the cache keeps the bytes so there is no point filling the render cache too
+            return "".join(build_page(page, lazy=True).root.iter_chunks()).encode("utf-8")
+
+        return self.get_or_render(page_key(page), render)
+
+    def shapes(self, art_config: PyArtConfig, count: int, seed: int) -> RandomShapeBatch:
+        """
+        Returns generate_shapes(art_config, count, seed), cached as a NumPy .npz archive of the columns
+
+        Args:
+            art_config (PyArtConfig): The configuration
+            count (int): How many shapes
+            seed (int): The seed
+
+        Raises:
+            ValueError: If seed is None
+            ImportError: If NumPy is not installed
+
+        Returns:
+            RandomShapeBatch: The shapes
+        """
+        if np is None:
+            raise ImportError("RenderCache.shapes requires NumPy (pip install numpy)")
+
+        def render() -> bytes:
+            batch = generate_shapes(art_config, count, seed=seed)
+            buffer = io.BytesIO()
+            np.savez(buffer, **batch.columns)
+            return buffer.getvalue()
+
+        data = self.get_or_render(shapes_key(art_config, count, seed), render)
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            columns = {name: archive[name] for name in archive.files}
+        return RandomShapeBatch(columns, seed=seed)
@@ -0,0 +1,348 @@
+"""
+render_stats.py
+
+Render profiling for html_f (and shape generation in s_gen, if it has been imported).
+
+While a RenderStats is enabled it records, for every HtmlComponent class, how many elements of that class were rendered,
+the time spent rendering them (cumulative: including their children, and own: excluding them) and the HTML characters
+they emitted themselves. It also times HtmlComponent.string(), HtmlComponent.write_to(), HtmlDocument.output(), RandomShape,
+s_gen.generate_shapes() and the blocks of shapes s_gen generates with NumPy (which is how generate_shapes(),
+iter_shape_batches() and htmlshapeart.py generate shapes).
+Elements are counted whether they are rendered by string() or by iter_chunks() (write_to(), output()), but only when they
+are actually rendered: an element whose HTML is reused from the render cache isn't counted, and it's HTML isn't counted
+as it's parent's either.
+
+The hooks are installed by enable() and removed again by disable(), so there is no cost at all while profiling is off.
+Only one RenderStats can be enabled at a time.
+
+Usage:
+    with RenderStats() as stats:
+        doc.output()
+    print(stats.to_json())
+
+Classes:
+    RenderStats: Installs the hooks and holds the statistics
+"""
+
+import json
+import sys
+import threading
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Any
+
+from html_f import HtmlComponent, HtmlDocument
+
+_active = None # the currently enabled RenderStats
+
+
+def _component_classes() -> list:
+    '''HtmlComponent and every subclass defined so far'''
+    classes = [HtmlComponent]
+    for cls in classes:
+        classes.extend(cls.__subclasses__())
+    return classes
+
+
+class RenderStats:
+    """
+    Records render and generation statistics while enabled
+
+    Instance Variables:
+        components (Dict[str, Dict[str, float]]): Per HtmlComponent class name: calls, cumulative_seconds, own_seconds and chars
+        operations (Dict[str, Dict[str, float]]): Per operation (string, write_to, output, generation): calls, cumulative_seconds and where known,
+            chars (HtmlComponent.string), bytes written to the file (HtmlDocument.output) or shapes
+
+    Methods:
+        enable(self) -> None: Installs the hooks
+        disable(self) -> None: Removes the hooks
+        reset(self) -> None: Forgets everything recorded so far
+        as_dict(self) -> Dict: Returns the statistics as a Dict
+        to_json(self, **kwargs) -> str: Returns the statistics as JSON
+    """
+
+    def __init__(self):
+        self.components = {}
+        self.operations = {}
+        self._patched = [] # (owner, name, original attribute) to put back on disable, owners are classes or modules
+        self._local = threading.local()
+
+    def __enter__(self) -> "RenderStats":
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.disable()
+
+    # Recording
+    def _record_component(self, name: str, seconds: float, own_seconds: float, size: int) -> None:
+        stats = self.components.get(name)
+        if stats is None:
+            stats = self.components[name] = {"calls": 0, "cumulative_seconds": 0.0, "own_seconds": 0.0, "chars": 0}
+        stats["calls"] += 1
+        stats["cumulative_seconds"] += seconds
+        stats["own_seconds"] += own_seconds
+        stats["chars"] += size
+
+    def _record_operation(self, name: str, seconds: float, **counts) -> None:
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = {"calls": 0, "cumulative_seconds": 0.0}
+        stats["calls"] += 1
+        stats["cumulative_seconds"] += seconds
+        for key, value in counts.items():
+            stats[key] = stats.get(key, 0) + value
+
+    def _frames(self) -> list:
+        '''this thread's stack of [children seconds, children chars] for the elements being rendered'''
+        frames = getattr(self._local, "frames", None)
+        if frames is None:
+            frames = self._local.frames = []
+        return frames
+
+    # Hooks
+    def _wrap_iter_chunks(self, original):
+        stats = self
+
+        def iter_chunks(element, indentation_level=0):
+            if element is getattr(stats._local, "string_element", None):
+                # string() is rendering the element, and records it itself
+                yield from original(element, indentation_level)
+                return
+
+            frames = stats._frames()
+            frame = [0.0, 0]
+            frames.append(frame)
+            seconds = 0.0
+            size = 0
+            # the cached HTML of children is output as it is (see HtmlComponent.iter_chunks), it isn't this element's own
+            children = element._children
+            reused = {id(child._render_cache[1]) for child in children if child._render_cache is not None} if children else ()
+            reused_size = 0
+            chunks = original(element, indentation_level)
+            try:
+                while True:
+                    # only the time spent producing chunks counts, not the time the consumer spends on them
+                    start = perf_counter()
+                    try:
+                        chunk = next(chunks)
+                    except StopIteration:
+                        seconds += perf_counter() - start
+                        break
+                    seconds += perf_counter() - start
+                    size += len(chunk)
+                    if id(chunk) in reused:
+                        reused_size += len(chunk)
+                    yield chunk
+            finally:
+                chunks.close() # makes sure any child still rendering records itself (and leaves the stack) first
+                frames.pop()
+                if frames:
+                    frames[-1][0] += seconds
+                    frames[-1][1] += size
+                stats._record_component(type(element).__name__, seconds, seconds - frame[0], size - frame[1] - reused_size)
+
+        return iter_chunks
+
+    def _wrap_string(self, original):
+        stats = self
+
+        def string(element, indentation_level=0, workers=None, compact=None):
+            local = stats._local
+            # string() calls string() on the children, only the outermost call is recorded as the operation
+            depth = getattr(local, "string_depth", 0)
+            # every call that renders (rather than returning the cache) is recorded as the element's render: string() renders
+            # the children first and then reuses their HTML, which iter_chunks() alone can't tell apart from the element's own.
+            # Compact and parallel output don't use the cache, they are left to the iter_chunks() hooks
+            cache = element._render_cache
+            renders = not compact and not (workers is not None and workers > 1) and not (cache is not None and cache[0] == indentation_level)
+            if renders:
+                frames = stats._frames()
+                frame = [0.0, 0]
+                frames.append(frame)
+                outer = getattr(local, "string_element", None)
+                local.string_element = element
+
+            local.string_depth = depth + 1
+            start = perf_counter()
+            try:
+                html_string = original(element, indentation_level, workers, compact)
+            finally:
+                seconds = perf_counter() - start
+                local.string_depth = depth
+                if renders:
+                    frames.pop()
+                    local.string_element = outer
+
+            if renders:
+                # the children's chars are theirs, what string() left cached is what went into this element's HTML
+                children = element._children
+                children_size = frame[1]
+                if children:
+                    children_level = indentation_level + 1
+                    children_size += sum([len(child._render_cache[1]) for child in children
+                                          if child._render_cache is not None and child._render_cache[0] == children_level])
+                if frames:
+                    frames[-1][0] += seconds
+                stats._record_component(type(element).__name__, seconds, seconds - frame[0], len(html_string) - children_size)
+            if depth == 0:
+                stats._record_operation("HtmlComponent.string", seconds, chars=len(html_string))
+            return html_string
+
+        return string
+
+    def _wrap_write_to(self, original):
+        stats = self
+
+        def write_to(element, fp, indentation_level=0, workers=None, compact=None):
+            start = perf_counter()
+            original(element, fp, indentation_level, workers, compact)
+            stats._record_operation("HtmlComponent.write_to", perf_counter() - start)
+
+        return write_to
+
+    def _wrap_output(self, original):
+        stats = self
+
+        def position(document) -> int:
+            '''the position in the document's file, which is the number of bytes written to it so far'''
+            if document._file is None:
+                return 0
+            try:
+                return document._file.tell()
+            except (OSError, ValueError):
+                return 0
+
+        def output(document, workers=None, compact=None):
+            before = position(document)
+            start = perf_counter()
+            original(document, workers, compact)
+            seconds = perf_counter() - start
+            stats._record_operation("HtmlDocument.output", seconds, bytes=position(document) - before)
+
+        return output
+
+    def _wrap_random_shape_init(self, original):
+        stats = self
+
+        def __init__(shape, *args, **kwargs):
+            start = perf_counter()
+            original(shape, *args, **kwargs)
+            stats._record_operation("RandomShape", perf_counter() - start, shapes=1)
+
+        return __init__
+
+    def _wrap_generate_shapes(self, original):
+        stats = self
+
+        def generate_shapes(*args, **kwargs):
+            start = perf_counter()
+            batch = original(*args, **kwargs)
+            stats._record_operation("generate_shapes", perf_counter() - start, shapes=len(batch))
+            return batch
+
+        return generate_shapes
+
+    def _wrap_generate_block(self, original):
+        stats = self
+
+        # wraps keeps the name, so generate_shapes(workers=...) can still send it to worker processes (by name, as the original)
+        @wraps(original)
+        def _generate_block(config_data, count, seed_sequence):
+            start = perf_counter()
+            columns = original(config_data, count, seed_sequence)
+            stats._record_operation("s_gen block", perf_counter() - start, shapes=count)
+            return columns
+
+        return _generate_block
+
+    def _patch(self, owner, name: str, wrapper) -> None:
+        original = owner.__dict__[name]
+        self._patched.append((owner, name, original))
+        setattr(owner, name, wrapper(original))
+
+    def _patch_lookups(self, module, name: str, wrapper) -> None:
+        '''patches module.name, and every other module that imported it with from module import name'''
+        original = module.__dict__[name]
+        wrapped = wrapper(original)
+        for owner in list(sys.modules.values()):
+            if getattr(owner, "__dict__", {}).get(name) is original:
+                self._patched.append((owner, name, original))
+                setattr(owner, name, wrapped)
+
+    def enable(self) -> None:
+        """
+        Installs the profiling hooks. Only HtmlComponent classes that exist at this point are profiled, and only the modules
+        imported so far that did from s_gen import generate_shapes have their generate_shapes() profiled.
+
+        Raises:
+            RuntimeError: If a RenderStats is already enabled
+        """
+        global _active
+        if _active is not None:
+            raise RuntimeError("another RenderStats is already enabled")
+        _active = self
+
+        for cls in _component_classes():
+            if "iter_chunks" in cls.__dict__:
+                self._patch(cls, "iter_chunks", self._wrap_iter_chunks)
+        self._patch(HtmlComponent, "string", self._wrap_string)
+        self._patch(HtmlComponent, "write_to", self._wrap_write_to)
+        self._patch(HtmlDocument, "output", self._wrap_output)
+
+        # shape generation is only profiled if s_gen is in use, it isn't imported just for this
+        s_gen = sys.modules.get("s_gen")
+        if s_gen is not None:
+            self._patch(s_gen.RandomShape, "__init__", self._wrap_random_shape_init)
+            # patched wherever it's looked up, most callers have their own reference from from s_gen import generate_shapes
+            self._patch_lookups(s_gen, "generate_shapes", self._wrap_generate_shapes)
+            # looked up in s_gen on every call (htmlshapeart imports it when it renders a block), so this also catches
+            # generation that doesn't go through generate_shapes()
+            self._patch(s_gen, "_generate_block", self._wrap_generate_block)
+
+    def disable(self) -> None:
+        """Removes the profiling hooks, leaving the recorded statistics"""
+        global _active
+        if _active is not self:
+            return
+        for owner, name, original in reversed(self._patched):
+            setattr(owner, name, original)
+        self._patched.clear()
+        _active = None
+
+    def reset(self) -> None:
+        """Forgets everything recorded so far"""
+        self.components.clear()
+        self.operations.clear()
+
+    # Exporting
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Returns the statistics as a Dict
+
+        Returns:
+            Dict[str, Any]: {"components": {class name: stats}, "operations": {operation: stats}}
+        """
+        return {
+            "components": {name: dict(stats) for name, stats in self.components.items()},
+            "operations": {name: dict(stats) for name, stats in self.operations.items()},
+        }
+
+    def to_json(self, **kwargs) -> str:
+        """
+        Returns the statistics as JSON
+
+        Extra keywords are passed to json.dumps
+
+        Returns:
+            str: The statistics
+        """
+        return json.dumps(self.as_dict(), **kwargs)
+
+    def __str__(self) -> str:
+        lines = [f"{'component':>16} {'calls':>9} {'cumulative s':>13} {'own s':>10} {'chars':>12}"]
+        for name, stats in sorted(self.components.items(), key=lambda item: -item[1]["own_seconds"]):
+            lines.append(f"{name:>16} {stats['calls']:>9} {stats['cumulative_seconds']:>13.4f} {stats['own_seconds']:>10.4f} {stats['chars']:>12}")
+        for name, stats in self.operations.items():
+            lines.append(f"{name}: " + ", ".join(f"{key}={value:.4f}" if isinstance(value, float) else f"{key}={value}" for key, value in stats.items()))
+        return "\n".join(lines)
@@ -3,11 +3,16 @@ s(hape)_gen.py
 """
 
 from collections import namedtuple
-from random import randint, uniform
-from html_f import HtmlComponent, CircleShape, RectangleShape, EllipseShape, Position, rgb
-from typing import List, Tuple, Any, Dict
+from random import randint, uniform, Random
+from html_f import HtmlComponent, CircleShape, RectangleShape, EllipseShape, ShapeTable, Position, rgb
+from typing import List, Tuple, Any, Dict, Iterator
 
-RandomRange = namedtuple("RangeTuple", ["min", "max", "is_float"])
+try:
+    import numpy as np
+except ImportError: # numpy is only needed for batch generation (generate_shapes)
+    np = None
+
+RandomRange = namedtuple("RandomRange", ["min", "max", "is_float"])
 def _RandomRange_repr(self) -> str:
     """override to make the tuple print nice"""
     return f"{self.min} to {self.max}{' float' if self.is_float else ''}"
@@ -151,14 +156,20 @@ class RandomShape:
 
     _shape_data = {} # like PyArtConfig, I also write the data to a dictionary for ease of access/formatting
 
-    def __init__(self, art_config: PyArtConfig = PyArtConfig()):
+    def __init__(self, art_config: PyArtConfig = None, rand: Random = None):
         """
         New RandomShape
 
         Args:
             art_config (PyArtConfig, optional): The configuration used to generate the random numbers. Will create a new config using PyArtConfig's defaults if not provided.
+            rand (random.Random, optional): The random number generator to draw from, for reproducible shapes (e.g. random.Random(seed)). Defaults to None (the global random module).
         """
-        self.SHA = art_config.SHA[randint(0, len(art_config.SHA)-1)] # pick a random shape from the list provided
+        # a fresh default config per shape, rather than one built when the module is imported
+        if art_config is None:
+            art_config = PyArtConfig()
+        rand_int, rand_uniform = (randint, uniform) if rand is None else (rand.randint, rand.uniform)
+
+        self.SHA = art_config.SHA[rand_int(0, len(art_config.SHA)-1)] # pick a random shape from the list provided
         self._shape_data = {"SHA": self.SHA}
 
         # pick random shape
@@ -168,14 +179,31 @@ class RandomShape:
             if key == "SHA": # this has already been handled above
                 continue
             if value.is_float == True:
-                new_value = round(uniform(value.min, value.max), 1)
+                new_value = round(rand_uniform(value.min, value.max), 1)
             else:
-                new_value = randint(value.min, value.max)
+                new_value = rand_int(value.min, value.max)
             # from the dictionary, update all instance attributes
             self.__setattr__(key, new_value)
             # also write to 
             self._shape_data[key] = new_value
 
+    @classmethod
+    def from_shape_data(cls, shape_data: Dict[str, Any]) -> "RandomShape":
+        """
+        Creates a RandomShape from already generated values instead of drawing new random ones
+
+        Args:
+            shape_data (Dict[str, int|float]): The shape values, keyed the same way as RandomShape's shape data (SHA, X, Y, ...)
+
+        Returns:
+            RandomShape: The RandomShape holding those values
+        """
+        shape = cls.__new__(cls)
+        shape._shape_data = dict(shape_data)
+        for key, value in shape._shape_data.items():
+            shape.__setattr__(key, value)
+        return shape
+
     def __setattr__(self, name: str, value: Any) -> None:
         """having everything also in a dict makes it super easy to format into a string later"""
         if name in self._shape_data:
@@ -220,6 +248,225 @@ class RandomShape:
         return "".join([f"{key}: {round(value,1) if isinstance(value, float) else value}\n" for key, value in self._shape_data.items()])
             
 
+class RandomShapeBatch:
+    """
+    A batch of random shapes stored column by column (one NumPy array per value) instead of as one RandomShape per shape.
+    Made by generate_shapes().
+
+    Instance Variables:
+        columns (Dict[str, numpy.ndarray]): One array per value, keyed and ordered the same way as RandomShape's shape data (SHA, X, Y, ...)
+        seed (int): The seed the batch was generated from (pass it back to generate_shapes() to get the same shapes again), or None if unknown
+
+    Methods:
+        shape(self, index) -> RandomShape: Returns the shape at index as a RandomShape
+        as_html_component(self, index) -> HtmlComponent: Returns the shape at index as an HtmlComponent
+        shapes(self) -> Iterator[RandomShape]: Yields every shape as a RandomShape, in order
+        html_components(self) -> Iterator[HtmlComponent]: Yields every shape as an HtmlComponent, in order
+        as_shape_table(self) -> ShapeTable: Returns the batch as a single ShapeTable that can be added to an SvgCanvas
+    """
+
+    def __init__(self, columns: Dict[str, Any], seed: int = None):
+        """
+        A batch of random shapes stored column by column
+
+        Args:
+            columns (Dict[str, numpy.ndarray]): One equally sized array per value
+            seed (int, optional): The seed the batch was generated from. Defaults to None.
+        """
+        self.columns = columns
+        self.seed = seed
+
+    def __len__(self) -> int:
+        return len(self.columns["SHA"])
+
+    def shape(self, index: int) -> RandomShape:
+        """
+        Returns the shape at index as a RandomShape
+
+        Args:
+            index (int): The position of the shape in the batch
+
+        Returns:
+            RandomShape: The shape
+        """
+        return RandomShape.from_shape_data({key: column[index].item() for key, column in self.columns.items()})
+
+    def as_html_component(self, index: int) -> HtmlComponent:
+        """
+        Returns the shape at index as an HtmlComponent
+
+        Args:
+            index (int): The position of the shape in the batch
+
+        Returns:
+            HtmlComponent: The converted shape
+        """
+        return self.shape(index).as_html_component()
+
+    def shapes(self) -> Iterator[RandomShape]:
+        """
+        Yields every shape in the batch as a RandomShape, in order
+
+        Yields:
+            RandomShape: The next shape
+        """
+        keys = list(self.columns.keys())
+        # tolist() converts a whole column to python values in one go, which is much faster than .item() per value
+        for row in zip(*[column.tolist() for column in self.columns.values()]):
+            yield RandomShape.from_shape_data(dict(zip(keys, row)))
+
+    def html_components(self) -> Iterator[HtmlComponent]:
+        """
+        Yields every shape in the batch as an HtmlComponent, in order
+
+        Yields:
+            HtmlComponent: The next shape
+        """
+        for shape in self.shapes():
+            yield shape.as_html_component()
+
+    def as_shape_table(self, **kwargs) -> ShapeTable:
+        """
+        Returns the batch as a ShapeTable, which outputs every shape without creating an HtmlComponent per shape.
+        The table shares the batch's arrays rather than copying them.
+
+        Extra keywords are passed to the ShapeTable constructor
+
+        Returns:
+            ShapeTable: The batch as a ShapeTable
+        """
+        return ShapeTable(self.columns, **kwargs)
+
+    __getitem__ = shape
+    __iter__ = shapes
+
+# every batch is generated in blocks of this many shapes, each from it's own random stream derived from the seed.
+# the blocks are the same no matter how many workers generate them, which is what makes a seed reproducible. Changing this changes every seeded artwork
+_BLOCK_SIZE = 65536
+
+def _generate_block(config_data: Dict[str, Any], count: int, seed_sequence) -> Dict[str, Any]:
+    """
+    Generates the columns for one block of shapes. Runs in a worker process when generating in parallel,
+    so it takes the config as plain data (see _plain_config)
+
+    Args:
+        config_data (Dict[str, Any]): The SHA list and (min, max, is_float) tuples for every other value
+        count (int): How many shapes to generate
+        seed_sequence (numpy.random.SeedSequence): The block's random stream
+
+    Returns:
+        Dict[str, numpy.ndarray]: The columns
+    """
+    rng = np.random.default_rng(seed_sequence)
+
+    shape_types = np.asarray(config_data["SHA"])
+    columns = {"SHA": shape_types[rng.integers(0, len(shape_types), size=count)]}
+
+    for key, value in config_data.items():
+        if key == "SHA": # this has already been handled above (and isn't a range, so it can't be unpacked like one)
+            continue
+        minimum, maximum, is_float = value
+        if is_float == True:
+            columns[key] = np.round(rng.uniform(minimum, maximum, size=count), 1)
+        else:
+            columns[key] = rng.integers(minimum, maximum, size=count, endpoint=True)
+
+    return columns
+
+def _plain_config(art_config: PyArtConfig) -> Dict[str, Any]:
+    '''the config as plain lists and tuples, the smallest form to send over to worker processes'''
+    return {key: list(value) if key == "SHA" else tuple(value) for key, value in art_config.get_config().items()}
+
+def _plan_blocks(count: int, seed: int = None) -> tuple:
+    '''splits count shapes into blocks, returning (the seed sequence, the block sizes, each block's seed sequence)'''
+    seed_sequence = np.random.SeedSequence(seed)
+    sizes = [min(_BLOCK_SIZE, count - start) for start in range(0, count, _BLOCK_SIZE)] or [0]
+    return seed_sequence, sizes, seed_sequence.spawn(len(sizes))
+
+def iter_shape_batches(art_config: PyArtConfig, count: int, seed: int = None) -> Iterator[RandomShapeBatch]:
+    """
+    Generates the same shapes as generate_shapes(), but one block at a time, so only one block is ever in memory.
+    Useful as the source for SvgCanvas.add_shapes() to stream huge artworks to a file.
+
+    Args:
+        art_config (PyArtConfig): The configuration used to generate the random numbers
+        count (int): How many shapes to generate in total
+        seed (int, optional): The seed for the random number generator. Defaults to None (a fresh seed, kept in each batch's seed).
+
+    Raises:
+        ImportError: If NumPy is not installed
+
+    Yields:
+        RandomShapeBatch: The next block of shapes
+    """
+    if np is None:
+        raise ImportError("iter_shape_batches requires NumPy (pip install numpy)")
+
+    seed_sequence, sizes, block_seeds = _plan_blocks(count, seed)
+    config_data = _plain_config(art_config)
+
+    for size, block_seed in zip(sizes, block_seeds):
+        if size > 0:
+            yield RandomShapeBatch(_generate_block(config_data, size, block_seed), seed=seed_sequence.entropy)
+
+def iter_random_shapes(art_config: PyArtConfig, count: int = None, rand: Random = None) -> Iterator[RandomShape]:
+    """
+    Generates RandomShapes one at a time, for use as a lazy shape source (see SvgCanvas.add_shapes)
+
+    Args:
+        art_config (PyArtConfig): The configuration used to generate the random numbers
+        count (int, optional): How many shapes to generate. Defaults to None (never stops).
+        rand (random.Random, optional): The random number generator to draw from. Defaults to None (the global random module).
+
+    Yields:
+        RandomShape: The next shape
+    """
+    generated = 0
+    while count is None or generated < count:
+        yield RandomShape(art_config, rand)
+        generated += 1
+
+def generate_shapes(art_config: PyArtConfig, count: int, seed: int = None, workers: int = None) -> RandomShapeBatch:
+    """
+    Generates count random shapes at once with NumPy, drawing each value for a whole block of shapes in a single call.
+    The values follow the same rules as RandomShape (integers are inclusive of max, floats are rounded to 1 decimal place).
+
+    The same seed always gives the same shapes, whatever the number of workers: the shapes are generated in fixed size blocks,
+    each with an independent random stream spawned from the seed, and the workers only decide where each block is generated.
+
+    Args:
+        art_config (PyArtConfig): The configuration used to generate the random numbers
+        count (int): How many shapes to generate
+        seed (int, optional): The seed for the random number generator. Defaults to None (a fresh seed, kept in the batch's seed).
+        workers (int, optional): The number of processes to generate the blocks in. Defaults to None (generate in this process).
+
+    Raises:
+        ImportError: If NumPy is not installed
+
+    Returns:
+        RandomShapeBatch: The generated shapes
+    """
+    if np is None:
+        raise ImportError("generate_shapes requires NumPy (pip install numpy)")
+
+    seed_sequence, sizes, block_seeds = _plan_blocks(count, seed)
+    config_data = _plain_config(art_config)
+
+    if workers is not None and workers > 1 and len(sizes) > 1:
+        # only needed for parallel generation, so not imported with the module
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(sizes))) as executor:
+            blocks = list(executor.map(_generate_block, [config_data]*len(sizes), sizes, block_seeds))
+    else:
+        blocks = [_generate_block(config_data, size, block_seed) for size, block_seed in zip(sizes, block_seeds)]
+
+    if len(blocks) == 1:
+        columns = blocks[0]
+    else:
+        columns = {key: np.concatenate([block[key] for block in blocks]) for key in blocks[0]}
+
+    return RandomShapeBatch(columns, seed=seed_sequence.entropy)
+
 
 if __name__ == "__main__":
     c1 = PyArtConfig(
@@ -0,0 +1,368 @@
+"""
+shape_file.py
+
+A fixed width binary file format for shape sets, so a big set of shapes can be written once and rendered later (or many
+times) without generating it again or ever holding all of it in memory.
+
+A file is a 32 byte header followed by one 40 byte record per shape, all little endian:
+    header: magic b"HSAF", format version (uint16), record size (uint16), record count (uint64), 16 reserved bytes
+    record: SHA (uint8), X, Y, RAD, RX, RY, W, H (int32), R, G, B (uint8), OP (float64), packed without padding
+
+Because every record is the same size, the reader memory maps the file and finds any shape by it's offset. With NumPy
+the columns are views straight onto the mapped file (nothing is copied), so rendering only reads the pages it reaches,
+a block at a time. Without NumPy the records are unpacked with the struct module instead.
+
+OP is always stored as a float, so an integer opacity (fill-opacity="1") comes back as a float (fill-opacity="1.0").
+Only the columns are stored, any extra attributes on CircleShape / RectangleShape / EllipseShape objects are dropped
+(the same as when they are added to a ShapeTable).
+
+Usage:
+    write_shape_file("wall.shapes", generate_shapes(PyArtConfig(), 1000000, seed=7))
+
+    with ShapeFile("wall.shapes") as shapes:
+        canvas.add_shapes(shapes.tables) # streamed a block at a time while the canvas is output
+        doc.output()
+
+Classes:
+    ShapeFileWriter: Appends shapes to a new shape file
+    ShapeFile: A memory mapped shape file
+Functions:
+    write_shape_file(path, *sources, block_size=65536) -> int: Writes shapes to a new shape file
+"""
+
+import mmap
+import struct
+from typing import Any, Dict, Iterator
+
+from html_f import HtmlComponent, ShapeTable, ShapeStream, SvgCanvas, _as_list
+from s_gen import np
+
+MAGIC = b"HSAF"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHQ16x")
+_RECORD = struct.Struct("<B7i3Bd") # ShapeTable.COLUMNS order
+
+# the same layout as _RECORD, as a NumPy structured dtype (numpy is optional)
+_DTYPE = None if np is None else np.dtype([
+    ("SHA", "u1"), ("X", "<i4"), ("Y", "<i4"), ("RAD", "<i4"), ("RX", "<i4"), ("RY", "<i4"), ("W", "<i4"), ("H", "<i4"),
+    ("R", "u1"), ("G", "u1"), ("B", "u1"), ("OP", "<f8"),
+])
+
+
+def _check_column(key: str, column) -> None:
+    '''raises ValueError if a NumPy column can't be stored in it's field without changing it's values'''
+    field = _DTYPE[key]
+    if key == "OP":
+        if column.dtype.kind not in "iuf":
+            raise ValueError(f"OP must be numbers, not {column.dtype}")
+        return
+    if column.dtype.kind not in "iu":
+        # storing 10.0 as 10 would change the output, so only integer columns are accepted
+        raise ValueError(f"{key} must be integers to be stored in a shape file, not {column.dtype}")
+    if len(column) and (column.min() < np.iinfo(field).min or column.max() > np.iinfo(field).max):
+        raise ValueError(f"{key} has values that don't fit in {field}")
+
+
+class ShapeFileWriter:
+    """
+    Writes shapes to a new shape file, a block at a time. The record count in the header is filled in by close(),
+    a file that was never closed reads as empty.
+
+    Use it as a context manager, or call close() when done.
+
+    Instance Variables:
+        path (str): The file being written
+        count (int): How many shapes have been written so far
+        block_size (int): How many rows of a ShapeTable or batch are packed at once
+
+    Methods:
+        write(self, shapes) -> int: Appends shapes, returning how many were written
+        close(self) -> None: Fills in the header and closes the file
+    """
+
+    def __init__(self, path: str, block_size: int = 65536):
+        """
+        Args:
+            path (str): The file to write (replaced if it exists)
+            block_size (int, optional): How many rows are packed at once. Defaults to 65536.
+        """
+        self.path = path
+        self.count = 0
+        self.block_size = block_size
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, _RECORD.size, 0))
+
+    def __enter__(self) -> "ShapeFileWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, shapes) -> int:
+        """
+        Appends shapes to the file, in order
+
+        Args:
+            shapes: Any of
+                a ShapeTable, or a dictionary of columns in ShapeTable's layout
+                anything with a columns dictionary (like s_gen.RandomShapeBatch)
+                a CircleShape, RectangleShape or EllipseShape
+                anything with an as_html_component() method (like s_gen.RandomShape)
+                an SvgCanvas (it's CircleShape, RectangleShape, EllipseShape, ShapeTable and ShapeStream children, anything else is skipped)
+                a ShapeStream (it's shapes)
+                an iterable of any of these
+
+        Raises:
+            ValueError: If a shape isn't a circle, rectangle or ellipse, or a value doesn't fit in it's field
+
+        Returns:
+            int: How many shapes were written
+        """
+        if isinstance(shapes, dict):
+            return self._write_columns(shapes)
+        if isinstance(shapes, ShapeTable) or isinstance(getattr(shapes, "columns", None), dict):
+            return self._write_columns(shapes.columns)
+        if isinstance(shapes, SvgCanvas):
+            # only the shapes, a canvas usually holds other elements too (like gen_art()'s Comment, or SvgText)
+            return self.write([element for element in shapes._children or ()
+                               if isinstance(element, (ShapeTable, ShapeStream)) or hasattr(element, "bounding_box")])
+        if isinstance(shapes, ShapeStream):
+            return self.write(shapes.components())
+        if isinstance(shapes, HtmlComponent):
+            self._write_rows([ShapeTable.shape_row(shapes)])
+            return 1
+        if hasattr(shapes, "as_html_component"):
+            return self.write(shapes.as_html_component())
+
+        written = 0
+        rows = [] # loose shapes are packed together rather than one write each
+        for item in shapes:
+            if isinstance(item, HtmlComponent) and not isinstance(item, (ShapeTable, ShapeStream, SvgCanvas)):
+                rows.append(ShapeTable.shape_row(item))
+                if len(rows) >= self.block_size:
+                    written += self._write_rows(rows)
+                    rows = []
+            else:
+                written += self._write_rows(rows)
+                rows = []
+                written += self.write(item)
+        return written + self._write_rows(rows)
+
+    def _write_rows(self, rows: list) -> int:
+        '''packs rows (tuples in ShapeTable.COLUMNS order) into the file'''
+        try:
+            self._file.write(b"".join([_RECORD.pack(*row) for row in rows]))
+        except struct.error as error:
+            raise ValueError(f"shape can't be stored in a shape file: {error}") from None
+        self.count += len(rows)
+        return len(rows)
+
+    def _write_columns(self, columns: Dict[str, Any]) -> int:
+        '''packs a dictionary of columns into the file a block at a time, with NumPy straight from the arrays when it can'''
+        missing = [key for key in ShapeTable.COLUMNS if key not in columns]
+        if missing:
+            raise ValueError(f"shapes are missing columns: {', '.join(missing)}")
+        length = len(columns["SHA"])
+        numpy_columns = np is not None and all(isinstance(columns[key], np.ndarray) for key in ShapeTable.COLUMNS)
+        if numpy_columns:
+            for key in ShapeTable.COLUMNS:
+                _check_column(key, columns[key])
+
+        for start in range(0, length, self.block_size):
+            stop = min(start + self.block_size, length)
+            if numpy_columns:
+                records = np.empty(stop - start, dtype=_DTYPE)
+                for key in ShapeTable.COLUMNS:
+                    records[key] = columns[key][start:stop]
+                self._file.write(records.tobytes())
+                self.count += stop - start
+            else:
+                self._write_rows(list(zip(*[_as_list(columns[key][start:stop]) for key in ShapeTable.COLUMNS])))
+        return length
+
+    def close(self) -> None:
+        """Fills in the record count and closes the file. Does nothing if it's already closed."""
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._file.write(_HEADER.pack(MAGIC, VERSION, _RECORD.size, self.count))
+        self._file.close()
+
+
+def write_shape_file(path: str, *sources, block_size: int = 65536) -> int:
+    """
+    Writes shapes to a new shape file
+
+    Args:
+        path (str): The file to write (replaced if it exists)
+        *sources: The shapes, anything ShapeFileWriter.write() takes, written one after another
+        block_size (int, optional): How many rows are packed at once. Defaults to 65536.
+
+    Raises:
+        ValueError: If a shape isn't a circle, rectangle or ellipse, or a value doesn't fit in it's field
+
+    Returns:
+        int: How many shapes were written
+    """
+    with ShapeFileWriter(path, block_size=block_size) as writer:
+        for source in sources:
+            writer.write(source)
+    return writer.count
+
+
+class ShapeFile:
+    """
+    A shape file, memory mapped for reading. Nothing is read until it is asked for, and then only the records asked for.
+
+    NumPy arrays from columns() / tables() / as_shape_table() are views onto the mapping, so keep the ShapeFile open while
+    they are in use. If any are still around when the ShapeFile is closed, the mapping is left for them and goes once they do.
+
+    Instance Variables:
+        path (str): The file
+        version (int): The file's format version
+
+    Methods:
+        row(self, index) -> tuple: The record at index, in ShapeTable.COLUMNS order
+        rows(self, start=0, stop=None) -> Iterator[tuple]: Yields the records from start to stop
+        columns(self, start=0, stop=None) -> Dict[str, numpy.ndarray]: The records from start to stop as column views (NumPy only)
+        as_shape_table(self, start=0, stop=None, **kwargs) -> ShapeTable: The records from start to stop as a ShapeTable
+        tables(self, block_size=65536) -> Iterator[ShapeTable]: Yields the whole file as ShapeTables of block_size records
+        close(self) -> None: Unmaps and closes the file
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The file to read
+
+        Raises:
+            ValueError: If the file isn't a shape file, is from a newer version or is shorter than it's header says
+        """
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            header = self._file.read(_HEADER.size)
+            if len(header) < _HEADER.size or header[:4] != MAGIC:
+                raise ValueError(f"{path} is not a shape file")
+            _, self.version, record_size, self._count = _HEADER.unpack(header)
+            if self.version > VERSION or record_size != _RECORD.size:
+                raise ValueError(f"{path} is shape file version {self.version}, which this version can't read")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        if len(self._map) < _HEADER.size + self._count * _RECORD.size:
+            self.close()
+            raise ValueError(f"{path} is cut short, it should hold {self._count} shapes")
+
+    def __enter__(self) -> "ShapeFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _range(self, start: int, stop: int) -> range:
+        '''start and stop clamped to the file, the same way slicing a list clamps them'''
+        return range(self._count)[start:stop]
+
+    def row(self, index: int) -> tuple:
+        """
+        Returns one record
+
+        Args:
+            index (int): The record, negative counts back from the end
+
+        Raises:
+            IndexError: If index is out of range
+
+        Returns:
+            tuple: The record's python values, in ShapeTable.COLUMNS order
+        """
+        index = range(self._count)[index]
+        return _RECORD.unpack_from(self._map, _HEADER.size + index * _RECORD.size)
+
+    def rows(self, start: int = 0, stop: int = None) -> Iterator[tuple]:
+        """
+        Yields the records from start to stop, unpacking them one at a time (no NumPy needed)
+
+        Args:
+            start (int, optional): The first record. Defaults to 0.
+            stop (int, optional): The record to stop before. Defaults to None (the end of the file).
+
+        Yields:
+            tuple: The next record's python values, in ShapeTable.COLUMNS order
+        """
+        records = self._range(start, stop)
+        if not records:
+            return
+        view = memoryview(self._map)[_HEADER.size + records.start * _RECORD.size:_HEADER.size + records.stop * _RECORD.size]
+        try:
+            yield from _RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def columns(self, start: int = 0, stop: int = None) -> Dict[str, Any]:
+        """
+        Returns the records from start to stop as columns, viewing the mapped file rather than copying it
+
+        Args:
+            start (int, optional): The first record. Defaults to 0.
+            stop (int, optional): The record to stop before. Defaults to None (the end of the file).
+
+        Raises:
+            ImportError: If NumPy is not installed
+
+        Returns:
+            Dict[str, numpy.ndarray]: One read only array per name in ShapeTable.COLUMNS
+        """
+        if np is None:
+            raise ImportError("ShapeFile.columns requires NumPy (pip install numpy)")
+        records = self._range(start, stop)
+        array = np.frombuffer(self._map, dtype=_DTYPE, count=len(records), offset=_HEADER.size + records.start * _RECORD.size)
+        return {key: array[key] for key in ShapeTable.COLUMNS}
+
+    def as_shape_table(self, start: int = 0, stop: int = None, **kwargs) -> ShapeTable:
+        """
+        Returns the records from start to stop as a ShapeTable. With NumPy it's columns view the mapped file, so the
+        records are only read (chunk_size at a time) while the table is output. Without NumPy they are unpacked into lists.
+
+        Args:
+            start (int, optional): The first record. Defaults to 0.
+            stop (int, optional): The record to stop before. Defaults to None (the end of the file).
+
+        Extra keywords are passed to the ShapeTable constructor
+
+        Returns:
+            ShapeTable: The table
+        """
+        if np is not None:
+            return ShapeTable(self.columns(start, stop), **kwargs)
+        rows = list(self.rows(start, stop))
+        return ShapeTable({key: list(column) for key, column in zip(ShapeTable.COLUMNS, zip(*rows))} if rows else None, **kwargs)
+
+    def tables(self, block_size: int = 65536) -> Iterator[ShapeTable]:
+        """
+        Yields the whole file as ShapeTables of block_size records. Pass the method itself to SvgCanvas.add_shapes()
+        to stream the file into a canvas every time it is output.
+
+        Args:
+            block_size (int, optional): How many records per table. Defaults to 65536.
+
+        Yields:
+            ShapeTable: The next block's table
+        """
+        for start in range(0, self._count, block_size):
+            yield self.as_shape_table(start, start + block_size)
+
+    def close(self) -> None:
+        """Unmaps and closes the file"""
+        if not self._map.closed:
+            try:
+                self._map.close()
+            except BufferError:
+                pass # NumPy views still use the mapping, it is unmapped once they are gone
+        self._file.close()
@@ -0,0 +1,300 @@
+"""
+spatial_index.py
+
+A uniform grid over the bounding boxes of shapes, for "which shapes cover this point / this rectangle" and "which shapes
+are nearest to this point" without looking at every shape on the canvas.
+
+The canvas is cut into square cells and every shape is listed in each cell its bounding box touches, so a query only
+looks at the shapes in the cells it touches. Anything with a bounding_box() method (CircleShape, RectangleShape and
+EllipseShape) can be indexed, and shapes with a contains_point() method are hit tested exactly by at_point().
+Results are always in the order the shapes were inserted, which for an SvgCanvas is drawing order (last is on top).
+
+Usually used through SvgCanvas.spatial_index, which builds the index on first use and keeps it up to date on add() and remove().
+
+Types / Tuples:
+    Box: A bounding box (x_min, y_min, x_max, y_max)
+Classes:
+    ShapeIndex: The grid
+"""
+
+import heapq
+from collections import namedtuple
+from math import floor, hypot
+from typing import Dict, Iterable, List, Tuple
+
+Box = namedtuple("Box", ["x_min", "y_min", "x_max", "y_max"])
+
+
+def _distance_to_box(x: float, y: float, box: Box) -> float:
+    '''the distance from (x, y) to the nearest point of box, 0 inside it'''
+    dx = max(box.x_min - x, 0, x - box.x_max)
+    dy = max(box.y_min - y, 0, y - box.y_max)
+    return hypot(dx, dy)
+
+
+class ShapeIndex:
+    """
+    A uniform grid of square cells over shape bounding boxes
+
+    Instance Variables:
+        cell_size (float): The width and height of a cell. Pick something around the size of a typical shape.
+
+    Methods:
+        insert(self, shape) -> bool: Adds a shape (returns False for anything without a bounding_box())
+        remove(self, shape) -> None: Takes a shape out
+        update(self, shape) -> None: Re-indexes a shape after it moved or changed size
+        clear(self) -> None: Takes every shape out
+        at_point(self, x, y) -> List: The shapes covering a point
+        in_rect(self, x_min, y_min, x_max, y_max) -> List: The shapes whose bounding box overlaps a rectangle
+        nearest(self, x, y, k=1) -> List: The k shapes whose bounding box is nearest to a point
+        stats(self) -> Dict[str, float]: How full the grid is
+    """
+
+    __slots__ = ("cell_size", "_cells", "_entries", "_next_order", "_extent")
+
+    def __init__(self, shapes: Iterable = (), cell_size: float = 64):
+        """
+        Args:
+            shapes (Iterable, optional): Shapes to insert straight away. Defaults to none.
+            cell_size (float, optional): The width and height of a cell. Defaults to 64.
+        """
+        self.cell_size = cell_size
+        self._cells = {} # (column, row) -> {shape: None}, a dict as an insertion ordered set
+        self._entries = {} # shape -> (insertion order, Box, the cells it is listed in)
+        self._next_order = 0
+        self._extent = None # (min column, min row, max column, max row) of every cell ever used, bounds nearest()'s search
+        for shape in shapes:
+            self.insert(shape)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, shape) -> bool:
+        return shape in self._entries
+
+    def _cell_range(self, box: Box) -> Tuple[int, int, int, int]:
+        '''the (first column, first row, last column, last row) of the cells box touches'''
+        size = self.cell_size
+        return floor(box.x_min / size), floor(box.y_min / size), floor(box.x_max / size), floor(box.y_max / size)
+
+    # Updating
+    def insert(self, shape) -> bool:
+        """
+        Adds a shape to the index. Inserting a shape that is already in the index updates it instead.
+
+        Args:
+            shape (HtmlComponent): The shape, which needs a bounding_box() method
+
+        Returns:
+            bool: True if the shape was indexed, False if it has no bounding box
+        """
+        bounding_box = getattr(shape, "bounding_box", None)
+        if bounding_box is None:
+            return False
+        if shape in self._entries:
+            self.update(shape)
+            return True
+
+        box = Box(*bounding_box())
+        column_min, row_min, column_max, row_max = self._cell_range(box)
+        cells = [(column, row) for column in range(column_min, column_max + 1) for row in range(row_min, row_max + 1)]
+        for cell in cells:
+            members = self._cells.get(cell)
+            if members is None:
+                members = self._cells[cell] = {}
+            members[shape] = None
+
+        self._entries[shape] = (self._next_order, box, cells)
+        self._next_order += 1
+        if self._extent is None:
+            self._extent = (column_min, row_min, column_max, row_max)
+        else:
+            extent = self._extent
+            self._extent = (min(extent[0], column_min), min(extent[1], row_min), max(extent[2], column_max), max(extent[3], row_max))
+        return True
+
+    def remove(self, shape) -> None:
+        """
+        Takes a shape out of the index. Does nothing if it isn't in it.
+
+        Args:
+            shape (HtmlComponent): The shape
+        """
+        entry = self._entries.pop(shape, None)
+        if entry is None:
+            return
+        for cell in entry[2]:
+            members = self._cells[cell]
+            del members[shape]
+            if not members:
+                del self._cells[cell]
+
+    def update(self, shape) -> None:
+        """
+        Re-indexes a shape after it's position or size changed, keeping it's place in the order
+
+        Args:
+            shape (HtmlComponent): The shape
+        """
+        entry = self._entries.get(shape)
+        if entry is None:
+            self.insert(shape)
+            return
+        self.remove(shape)
+        next_order = self._next_order
+        self._next_order = entry[0]
+        try:
+            self.insert(shape)
+        finally:
+            self._next_order = next_order
+
+    def clear(self) -> None:
+        """Takes every shape out of the index"""
+        self._cells.clear()
+        self._entries.clear()
+        self._extent = None
+
+    # Queries
+    def _in_order(self, shapes: Iterable) -> List:
+        '''shapes sorted by insertion order'''
+        entries = self._entries
+        return sorted(shapes, key=lambda shape: entries[shape][0])
+
+    def at_point(self, x: float, y: float) -> List:
+        """
+        Returns the shapes covering a point. Shapes with a contains_point() method are tested exactly,
+        anything else by it's bounding box.
+
+        Args:
+            x (float): The x coordinate
+            y (float): The y coordinate
+
+        Returns:
+            List: The shapes, bottom most first (so the last one is the one on top)
+        """
+        members = self._cells.get((floor(x / self.cell_size), floor(y / self.cell_size)))
+        if not members:
+            return []
+
+        hits = []
+        for shape in members:
+            box = self._entries[shape][1]
+            if not (box.x_min <= x <= box.x_max and box.y_min <= y <= box.y_max):
+                continue
+            contains_point = getattr(shape, "contains_point", None)
+            if contains_point is None or contains_point(x, y):
+                hits.append(shape)
+        return self._in_order(hits)
+
+    def in_rect(self, x_min: float, y_min: float, x_max: float, y_max: float) -> List:
+        """
+        Returns the shapes whose bounding box overlaps a rectangle (touching edges count)
+
+        Args:
+            x_min (float): The left edge
+            y_min (float): The top edge
+            x_max (float): The right edge
+            y_max (float): The bottom edge
+
+        Returns:
+            List: The shapes, bottom most first
+        """
+        column_min, row_min, column_max, row_max = self._cell_range(Box(x_min, y_min, x_max, y_max))
+        if self._extent is not None:
+            # no point looking at cells nothing was ever in, which matters for a huge rectangle over a small canvas
+            column_min, row_min = max(column_min, self._extent[0]), max(row_min, self._extent[1])
+            column_max, row_max = min(column_max, self._extent[2]), min(row_max, self._extent[3])
+
+        found = {}
+        cells = self._cells
+        for column in range(column_min, column_max + 1):
+            for row in range(row_min, row_max + 1):
+                members = cells.get((column, row))
+                if members:
+                    found.update(members)
+
+        entries = self._entries
+        hits = []
+        for shape in found:
+            box = entries[shape][1]
+            if box.x_min <= x_max and box.x_max >= x_min and box.y_min <= y_max and box.y_max >= y_min:
+                hits.append(shape)
+        return self._in_order(hits)
+
+    def nearest(self, x: float, y: float, k: int = 1) -> List:
+        """
+        Returns the k shapes whose bounding box is nearest to a point (0 away if the point is inside it).
+        Searches the cells in rings around the point's cell, stopping once no further ring can hold anything nearer.
+        Only the part of each ring inside the cells ever used is looked at, and the search starts at the first ring that
+        reaches them, so a point far outside the canvas costs no more than one on it's edge.
+
+        Args:
+            x (float): The x coordinate
+            y (float): The y coordinate
+            k (int, optional): How many shapes. Defaults to 1.
+
+        Returns:
+            List: Up to k shapes, nearest first (ties in insertion order)
+        """
+        if k <= 0 or not self._entries:
+            return []
+
+        size = self.cell_size
+        column, row = floor(x / size), floor(y / size)
+        extent = self._extent
+        # the nearest and furthest rings that reach a cell that was ever used
+        first_ring = max(extent[0] - column, extent[1] - row, column - extent[2], row - extent[3], 0)
+        last_ring = max(column - extent[0], row - extent[1], extent[2] - column, extent[3] - row, 0)
+
+        entries = self._entries
+        cells = self._cells
+        seen = set()
+        best = [] # a heap of the k best so far as (-distance, -order, shape), so the worst of them is on top
+        for ring in range(first_ring, last_ring + 1):
+            for cell in self._ring_cells(column, row, ring, extent):
+                for shape in cells.get(cell, ()):
+                    if shape in seen:
+                        continue
+                    seen.add(shape)
+                    order, box, _ = entries[shape]
+                    candidate = (-_distance_to_box(x, y, box), -order, shape) # orders are unique, shapes are never compared
+                    if len(best) < k:
+                        heapq.heappush(best, candidate)
+                    elif candidate[:2] > best[0][:2]:
+                        heapq.heapreplace(best, candidate)
+            # everything in the next ring is at least ring * cell_size away from the point
+            if len(best) == k and -best[0][0] <= ring * size:
+                break
+
+        return [shape for _, _, shape in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _ring_cells(column: int, row: int, ring: int, extent: Tuple[int, int, int, int]) -> Iterable[Tuple[int, int]]:
+        '''the cells exactly ring cells away (Chebyshev distance) from (column, row), that are inside extent'''
+        column_min, row_min, column_max, row_max = extent
+        if ring == 0:
+            yield (column, row)
+            return
+        # the top and bottom edges, corners included
+        first_column, last_column = max(column - ring, column_min), min(column + ring, column_max)
+        for edge_row in (row - ring, row + ring):
+            if row_min <= edge_row <= row_max:
+                for edge_column in range(first_column, last_column + 1):
+                    yield (edge_column, edge_row)
+        # the left and right edges
+        first_row, last_row = max(row - ring + 1, row_min), min(row + ring - 1, row_max)
+        for edge_column in (column - ring, column + ring):
+            if column_min <= edge_column <= column_max:
+                for edge_row in range(first_row, last_row + 1):
+                    yield (edge_column, edge_row)
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Returns how full the grid is, handy for picking a cell_size
+
+        Returns:
+            Dict[str, float]: shapes, cells (in use) and cells_per_shape (on average)
+        """
+        listed = sum(len(entry[2]) for entry in self._entries.values())
+        return {"shapes": len(self._entries), "cells": len(self._cells),
+                "cells_per_shape": listed / len(self._entries) if self._entries else 0.0}
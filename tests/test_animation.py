@@ -0,0 +1,98 @@
+import os
+import pickle
+
+import pytest
+
+from animation import FrameSequence
+from html_f import HtmlDocument, SvgCanvas, CircleShape, RectangleShape, SvgText, Position, Size, rgb
+from render_stats import RenderStats
+
+
+def _document(count=200):
+    doc = HtmlDocument("animation")
+    doc.head.add(SvgText(Position(0, 0), content="title"))
+    canvas = doc.body.add(SvgCanvas(Size(500, 300)))
+    shapes = [canvas.add(CircleShape(Position(i, i), 5, rgb(i, 0, 0))) for i in range(count)]
+    return doc, canvas, shapes
+
+
+def test_frames_are_the_document_with_every_change_so_far():
+    doc, canvas, shapes = _document()
+    sequence = FrameSequence(canvas)
+    for index in range(1, 6):
+        changes = {shapes[index]: {"position": Position(400, index)}}
+        if index % 2:
+            changes[shapes[0]] = {"fill_opacity": index / 10, "radius": index}
+        sequence.add_frame(changes)
+    sequence.add_frame() # the same as the frame before
+    before = doc.root.string()
+
+    expected = []
+    copy = pickle.loads(pickle.dumps(doc.root))
+    copied_shapes = copy.children[1].children[0].children
+    for changes in sequence.frames:
+        for shape, values in changes.items():
+            for name, value in values.items():
+                setattr(copied_shapes[shapes.index(shape)], name, value)
+        expected.append(copy.string())
+
+    with RenderStats() as stats:
+        frames = list(sequence.iter_frames())
+    assert frames == expected and frames[-1] == frames[-2]
+    # only the changed shapes were rendered again, never the rest of the canvas
+    assert stats.components["CircleShape"]["calls"] == 5 + 3
+
+    # the shapes have their base values back
+    assert shapes[1].position == Position(1, 1) and shapes[0].radius == 5
+    assert doc.root.string() == before
+
+
+def test_frame_files(tmp_path):
+    doc, canvas, shapes = _document(3)
+    sequence = FrameSequence(canvas, [{shapes[0]: {"fill": rgb(0, 0, 255)}}, {}])
+    paths = sequence.write_frames(str(tmp_path / "frames"))
+    assert [os.path.basename(path) for path in paths] == ["frame_0000.html", "frame_0001.html"]
+    assert [open(path).read() for path in paths] == list(sequence.iter_frames())
+
+    # a canvas outside of a document is written as standalone SVG files
+    standalone = SvgCanvas(Size(10, 10))
+    circle = standalone.add(CircleShape(Position(1, 1), 1))
+    paths = FrameSequence(standalone, [{circle: {"radius": 2}}]).write_frames(str(tmp_path / "svg"), name="dot")
+    assert [os.path.basename(path) for path in paths] == ["dot_0000.svg"]
+    html = open(paths[0]).read()
+    assert html.startswith('<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10">') and 'r="2"' in html
+
+
+def test_smil_animates_only_what_changes():
+    canvas = SvgCanvas(Size(100, 100))
+    moving = canvas.add(CircleShape(Position(10, 10), 5))
+    still = canvas.add(RectangleShape(Position(1, 2), 3, 4))
+    unchanged = canvas.add(CircleShape(Position(50, 50), 5))
+    sequence = FrameSequence(canvas)
+    sequence.add_frame()
+    sequence.add_frame({moving: {"position": Position(20, 10)}, unchanged: {"radius": 5}})
+    sequence.add_frame({moving: {"fill": rgb(0, 0, 255)}})
+
+    svg = sequence.smil_svg(frame_duration=0.5)
+    assert svg.startswith('<svg xmlns="http://www.w3.org/2000/svg" width="100" height="100">')
+    assert svg.count("<animate ") == 3 # cx, cy and fill: the radius is only set to what it already was
+    assert 'attributeName="cx" values="10;20;20" dur="1.5s" calcMode="discrete" repeatCount="indefinite"' in svg
+    assert 'attributeName="fill" values="rgb(255, 0, 0);rgb(255, 0, 0);rgb(0, 0, 255)"' in svg
+    assert "\n" + still.string(indentation_level=1) + "\n" in svg
+    assert "\n" + unchanged.string(indentation_level=1) + "\n" in svg
+    assert svg == "".join(sequence.smil_chunks(frame_duration=0.5))
+
+    smooth = sequence.smil_svg(frame_duration=0.5, interpolate=True, repeat="2")
+    assert 'dur="1s" calcMode="linear" repeatCount="2"' in smooth
+
+
+def test_only_shape_values_on_the_canvas_can_change():
+    doc, canvas, shapes = _document(2)
+    sequence = FrameSequence(canvas)
+    with pytest.raises(ValueError, match="not CircleShape"):
+        sequence.add_frame({CircleShape(Position(1, 1), 1): {"radius": 2}})
+    with pytest.raises(ValueError, match="not SvgText"):
+        sequence.add_frame({doc.head.children[0]: {"x": 2}})
+    with pytest.raises(ValueError, match="CircleShape.tag can't change"):
+        sequence.add_frame({shapes[0]: {"tag": "rect"}})
+    assert len(sequence) == 0
@@ -0,0 +1,74 @@
+import http.client
+import threading
+import time
+from urllib.parse import parse_qs
+
+import pytest
+
+from art_server import ArtServer, ArtRequestHandler, page_from_query
+from gallery import build_page
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(ArtRequestHandler, "quiet", True)
+    art_server = ArtServer(("127.0.0.1", 0), workers=2)
+    thread = threading.Thread(target=art_server.serve_forever, kwargs={"poll_interval": 0.05})
+    thread.start()
+    yield art_server
+    art_server.shutdown()
+    thread.join()
+    art_server.server_close()
+
+
+def _expected(query: str) -> bytes:
+    return build_page(page_from_query(parse_qs(query))).root.string().encode("utf-8")
+
+
+def _connect(server) -> http.client.HTTPConnection:
+    return http.client.HTTPConnection(*server.server_address, timeout=10)
+
+
+def test_concurrent_requests_get_complete_chunked_pages(server):
+    queries = ["count=3000&seed=7", "count=2000&seed=8&R=200,255"]
+    connections = [_connect(server) for _ in queries]
+    # both requests are sent before either response is read, so the two pages are rendered at the same time
+    for connection, query in zip(connections, queries):
+        connection.request("GET", "/art?" + query)
+    for connection, query in zip(connections, queries):
+        response = connection.getresponse()
+        assert response.status == 200
+        assert response.getheader("Transfer-Encoding") == "chunked"
+        assert response.read() == _expected(query) # http.client raises IncompleteRead on a broken chunk
+        connection.close()
+
+
+def test_idle_keep_alive_connections_dont_hold_workers(server):
+    # more idle keep-alive connections than workers, each after one answered request
+    idle = [_connect(server) for _ in range(4)]
+    for connection in idle:
+        connection.request("GET", "/art?count=1&seed=1")
+        assert connection.getresponse().read() == _expected("count=1&seed=1")
+
+    start = time.monotonic()
+    other = _connect(server)
+    other.request("GET", "/art?count=5&seed=2")
+    assert other.getresponse().read() == _expected("count=5&seed=2")
+    assert time.monotonic() - start < 5 # rather than waiting for an idle connection to time out
+    other.close()
+
+    # and the idle connections still work
+    for connection in idle:
+        connection.request("GET", "/art?count=5&seed=3")
+        assert connection.getresponse().read() == _expected("count=5&seed=3")
+        connection.close()
+
+
+def test_idle_connections_are_closed_after_the_keep_alive_timeout(server):
+    server.keep_alive_timeout = 0.2
+    connection = _connect(server)
+    connection.request("GET", "/art?count=1&seed=1")
+    connection.getresponse().read()
+    time.sleep(0.6)
+    assert connection.sock.recv(1) == b"" # closed by the server
+    connection.close()
@@ -0,0 +1,28 @@
+import json
+
+from benchmarks.bench_suite import compare, main
+
+
+def test_results_are_saved_and_compared(tmp_path, capsys):
+    saved = tmp_path / "results.json"
+    assert main(["--max-count", "1000", "--repeat", "1", "--only", "generation", "serialize", "memory", "file_write",
+                 "--output", str(saved)]) == 0
+    report = json.loads(saved.read_text())
+    assert report["meta"]["max_count"] == 1000
+    results = report["results"]
+    assert {"serialize[n=100]", "serialize[n=1000]", "memory.string[n=1000]", "file_write[n=1000]"} <= set(results)
+    assert all(value > 0 for metrics in results.values() for value in metrics.values())
+
+    # a run against a much slower baseline passes
+    slow = {name: {metric: value * 100 for metric, value in metrics.items()} for name, metrics in results.items()}
+    (tmp_path / "slow.json").write_text(json.dumps({"results": slow}))
+    assert main(["--max-count", "100", "--repeat", "1", "--only", "serialize", "--baseline", str(tmp_path / "slow.json")]) == 0
+    assert "REGRESSION" not in capsys.readouterr().out
+
+
+def test_only_lower_is_better_metrics_can_regress(capsys):
+    baseline = {"a": {"total_seconds": 1.0, "peak_bytes": 100, "shapes_per_second": 10.0}}
+    assert compare({"a": {"total_seconds": 1.05, "peak_bytes": 100, "shapes_per_second": 1.0}}, baseline, 0.10)
+    assert not compare({"a": {"total_seconds": 1.0, "peak_bytes": 120, "shapes_per_second": 10.0}}, baseline, 0.10)
+    assert [line.split()[1] for line in capsys.readouterr().out.splitlines() if "REGRESSION" in line] == ["peak_bytes"]
+    assert compare({"b": {"total_seconds": 5.0}}, baseline, 0.10) # nothing to compare a new result against
@@ -0,0 +1,34 @@
+import pytest
+
+from compact import Compact
+from html_f import HtmlComponent, SvgCanvas, CircleShape, ShapeTable, Position, Size, rgb
+
+
+def _canvas(**attributes):
+    canvas = SvgCanvas(Size(100, 100))
+    group = canvas.add(HtmlComponent(tag="g", attributes=attributes))
+    group.add(CircleShape(Position(1, 2), 3, rgb(255, 0, 0), 1.0))
+    group.add(CircleShape(Position(4, 5), 6, rgb(255, 0, 0), 1.0))
+    group.add(ShapeTable.from_components([CircleShape(Position(7, 8), 9, rgb(255, 0, 0), 1.0)]))
+    return canvas, group
+
+
+@pytest.mark.parametrize("group", [None, "g", "css"])
+def test_default_fill_opacity_is_kept_under_an_ancestor_that_sets_one(group):
+    canvas, _ = _canvas(**{"fill-opacity": "0.5"})
+    html = canvas.string(compact=Compact(group=group))
+    # the <g>'s own, then every shape's, the <g fill=".."> around the run or the class's
+    assert html.count("fill-opacity") == {None: 4, "g": 2, "css": 2}[group]
+    assert html.count("fill-opacity=\"1\"") + html.count("fill-opacity:1") == {None: 3, "g": 1, "css": 1}[group]
+
+
+@pytest.mark.parametrize("group", [None, "g", "css"])
+def test_default_fill_opacity_is_left_out_otherwise(group):
+    canvas, group_element = _canvas()
+    assert "fill-opacity" not in canvas.string(compact=Compact(group=group))
+    assert "fill-opacity" not in group_element.string(compact=Compact(group=group))
+
+
+def test_subtree_keeps_fill_opacity_set_above_it():
+    canvas, group = _canvas(style="fill-opacity: .5")
+    assert group.string(compact=True).count("fill-opacity=\"1\"") == 3
@@ -0,0 +1,114 @@
+import pytest
+
+from element_index import parse_selector
+from html_f import HtmlComponent, HtmlDocument, SvgCanvas, CircleShape, RectangleShape, SvgText, Position, Size, rgb
+
+
+def _document():
+    doc = HtmlDocument("index")
+    canvas = doc.body.add(SvgCanvas(Size(100, 100), attributes={"id": "art"}))
+    group = canvas.add(HtmlComponent(tag="g", attributes={"class": "layer big"}))
+    shapes = {
+        "sun": group.add(CircleShape(Position(10, 10), 5, rgb(255, 0, 0), attributes={"id": "sun", "class": "big"})),
+        "moon": group.add(CircleShape(Position(20, 20), 3, rgb(0, 0, 255))),
+        "box": canvas.add(RectangleShape(Position(1, 2), 3, 4, rgb(255, 0, 0), attributes={"class": "big"})),
+        "label": canvas.add(SvgText(Position(0, 0), content="label")),
+    }
+    return doc, canvas, group, shapes
+
+
+def _walk(element):
+    yield element
+    for child in element.children:
+        if isinstance(child, HtmlComponent):
+            yield from _walk(child)
+
+
+def test_lookups():
+    doc, canvas, group, shapes = _document()
+    sun, moon, box, label = shapes.values()
+
+    assert doc.find_by_id("sun") is sun and doc.find_by_id("art") is canvas and doc.find_by_id("nothing") is None
+    assert doc.find_all(tag="circle") == [sun, moon]
+    assert doc.find_all(attr={"fill": rgb(255, 0, 0)}) == [sun, box] # compared as the HTML writes them
+    assert doc.find_all(tag="rect", attr={"fill": rgb(255, 0, 0)}) == [box]
+    assert doc.find_all(attr={"r": None}) == [sun, moon]
+    assert canvas.find_all(tag="svg") == [canvas]
+
+    assert doc.select(".big") == [group, sun, box]
+    assert doc.select("g circle") == [sun, moon]
+    assert doc.select("svg > circle") == []
+    assert doc.select("svg > .big") == [group, box]
+    assert doc.select("#art text, g > #sun") == [label, sun]
+    assert doc.select("circle[fill='rgb(0, 0, 255)']") == [moon]
+    assert doc.select('g.layer.big > circle[r="5"]') == [sun]
+    assert doc.select("*") == list(_walk(doc.root))
+    assert doc.select_one("circle") is sun and doc.select_one("ellipse") is None
+    # elements above the subtree count when matching, like querySelectorAll()
+    assert group.select("svg circle") == [sun, moon]
+
+
+def test_index_follows_changes():
+    doc, canvas, group, shapes = _document()
+    sun, moon, box, label = shapes.values()
+    assert doc.find_all(attr={"cx": 20}) == [moon] # builds the cx index
+
+    moon.set_attribute("id", "moon")
+    sun.set_attribute("class", "small")
+    assert doc.find_by_id("moon") is moon
+    assert doc.select(".big") == [group, box] and doc.select(".small") == [sun]
+
+    # class specific attributes change with the instance variables they come from
+    moon.position = Position(30, 20)
+    assert doc.find_all(attr={"cx": 20}) == [] and doc.find_all(attr={"cx": 30}) == [moon]
+    label.tag = "title"
+    assert doc.find_all(tag="text") == [] and doc.find_all(tag="title") == [label]
+
+    group.remove()
+    assert doc.find_by_id("sun") is None and doc.find_all(tag="circle") == []
+    assert doc.select(".layer") == []
+    star = CircleShape(Position(5, 5), 1, attributes={"id": "star"})
+    group.add(star) # changing a removed subtree doesn't touch the document's index
+    assert doc.find_by_id("star") is None
+
+    canvas.extend([group])
+    assert doc.find_all(tag="circle") == [sun, moon, star] and doc.find_by_id("star") is star
+    assert doc.find_all(attr={"cx": 30}) == [moon]
+
+
+def test_rebuild_after_changing_children_directly():
+    doc, canvas, group, shapes = _document()
+    assert doc.find_all(tag="rect") == [shapes["box"]]
+    canvas.children.remove(shapes["box"])
+    assert doc.find_all(tag="rect") == [shapes["box"]] # the index can't see this
+    doc.root.element_index.rebuild()
+    assert doc.find_all(tag="rect") == []
+
+
+def test_selector_parsing():
+    alternatives = parse_selector(' svg > g.a.b  circle#sun[fill="rgb(1, 2, 3)"][r], *[x=y] ')
+    assert [[combinator for combinator, _ in steps] for steps in alternatives] == [[None, ">", " "], [None]]
+    svg, group, circle = (compound for _, compound in alternatives[0])
+    assert (svg.tag, group.tag, group.classes) == ("svg", "g", ["a", "b"])
+    assert (circle.tag, circle.id, circle.attributes) == ("circle", "sun", [("fill", "rgb(1, 2, 3)"), ("r", None)])
+    everything = alternatives[1][0][1]
+    assert (everything.tag, everything.attributes) == (None, [("x", "y")])
+
+
+@pytest.mark.parametrize("selector, reason", [
+    ("", "ends without an element"),
+    ("circle,", "ends without an element"),
+    ("circle >", "ends without an element"),
+    ("> circle", "nothing before '>'"),
+    (", circle", "empty alternative"),
+    ("circle,, rect", "empty alternative"),
+    (".big circle.x[r]rect", "the tag has to come first"),
+    ("circle:hover", "at ':hover'"),
+    ("circle[r", "at '\\[r'"),
+])
+def test_unsupported_selectors(selector, reason):
+    with pytest.raises(ValueError, match=reason):
+        parse_selector(selector)
+    doc = _document()[0]
+    with pytest.raises(ValueError):
+        doc.select(selector)
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from gallery import GalleryPage, render_gallery, main
+
+
+def test_bad_config_only_fails_its_own_page(tmp_path):
+    jobs = tmp_path / "jobs.json"
+    jobs.write_text(json.dumps([
+        {"name": "good", "count": 5, "seed": 1},
+        {"name": "bad", "config": {"NOT_A_SETTING": [5]}, "count": 5, "seed": 2},
+        {"name": "also_good", "config": {"R": [200, 255]}, "count": 5, "seed": 3},
+    ]))
+    assert main(["--jobs", str(jobs), "--directory", str(tmp_path), "--workers", "1"]) == 1
+    assert (tmp_path / "good.html").exists()
+    assert (tmp_path / "also_good.html").exists()
+    assert not (tmp_path / "bad.html").exists()
+
+
+def test_pages_written_to_the_same_file_are_rejected(tmp_path):
+    pages = [GalleryPage("art", count=1, seed=1), GalleryPage("art.html", count=1, seed=2)]
+    with pytest.raises(ValueError, match="art.html"):
+        render_gallery(pages, workers=1, directory=str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,423 @@
+import asyncio
+import io
+import pickle
+import time
+from random import Random
+
+import pytest
+
+import html_f
+from html_f import HtmlComponent, HtmlDocument, ChildList, SvgCanvas, CircleShape, RectangleShape, EllipseShape, SvgText, Comment, Raw, ShapeTable, Position, Size, rgb
+
+
+def _uncached(element):
+    return pickle.loads(pickle.dumps(element)).string()
+
+
+def test_changed_children_are_spliced_into_cached_html():
+    root = HtmlComponent(tag="html")
+    canvas = root.add(SvgCanvas(Size(500, 300)))
+    shapes = [canvas.add(CircleShape(Position(i, i), 3)) for i in range(300)]
+    root.string()
+    assert canvas._child_spans is not None
+
+    shapes[10].position = Position(1000, 2000)
+    shapes[200].set_attribute("id", "moved")
+    shapes[5].radius = 7
+    assert root.string() == _uncached(root)
+    assert canvas._child_spans is not None
+
+    shapes[299].radius = 12345
+    assert root.string() == _uncached(root)
+
+    # the canvas' own tag changing (or a child being removed) renders it again
+    canvas.size = Size(10, 10)
+    shapes[0].remove()
+    assert root.string() == _uncached(root)
+
+
+def test_attributes_change_only_through_the_element():
+    root = HtmlComponent(tag="html")
+    canvas = root.add(SvgCanvas(Size(500, 300)))
+    circle = canvas.add(CircleShape(Position(1, 2), 3, attributes={"class": "a"}))
+    root.string()
+    assert root.select_one("circle.a") is circle
+
+    # the view can't be changed, and it follows the element
+    attributes = canvas.get_attributes()
+    with pytest.raises(TypeError):
+        attributes["id"] = "changed"
+    with pytest.raises(TypeError):
+        circle.get_attributes()["cx"] = 99
+    canvas.set_attribute("id", "art")
+    assert canvas.get_attributes()["id"] == "art"
+    assert circle.get_attributes()["cx"] == 1
+
+    # set_attribute() keeps the cached HTML and the element index up to date
+    circle.set_attribute("class", "b")
+    assert root.string() == _uncached(root)
+    assert 'class="b"' in root.string()
+    assert root.select("circle.a") == [] and root.select_one("circle.b") is circle
+
+    # changing the attributes Dict or children list directly needs invalidate() and element_index.rebuild(), as documented
+    circle.attributes["class"] = "c"
+    canvas.children.append(CircleShape(Position(5, 5), 1))
+    assert 'class="c"' not in root.string()
+    circle.invalidate()
+    canvas.invalidate()
+    root.element_index.rebuild()
+    assert root.string() == _uncached(root)
+    assert 'class="c"' in root.string() and root.string().count("<circle") == 2
+    assert root.select_one("circle.c") is circle
+
+
+def _big_document(count):
+    root = HtmlComponent(tag="html")
+    body = root.add(HtmlComponent(tag="body"))
+    canvas = body.add(SvgCanvas(Size(500, 300)))
+    for i in range(count):
+        canvas.add(CircleShape(Position(i % 500, i % 300), i % 40, rgb(i % 256, 0, 0), 0.5))
+    body.add(HtmlComponent(tag="p", content="after"))
+    return root
+
+
+@pytest.mark.parametrize("cpus", [1, 4])
+def test_parallel_output_is_byte_identical(monkeypatch, cpus):
+    monkeypatch.setattr(html_f, "_usable_cpus", lambda: cpus)
+    monkeypatch.setattr(html_f, "_PARALLEL_MIN_CHILDREN", 1000)
+    root = _big_document(3000)
+    expected = _uncached(root)
+
+    renderer = html_f._ParallelRenderer(root, 3)
+    with renderer:
+        # the pool is only started with more than one usable CPU
+        assert (renderer._executor is not None) == (cpus > 1)
+    assert root.string(workers=3) == expected
+    assert root._render_cache is None # the parallel result isn't cached
+    written = io.StringIO()
+    root.write_to(written, workers=3)
+    assert written.getvalue() == expected
+
+
+def _mixed_tree():
+    root = HtmlComponent(tag="html")
+    body = root.add(HtmlComponent(tag="body", attributes={"class": "page"}))
+    body.add(Comment("shapes below"))
+    body.add(HtmlComponent(tag="p", content="some text", indented_content=False))
+    body.add(HtmlComponent(tag="br", paired=False))
+    canvas = body.add(SvgCanvas(Size(200, 100)))
+    canvas.add(CircleShape(Position(10, 20), 5, rgb(1, 2, 3), 0.5))
+    canvas.add(RectangleShape(Position(30, 40), 6, 7))
+    canvas.add(EllipseShape(Position(50, 60), 8, 9))
+    canvas.add(SvgText(Position(1, 2), content="label"))
+    body.add(Raw("raw\ntext"))
+    return root
+
+
+def test_streamed_output_matches_string():
+    expected = _uncached(_mixed_tree())
+
+    root = _mixed_tree()
+    assert "".join(root.iter_chunks()) == expected
+    assert root._render_cache is None # streaming doesn't cache anything
+    file = io.StringIO()
+    root.write_to(file)
+    assert file.getvalue() == expected
+
+    blocks = list(root.iter_blocks(block_size=64))
+    assert "".join(blocks) == expected
+    assert len(blocks) > 1 and all(len(block) >= 64 for block in blocks[:-1])
+
+    # and once cached, the cached HTML is what gets streamed
+    assert root.string() == expected
+    assert "".join(root.iter_chunks()) == expected
+    assert list(root.iter_blocks()) == [expected]
+
+
+def test_document_output_streams_the_whole_page(tmp_path):
+    doc = HtmlDocument(str(tmp_path / "page"))
+    doc.body.add(_mixed_tree())
+    doc.output()
+    doc._close_file()
+    assert (tmp_path / "page.html").read_text() == _uncached(doc.root)
+
+
+def _shapes(count):
+    kinds = [lambda i: CircleShape(Position(i, i + 1), i % 9, rgb(i % 256, 1, 2), 0.5),
+             lambda i: RectangleShape(Position(i, 3), 4, i % 7, rgb(3, i % 256, 5), 1.0),
+             lambda i: EllipseShape(Position(2, i), i % 5, 6, rgb(7, 8, i % 256), 0.3)]
+    return [kinds[i % 3](i) for i in range(count)]
+
+
+def _canvas_of(children):
+    canvas = SvgCanvas(Size(500, 300))
+    canvas.extend(children)
+    return canvas
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+def test_shape_table_outputs_the_same_lines_as_components(chunk_size):
+    expected = _canvas_of(_shapes(50)).string()
+
+    table = ShapeTable.from_components(_shapes(50), chunk_size=chunk_size)
+    assert len(table) == 50
+    assert _canvas_of([table]).string() == expected
+
+    # NumPy columns (like s_gen batches) give the same output
+    import numpy as np
+    arrays = ShapeTable({key: np.asarray(column) for key, column in table.columns.items()}, chunk_size=chunk_size)
+    assert _canvas_of([arrays]).string() == expected
+    assert arrays.row(4) == table.row(4) and all(type(value) in (int, float) for value in arrays.row(4))
+    assert [arrays.component(i).string() for i in range(50)] == [shape.string() for shape in _shapes(50)]
+
+
+def test_shape_table_rows_can_be_added_and_are_checked():
+    canvas = _canvas_of([ShapeTable(chunk_size=4)])
+    table = canvas.children[0]
+    canvas.string()
+    for shape in _shapes(10):
+        table.add_shape(shape)
+    assert canvas.string() == _canvas_of(_shapes(10)).string()
+    assert [ShapeTable.row_bounding_box(row) for row in table.rows()] == [shape.bounding_box() for shape in _shapes(10)]
+
+    with pytest.raises(ValueError, match="cannot hold"):
+        table.add_shape(Raw("text"))
+    with pytest.raises(ValueError, match="missing columns"):
+        ShapeTable({"SHA": [0]})
+    with pytest.raises(ValueError, match="same length"):
+        ShapeTable({**table.columns, "X": [1]})
+    table.columns["SHA"][0] = 2
+    with pytest.raises(ValueError, match="Incorrect SHA: 2"):
+        table.invalidate()
+        canvas.string()
+
+
+def test_shapes_dont_share_attributes():
+    first = CircleShape(Position(1, 2), 3)
+    second = CircleShape(Position(1, 2), 3)
+    first.set_attribute("id", "first")
+    assert 'id="first"' in first.string() and "id=" not in second.string()
+
+    # an attributes Dict given to the constructor is output, but the class specific attributes aren't written into it
+    shared = {"class": "dot"}
+    shapes = [CircleShape(Position(1, 2), 3, attributes=shared), RectangleShape(Position(1, 2), 3, 4, attributes=shared),
+              EllipseShape(Position(1, 2), 3, 4, attributes=shared), SvgCanvas(Size(5, 6), attributes=shared)]
+    assert all('class="dot"' in shape.string() for shape in shapes)
+    assert shared == {"class": "dot"}
+
+
+def test_leaf_shapes_stay_small():
+    canvas = SvgCanvas(Size(10, 10))
+    shapes = [canvas.add(CircleShape(Position(1, 2), 3, rgb(4, 5, 6))) for _ in range(3)]
+    assert all(shape._attributes is None and not shape._children for shape in shapes)
+    # equal colours and positions are shared rather than kept once per shape
+    assert shapes[0].fill is shapes[2].fill and shapes[0].position is shapes[2].position
+
+    # per instance overrides still work
+    element = HtmlComponent(tag="p", paired=False, indented_content=False)
+    assert element.string() == "<p>\n" and HtmlComponent().tag == "HtmlComponent"
+    text = SvgText(Position(1, 2), content="hi", parent=canvas)
+    assert text.parent is canvas
+
+
+def test_streamed_shapes_are_only_pulled_while_output():
+    from s_gen import PyArtConfig, generate_shapes, iter_random_shapes, iter_shape_batches
+    from random import Random
+    config = PyArtConfig()
+    pulled = []
+
+    def source():
+        for shape in iter_random_shapes(config, 30, Random(2)):
+            pulled.append(shape)
+            yield shape
+
+    canvas = SvgCanvas(Size(500, 300))
+    canvas.add(CircleShape(Position(1, 2), 3))
+    stream = canvas.add_shapes(source)
+    canvas.add_shapes(lambda: iter_shape_batches(config, 40, seed=3))
+    assert pulled == [] and len(canvas.children) == 3
+
+    expected = _canvas_of([CircleShape(Position(1, 2), 3)]
+                          + [shape.as_html_component() for shape in iter_random_shapes(config, 30, Random(2))]
+                          + list(generate_shapes(config, 40, seed=3).html_components())).string()
+    file = io.StringIO()
+    canvas.write_to(file)
+    assert file.getvalue() == expected and len(pulled) == 30
+    # a callable source is asked for a fresh iterable every time
+    assert "".join(canvas.iter_chunks()) == expected and len(pulled) == 60
+    assert list(stream.components())[0].string() == pulled[0].as_html_component().string()
+
+    # a plain generator is only good for one output
+    once = SvgCanvas(Size(5, 5))
+    once.add_shapes(shape.as_html_component() for shape in iter_random_shapes(config, 3, Random(1)))
+    first, second = "".join(once.iter_chunks()), "".join(once.iter_chunks())
+    assert first.count("fill-opacity") == 3 and "fill-opacity" not in second
+
+    with pytest.raises(ValueError, match="cannot output int"):
+        SvgCanvas(Size(5, 5)).add_shapes([1]).string()
+
+
+def test_async_output_matches_output_and_lets_other_tasks_run(tmp_path):
+    doc = HtmlDocument(str(tmp_path / "async"))
+    doc.body.add(_big_document(2000))
+    expected = _uncached(doc.root)
+
+    async def render():
+        ticks = 0
+        blocks = []
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        async for block in doc.root.aiter_chunks(block_size=4096):
+            blocks.append((block, ticks))
+        await doc.aoutput(block_size=4096)
+        task.cancel()
+        return blocks
+
+    blocks = asyncio.run(render())
+    doc._close_file()
+    assert "".join(block for block, _ in blocks) == expected
+    # the other task ran between the blocks
+    assert len(blocks) > 10 and blocks[-1][1] >= len(blocks) - 1
+    assert (tmp_path / "async.html").read_text() == expected
+
+
+def test_cull_removes_only_shapes_that_cant_be_seen():
+    from raster import rasterize
+    canvas = SvgCanvas(Size(100, 80))
+    off = canvas.add(CircleShape(Position(-20, 40), 10))                   # entirely left of the canvas
+    edge = canvas.add(RectangleShape(Position(95, 70), 20, 20))             # partly on the canvas
+    hidden = canvas.add(CircleShape(Position(30, 30), 5, rgb(0, 255, 0)))    # under the opaque rectangle below
+    styled = canvas.add(CircleShape(Position(30, 30), 5, attributes={"class": "glow"}))
+    peeking = canvas.add(EllipseShape(Position(48, 30), 10, 4))              # sticks out of the rectangle
+    canvas.add(RectangleShape(Position(20, 20), 30, 20, rgb(0, 0, 255), 1.0))
+    canvas.add(RectangleShape(Position(0, 0), 100, 80, rgb(9, 9, 9), 0.5))  # covers everything, but not opaque
+    later = canvas.add(CircleShape(Position(30, 30), 2))                     # painted after the rectangle
+    before = rasterize(canvas)
+    canvas.string()
+
+    result = canvas.cull()
+    assert result == (2, 1, 1) and (result.removed, result.off_canvas, result.covered) == (2, 1, 1)
+    assert off.parent is None and hidden.parent is None
+    assert all(shape.parent is canvas for shape in (edge, styled, peeking, later))
+    assert len(canvas.children) == 6
+    assert (rasterize(canvas) == before).all()
+    assert canvas.string() == _uncached(canvas) and "rgb(0, 255, 0)" not in canvas.string()
+    assert canvas.spatial_index.at_point(30, 30)[0] is styled # taken out of the spatial index too
+    assert canvas.cull() == (0, 0, 0)
+
+
+def test_cull_leaves_canvases_it_cant_reason_about():
+    canvas = SvgCanvas(Size(100, 80), attributes={"viewBox": "0 0 10 8"})
+    canvas.add(CircleShape(Position(500, 500), 10))
+    assert canvas.cull() == (0, 0, 0) and len(canvas.children) == 1
+
+    canvas = SvgCanvas(Size(100, 80))
+    canvas.add(CircleShape(Position(500, 500), 10))
+    canvas.add(CircleShape(Position(10, 10), 1))
+    canvas.add(RectangleShape(Position(0, 0), 100, 80))
+    assert canvas.cull(covered=False) == (1, 1, 0)
+    assert canvas.cull(off_canvas=False) == (1, 0, 1)
+
+
+def test_child_list_behaves_like_a_list():
+    rand = Random(3)
+    items = [object() for _ in range(40)]
+    children = ChildList(items[:20])
+    expected = list(items[:20])
+    for _ in range(400):
+        operation = rand.randint(0, 6)
+        if operation <= 1 and expected:
+            element = rand.choice(expected)
+            children.remove(element)
+            expected.remove(element)
+        elif operation == 2:
+            element = rand.choice(items) # sometimes a child that is already in the list
+            children.append(element)
+            expected.append(element)
+        elif operation == 3:
+            index = rand.randint(-3, len(expected))
+            new = [rand.choice(items) for _ in range(rand.randint(0, 3))]
+            children.insert_many(index, new)
+            expected[index:index] = new
+        elif operation == 4 and expected:
+            index = rand.randrange(len(expected))
+            assert children[index] is expected[index]
+            del children[index]
+            del expected[index]
+        elif operation == 5:
+            element = rand.choice(items)
+            assert (element in children) == (element in expected)
+        assert len(children) == len(expected)
+        if rand.random() < 0.2:
+            assert list(children) == expected and list(reversed(children)) == expected[::-1]
+    assert children == expected
+    assert pickle.loads(pickle.dumps(ChildList([1, 2]))) == [1, 2]
+    with pytest.raises(ValueError):
+        children.remove(object())
+
+
+def test_removed_children_are_placeholders_until_the_list_is_used():
+    elements = list(range(10))
+    children = ChildList(elements)
+    children.remove(3)
+    children.remove(7)
+    assert len(children) == 8 and children._removed == 2 and len(children._items) == 10
+    assert 3 not in children and 4 in children
+    assert children[3] == 4 # using an index clears them out
+    assert children._removed == 0 and len(children._items) == 8
+
+    # removing children while looping over the list skips the ones removed ahead of the loop
+    seen = []
+    for element in children:
+        seen.append(element)
+        if element == 2:
+            children.remove(5)
+            children.remove(1)
+    assert seen == [0, 1, 2, 4, 6, 8, 9]
+    assert list(children) == [0, 2, 4, 6, 8, 9]
+    assert children.remove_where(lambda element: element % 4 == 0) == [0, 4, 8]
+    assert list(children) == [2, 6, 9]
+
+
+def test_bulk_child_operations_keep_the_tree_up_to_date():
+    root = HtmlComponent(tag="html")
+    canvas = root.add(SvgCanvas(Size(500, 300)))
+    shapes = [CircleShape(Position(i, i), 2, attributes={"class": "even" if i % 2 == 0 else "odd"}) for i in range(300)]
+    assert canvas.extend(shapes[:200] + ["not an element"]) == shapes[:200]
+    root.string()
+    assert len(root.select("circle.even")) == 100 and shapes[150] in canvas.spatial_index.at_point(150, 150)
+
+    assert canvas.insert_many(10, shapes[200:]) == shapes[200:]
+    order = shapes[:10] + shapes[200:] + shapes[10:200]
+    assert list(canvas.children) == order
+    assert all(shape.parent is canvas for shape in shapes)
+    assert root.string() == _uncached(root)
+    assert shapes[250] in canvas.spatial_index.at_point(250, 250)
+
+    removed = canvas.remove_where(lambda shape: shape.get_attributes()["class"] == "odd")
+    assert removed == order[1::2]
+    assert all(shape.parent is None for shape in removed) and list(canvas.children) == order[::2]
+    assert root.select("circle.odd") == [] and shapes[151] not in canvas.spatial_index.at_point(151, 151)
+    assert root.string() == _uncached(root)
+
+    assert canvas.clear() == order[::2]
+    assert len(canvas.children) == 0 and root.select("circle") == [] and len(canvas.spatial_index) == 0
+    assert all(shape.parent is None for shape in shapes)
+    assert root.string() == _uncached(root)
+
+
+def test_removing_many_children_one_by_one_is_quick():
+    canvas = SvgCanvas(Size(500, 300))
+    shapes = canvas.extend(CircleShape(Position(i % 500, i % 300), 2) for i in range(40000))
+    start = time.perf_counter()
+    for shape in shapes[::2]:
+        shape.remove()
+    # removing from the front of a plain list is quadratic, which would take well over a second here
+    assert time.perf_counter() - start < 1
+    assert list(canvas.children) == shapes[1::2]
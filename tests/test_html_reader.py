@@ -0,0 +1,57 @@
+import io
+
+from html_f import HtmlDocument, HtmlComponent, SvgCanvas, CircleShape, Comment, Raw, Position, Size, rgb
+from html_reader import read_html, read_document
+
+
+def _round_trip(element):
+    html = element.string()
+    read = read_html(io.StringIO(html))
+    assert read.string() == html
+    return read
+
+
+def test_leading_empty_raw():
+    root = HtmlComponent(tag="html")
+    root.add(Raw(""))
+    root.add(Comment("c"))
+    assert root.string() == "<html>\n\n    <!--c-->\n</html>"
+
+    read = _round_trip(root)
+    assert [type(child) for child in read.children] == [Raw, Comment]
+
+
+def test_unpaired_element_that_isnt_void():
+    root = HtmlComponent(tag="div")
+    root.add(HtmlComponent(tag="span", paired=False))
+    root.add(HtmlComponent(tag="b", paired=False))
+    root.add(Comment("after"))
+    root.add(HtmlComponent(tag="p", content="text"))
+
+    read = _round_trip(root)
+    assert [child._paired for child in read.children[:2]] == [False, False]
+
+    _round_trip(HtmlComponent(tag="span", paired=False))
+    unindented = HtmlComponent(tag="div", indented_content=False)
+    unindented.add(HtmlComponent(tag="span", paired=False))
+    _round_trip(unindented)
+
+
+def test_raw_with_markup_before_text(tmp_path):
+    doc = HtmlDocument(str(tmp_path / "raw"))
+    canvas = doc.body.add(SvgCanvas(Size(500, 300)))
+    canvas.add(CircleShape(Position(1, 2), 3, rgb(1, 2, 3)))
+    canvas.add(Raw("<b>bold</b> text"))
+    canvas.add(Raw("<text>a</text><tspan>b</tspan>"))
+    canvas.add(Raw("<circle></circle> after a shape"))
+    canvas.add(CircleShape(Position(4, 5), 6, rgb(4, 5, 6)))
+    doc.output()
+    doc._close_file()
+
+    with open(doc._doc_name) as file:
+        html = file.read()
+    read = read_document(doc._doc_name)
+    assert read.root.string() == html
+    svg = read.body.children[0]
+    assert [type(child) for child in svg.children] == [CircleShape, Raw, CircleShape]
+    assert svg.children[1].text == "<b>bold</b> text\n<text>a</text><tspan>b</tspan>\n<circle></circle> after a shape"
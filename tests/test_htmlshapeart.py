@@ -0,0 +1,55 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+import s_gen
+from html_f import HtmlDocument, HtmlComponent, SvgCanvas, ShapeTable, Comment, Size
+from htmlshapeart import main
+from s_gen import PyArtConfig, generate_shapes
+
+
+def _expected_page(title: str, config: PyArtConfig, count: int, seed: int) -> str:
+    doc = HtmlDocument(title)
+    doc.head.add(HtmlComponent(tag="title", content=title, indented_content=False))
+    canvas = doc.body.add(SvgCanvas(Size(500, 300)))
+    canvas.add(Comment("Define SVG drawing box"))
+    canvas.add(ShapeTable(generate_shapes(config, count, seed=seed).columns))
+    return doc.root.string()
+
+
+def test_a_seed_gives_the_same_page_whatever_the_jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(s_gen, "_BLOCK_SIZE", 500) # several blocks without generating 65536 shapes each
+    pages = []
+    for jobs in (None, 1, 3):
+        path = tmp_path / f"art{jobs}.html"
+        assert main(["generate", "--count", "2200", "--seed", "7", "-o", str(path)] + (["--jobs", str(jobs)] if jobs else [])) == 0
+        pages.append(path.read_text().replace(f"art{jobs}", "art"))
+
+    assert pages[0] == pages[1] == pages[2]
+    assert pages[0] == _expected_page("art", PyArtConfig(), 2200, 7)
+
+
+def test_flags_set_the_config(capsys):
+    assert main(["generate", "--count", "50", "--seed", "3", "--sha", "0", "--r", "200,255", "--op", "0.5,1"]) == 0
+    page = capsys.readouterr().out
+    assert page == _expected_page("art", PyArtConfig(SHA=[0], R=(200, 255), OP=(0.5, 1)), 50, 3)
+    assert page.count("<circle") == 50 and "<rect" not in page
+    assert all(200 <= int(red) <= 255 for red in re.findall(r'fill="rgb\((\d+),', page))
+
+
+@pytest.mark.parametrize("flags", [["--sha", "2"], ["--r", "9,1"], ["--op", "x,1"], ["--count", "-1"]])
+def test_bad_flags_are_usage_errors(flags, capsys):
+    with pytest.raises(SystemExit) as exit:
+        main(["generate"] + flags)
+    assert exit.value.code == 2
+    assert "error" in capsys.readouterr().err
+
+
+def test_numpy_isnt_imported_to_start_up():
+    check = "import sys, htmlshapeart; print(sorted(name for name in ('numpy', 's_gen') if name in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,122 @@
+import struct
+import zlib
+from math import ceil, floor
+from random import Random
+
+import numpy as np
+import pytest
+
+from html_f import SvgCanvas, CircleShape, RectangleShape, EllipseShape, ShapeTable, SvgText, Position, Size, rgb
+from raster import png_bytes, rasterize, shape_columns, _circle_coverage, _ellipse_coverage, _rectangle_coverage
+
+
+def _painted(canvas: SvgCanvas) -> np.ndarray:
+    '''the canvas painted the plain way, back to front over every pixel, with the rasterizer's own edge coverage'''
+    width, height = canvas.size
+    pixels = np.full((height, width, 3), 255.0)
+    for shape in canvas.children:
+        if isinstance(shape, RectangleShape):
+            coverage = _rectangle_coverage(shape.position.x, shape.position.y, shape.width, shape.height, np.arange(width), np.arange(height))
+        elif isinstance(shape, CircleShape):
+            coverage = _circle_coverage(shape.position.x, shape.position.y, shape.radius, np.arange(width) + 0.5, np.arange(height) + 0.5)
+        else:
+            coverage = _ellipse_coverage(shape.position.x, shape.position.y, shape.rx, shape.ry, np.arange(width) + 0.5, np.arange(height) + 0.5)
+        # nothing is drawn outside the pixels the bounding box touches, where the estimate of a curved edge can still be above 0
+        x_min, y_min, x_max, y_max = shape.bounding_box()
+        outside = np.ones((height, width), dtype=bool)
+        outside[max(floor(y_min), 0):max(ceil(y_max), 0), max(floor(x_min), 0):max(ceil(x_max), 0)] = False
+        coverage[outside] = 0
+        alpha = (coverage * shape.fill_opacity)[:, :, np.newaxis]
+        pixels = pixels * (1 - alpha) + np.array(shape.fill, dtype=float) * alpha
+    return pixels
+
+
+def test_solid_shapes_and_opacity():
+    canvas = SvgCanvas(Size(40, 30))
+    canvas.add(RectangleShape(Position(10, 10), 10, 5, rgb(255, 0, 0), 1.0))
+    canvas.add(RectangleShape(Position(0, 0), 5, 5, rgb(0, 0, 255), 0.5))
+    canvas.add(CircleShape(Position(30, 20), 5, rgb(0, 200, 0), 1.0))
+    pixels = rasterize(canvas)
+
+    assert pixels.shape == (30, 40, 3) and pixels.dtype == np.uint8
+    assert pixels[12, 15].tolist() == [255, 0, 0]
+    assert pixels[9, 15].tolist() == pixels[12, 21].tolist() == [255, 255, 255] # rectangle edges on pixel edges aren't blurred
+    assert pixels[2, 2].tolist() == [128, 128, 255]
+    assert pixels[20, 30].tolist() == [0, 200, 0]
+    # the circle's edge is anti-aliased: pixels it partly covers are between green and white
+    around = pixels[15:26, 25:36].reshape(-1, 3).tolist()
+    assert any(0 < red < 255 and 200 < green < 255 for red, green, _ in around)
+
+    assert rasterize(canvas, scale=0.5).shape == (15, 20, 3)
+    transparent = rasterize(canvas, background=None)
+    assert transparent.shape == (30, 40, 4)
+    assert transparent[12, 15].tolist() == [255, 0, 0, 255] and transparent[2, 2].tolist() == [0, 0, 255, 128]
+    assert transparent[29, 0, 3] == 0
+
+
+def test_matches_painting_back_to_front():
+    rand = Random(5)
+    canvas = SvgCanvas(Size(64, 48))
+    # enough layers that most pixels are finished long before the bottom shapes are reached
+    for _ in range(400):
+        fill, opacity = rgb(rand.randint(0, 255), rand.randint(0, 255), rand.randint(0, 255)), rand.choice([0.3, 0.7, 1.0])
+        position = Position(rand.randint(-5, 68), rand.randint(-5, 52))
+        kind = rand.randint(0, 2)
+        if kind == 0:
+            canvas.add(CircleShape(position, rand.randint(1, 12), fill, opacity))
+        elif kind == 1:
+            canvas.add(RectangleShape(position, rand.randint(1, 20), rand.randint(1, 20), fill, opacity))
+        else:
+            canvas.add(EllipseShape(position, rand.randint(1, 12), rand.randint(1, 12), fill, opacity))
+
+    difference = np.abs(rasterize(canvas).astype(float) - np.rint(_painted(canvas)))
+    assert difference.max() <= 1
+
+
+def test_every_kind_of_shape_source_draws_the_same():
+    shapes = [CircleShape(Position(5, 5), 4, rgb(1, 2, 3)), RectangleShape(Position(2, 8), 9, 3, rgb(4, 5, 6), 0.5),
+              EllipseShape(Position(12, 4), 3, 2, rgb(7, 8, 9))]
+    canvas = SvgCanvas(Size(16, 12))
+    canvas.extend(shapes)
+    canvas.add(SvgText(Position(1, 1), content="not drawn"))
+    expected = rasterize(canvas)
+
+    table = ShapeTable.from_components(shapes)
+    assert all((shape_columns(table)[key] == shape_columns(canvas)[key]).all() for key in ShapeTable.COLUMNS)
+    assert (rasterize(table, size=Size(16, 12)) == expected).all()
+    streamed = SvgCanvas(Size(16, 12))
+    streamed.add_shapes(lambda: iter(shapes))
+    assert (rasterize(streamed) == expected).all()
+
+    with pytest.raises(ValueError, match="needs a size"):
+        rasterize(table)
+    with pytest.raises(ValueError, match="less than a pixel"):
+        rasterize(canvas, scale=0.01)
+
+
+def test_png_file(tmp_path):
+    canvas = SvgCanvas(Size(7, 5))
+    canvas.add(RectangleShape(Position(1, 1), 3, 2, rgb(10, 20, 30), 1.0))
+    canvas.write_png(str(tmp_path / "art.png"))
+    data = (tmp_path / "art.png").read_bytes()
+
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    chunks = {}
+    position = 8
+    while position < len(data):
+        length, kind = struct.unpack(">I4s", data[position:position + 8])
+        body = data[position + 8:position + 8 + length]
+        assert struct.unpack(">I", data[position + 8 + length:position + 12 + length])[0] == zlib.crc32(kind + body)
+        chunks[kind] = body
+        position += 12 + length
+    assert struct.unpack(">IIBBBBB", chunks[b"IHDR"]) == (7, 5, 8, 2, 0, 0, 0)
+
+    rows = zlib.decompress(chunks[b"IDAT"])
+    stride = 1 + 7 * 3
+    assert all(rows[row * stride] == 0 for row in range(5))
+    pixels = np.frombuffer(b"".join(rows[row * stride + 1:(row + 1) * stride] for row in range(5)), dtype=np.uint8).reshape(5, 7, 3)
+    assert (pixels == rasterize(canvas)).all()
+    assert pixels[2, 3].tolist() == [10, 20, 30]
+
+    with pytest.raises(ValueError, match="channels"):
+        png_bytes(np.zeros((2, 2, 2), dtype=np.uint8))
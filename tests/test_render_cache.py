@@ -0,0 +1,21 @@
+from gallery import GalleryPage, build_page
+from render_cache import RenderCache, page_key, shapes_key
+from s_gen import PyArtConfig
+
+
+def test_sha_order_and_repeats_change_the_key():
+    configs = [PyArtConfig(SHA=[0, 1]), PyArtConfig(SHA=[1, 0]), PyArtConfig(SHA=[0, 0, 1])]
+
+    page_keys = {page_key(GalleryPage("art", config, 50, 7)) for config in configs}
+    assert len(page_keys) == len(configs)
+    assert len({shapes_key(config, 50, 7) for config in configs}) == len(configs)
+
+
+def test_page_html_isnt_shared_between_sha_orders():
+    cache = RenderCache()
+    a = GalleryPage("art", PyArtConfig(SHA=[0, 1]), 50, 7)
+    b = GalleryPage("art", PyArtConfig(SHA=[1, 0]), 50, 7)
+
+    cache.page_html(a)
+    assert cache.page_html(b) == build_page(b).root.string().encode("utf-8")
+    assert cache.page_html(a) != cache.page_html(b)
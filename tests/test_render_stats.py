@@ -0,0 +1,77 @@
+import io
+
+import render_cache
+import s_gen
+from html_f import HtmlDocument, HtmlComponent, SvgCanvas, CircleShape, Position, Size, rgb
+from render_stats import RenderStats
+
+
+def test_generation_is_recorded_where_generate_shapes_was_imported():
+    with RenderStats() as stats:
+        # render_cache has it's own reference, from from s_gen import generate_shapes
+        render_cache.generate_shapes(s_gen.PyArtConfig(), 10, seed=1)
+        list(s_gen.iter_shape_batches(s_gen.PyArtConfig(), 5, seed=1))
+    assert stats.operations["generate_shapes"]["shapes"] == 10
+    assert stats.operations["s_gen block"]["shapes"] == 15
+    assert render_cache.generate_shapes is s_gen.generate_shapes
+
+
+def test_sizes_are_counted_in_characters():
+    def document():
+        doc = HtmlDocument("stats")
+        doc.body.add(HtmlComponent(tag="p", content="héllo", indented_content=False))
+        return doc
+
+    with RenderStats() as stats:
+        html = document().root.string()
+    assert stats.operations["HtmlComponent.string"]["chars"] == len(html)
+    assert stats.components["HtmlComponent"]["chars"] == len(html)
+
+    with RenderStats() as stats:
+        document().root.write_to(io.StringIO())
+    assert stats.components["HtmlComponent"]["chars"] == len(html)
+
+
+def _canvas_document(count=200):
+    doc = HtmlDocument("stats")
+    canvas = doc.body.add(SvgCanvas(Size(500, 300)))
+    circles = [canvas.add(CircleShape(Position(index, index % 300), 5, rgb(255, 0, 0), 0.5)) for index in range(count)]
+    return doc, canvas, circles
+
+
+def test_string_counts_every_element_once():
+    # 200 children is enough for the canvas to be rendered by _render_spans
+    doc, canvas, circles = _canvas_document()
+    with RenderStats() as stats:
+        html = doc.root.string()
+
+    circle_chars = sum(len(circle._render_cache[1]) for circle in circles)
+    assert stats.components["CircleShape"]["calls"] == 200
+    assert stats.components["CircleShape"]["chars"] == circle_chars
+    assert stats.components["SvgCanvas"]["calls"] == 1
+    assert stats.components["SvgCanvas"]["chars"] == len(canvas._render_cache[1]) - circle_chars
+    assert sum(component["chars"] for component in stats.components.values()) == len(html)
+    for component in stats.components.values():
+        assert 0 <= component["own_seconds"] <= component["cumulative_seconds"]
+
+    # only what changed is rendered again, the rest comes from the cache
+    canvas_chars = stats.components["SvgCanvas"]["chars"]
+    circles[3].radius = 7
+    with RenderStats() as stats:
+        doc.root.string()
+    assert stats.components["CircleShape"] == {**stats.components["CircleShape"], "calls": 1, "chars": len(circles[3]._render_cache[1])}
+    assert stats.components["SvgCanvas"] == {**stats.components["SvgCanvas"], "calls": 1, "chars": canvas_chars}
+    assert stats.components["HtmlComponent"]["calls"] == 2 # <html> and <body>, not <head>
+
+
+def test_write_to_matches_string():
+    doc, _, _ = _canvas_document()
+    with RenderStats() as written:
+        output = io.StringIO()
+        doc.root.write_to(output)
+    doc, _, _ = _canvas_document()
+    with RenderStats() as rendered:
+        doc.root.string()
+    assert {name: (stats["calls"], stats["chars"]) for name, stats in written.components.items()} == \
+           {name: (stats["calls"], stats["chars"]) for name, stats in rendered.components.items()}
+    assert sum(component["chars"] for component in written.components.values()) == len(output.getvalue())
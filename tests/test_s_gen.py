@@ -0,0 +1,70 @@
+from random import Random
+
+import numpy as np
+
+import s_gen
+from html_f import CircleShape, RectangleShape, EllipseShape
+from s_gen import PyArtConfig, RandomShape, generate_shapes, iter_random_shapes, iter_shape_batches
+
+
+def test_batch_values_follow_the_config():
+    config = PyArtConfig(SHA=[0, 3], X=(5, 6), RAD=(1, 2), R=(200, 255), OP=(0.2, 0.4))
+    batch = generate_shapes(config, 5000, seed=3)
+
+    assert len(batch) == 5000
+    assert list(batch.columns) == ["SHA", "X", "Y", "RAD", "RX", "RY", "W", "H", "R", "G", "B", "OP"]
+    assert set(batch.columns["SHA"].tolist()) == {0, 3}
+    # integers include both ends of their range, floats are rounded to one decimal place
+    assert set(batch.columns["X"].tolist()) == {5, 6}
+    assert set(batch.columns["RAD"].tolist()) == {1, 2}
+    assert batch.columns["R"].min() >= 200 and batch.columns["R"].max() <= 255
+    assert set(batch.columns["OP"].tolist()) <= {0.2, 0.3, 0.4}
+
+
+def test_batch_shapes_match_their_columns():
+    batch = generate_shapes(PyArtConfig(), 300, seed=11)
+    shapes = list(batch.shapes())
+    components = list(batch.html_components())
+
+    assert len(shapes) == len(components) == 300
+    for index in (0, 150, 299):
+        assert shapes[index]._shape_data == {key: column[index].item() for key, column in batch.columns.items()}
+        assert batch.as_html_component(index).string() == components[index].string()
+    kinds = {0: CircleShape, 1: RectangleShape, 3: EllipseShape}
+    assert all(type(component) is kinds[shape.SHA] for shape, component in zip(shapes, components))
+
+
+def test_seed_is_reproducible():
+    first = generate_shapes(PyArtConfig(), 1000, seed=42)
+    again = generate_shapes(PyArtConfig(), 1000, seed=42)
+    other = generate_shapes(PyArtConfig(), 1000, seed=43)
+
+    assert first.seed == 42
+    assert all(np.array_equal(first.columns[key], again.columns[key]) for key in first.columns)
+    assert not np.array_equal(first.columns["X"], other.columns["X"])
+    # a fresh seed is kept in the batch, and gives the same shapes back
+    unseeded = generate_shapes(PyArtConfig(), 100)
+    assert np.array_equal(generate_shapes(PyArtConfig(), 100, seed=unseeded.seed).columns["X"], unseeded.columns["X"])
+
+
+def test_seeded_shapes_dont_depend_on_the_workers(monkeypatch):
+    monkeypatch.setattr(s_gen, "_BLOCK_SIZE", 1000) # several blocks without generating 65536 shapes each
+    config = PyArtConfig(SHA=[0, 1], R=(10, 20))
+    serial = generate_shapes(config, 4500, seed=5)
+    parallel = generate_shapes(config, 4500, seed=5, workers=3)
+    batches = list(iter_shape_batches(config, 4500, seed=5))
+
+    assert [len(batch) for batch in batches] == [1000, 1000, 1000, 1000, 500]
+    for key in serial.columns:
+        assert np.array_equal(serial.columns[key], parallel.columns[key])
+        assert np.array_equal(serial.columns[key], np.concatenate([batch.columns[key] for batch in batches]))
+    assert parallel.seed == 5 and all(batch.seed == 5 for batch in batches)
+
+
+def test_random_shapes_can_be_seeded():
+    config = PyArtConfig(OP=(0.1, 0.9))
+    first = [RandomShape(config, Random(9))._shape_data for _ in range(3)]
+    assert first == [first[0]] * 3
+    assert [shape._shape_data for shape in iter_random_shapes(config, 20, Random(4))] == \
+        [shape._shape_data for shape in iter_random_shapes(config, 20, Random(4))]
+    assert len(list(iter_random_shapes(config, 0))) == 0
@@ -0,0 +1,23 @@
+from html_f import SvgCanvas, CircleShape, RectangleShape, EllipseShape, SvgText, Comment, ShapeTable, Position, Size, rgb
+from shape_file import ShapeFile, write_shape_file
+
+
+def test_canvas_round_trip_skips_elements_that_arent_shapes(tmp_path):
+    canvas = SvgCanvas(Size(500, 300))
+    canvas.add(Comment("Define SVG drawing box"))
+    shapes = [
+        CircleShape(Position(10, 20), 5, rgb(255, 0, 0), 0.5),
+        RectangleShape(Position(30, 40), 6, 7, rgb(0, 255, 0), 1.0),
+        EllipseShape(Position(50, 60), 8, 9, rgb(0, 0, 255), 0.3),
+    ]
+    canvas.add(shapes[0])
+    canvas.add(SvgText(Position(1, 2), content="label"))
+    canvas.add(shapes[1])
+    canvas.add(shapes[2])
+
+    path = str(tmp_path / "canvas.shapes")
+    assert write_shape_file(path, canvas) == 3
+
+    with ShapeFile(path) as shape_file:
+        assert len(shape_file) == 3
+        assert list(shape_file.rows()) == [ShapeTable.shape_row(shape) for shape in shapes]
@@ -0,0 +1,57 @@
+import time
+from random import Random
+
+import pytest
+
+from html_f import CircleShape, RectangleShape, Position, rgb
+from spatial_index import Box, ShapeIndex, _distance_to_box
+
+
+def _shapes(count=200, seed=1):
+    rand = Random(seed)
+    shapes = []
+    for _ in range(count):
+        if rand.random() < 0.5:
+            shapes.append(CircleShape(Position(rand.randint(0, 100), rand.randint(0, 100)), rand.randint(1, 10), rgb(1, 2, 3)))
+        else:
+            shapes.append(RectangleShape(Position(rand.randint(0, 100), rand.randint(0, 100)), rand.randint(1, 20), rand.randint(1, 20), rgb(1, 2, 3)))
+    return shapes
+
+
+def _brute_force(shapes, x, y, k):
+    '''nearest first, ties in insertion order'''
+    ranked = sorted(range(len(shapes)), key=lambda index: (_distance_to_box(x, y, Box(*shapes[index].bounding_box())), index))
+    return [shapes[index] for index in ranked[:k]]
+
+
+@pytest.mark.parametrize("x, y", [(50, 50), (-30, 120), (50000, 50000), (500000, 0), (-1e9, -1e9)])
+@pytest.mark.parametrize("k", [1, 5, 199])
+def test_nearest_matches_brute_force(x, y, k):
+    shapes = _shapes()
+    index = ShapeIndex(shapes, cell_size=8)
+    assert index.nearest(x, y, k) == _brute_force(shapes, x, y, k)
+
+
+def test_far_away_points_are_quick():
+    index = ShapeIndex(_shapes(), cell_size=8)
+    start = time.perf_counter()
+    for x, y in [(50000, 50000), (500000, 0), (0, -1e7)]:
+        assert len(index.nearest(x, y)) == 1
+    assert time.perf_counter() - start < 1
+
+
+def test_k_past_the_number_of_shapes_gives_every_shape():
+    shapes = _shapes(10)
+    index = ShapeIndex(shapes, cell_size=8)
+    assert index.nearest(1000, 1000, k=50) == _brute_force(shapes, 1000, 1000, 10)
+
+
+def test_empty_index():
+    index = ShapeIndex()
+    assert index.nearest(0, 0) == []
+    shapes = _shapes(3)
+    for shape in shapes:
+        index.insert(shape)
+    index.clear()
+    assert index.nearest(0, 0, k=3) == []
+    assert index.nearest(0, 0, k=0) == []
@@ -0,0 +1,31 @@
+from html_f import HtmlComponent, SvgCanvas, CircleShape, RectangleShape, EllipseShape, ShapeTable, Position, Size, rgb
+from tiles import TiledCanvas
+
+
+def _shapes():
+    return [
+        CircleShape(Position(10, 10), 5, rgb(255, 0, 0), 0.5),
+        RectangleShape(Position(90, 40), 30, 20, rgb(0, 255, 0), 1.0),
+        EllipseShape(Position(150, 150), 40, 10, rgb(0, 0, 255), 0.3),
+        CircleShape(Position(60, 60), 8, rgb(1, 2, 3), 0.7, attributes={"id": "own"}),
+    ]
+
+
+def test_streamed_shapes_are_kept_as_rows():
+    canvas = SvgCanvas(Size(200, 200))
+    canvas.add(ShapeTable.from_components(_shapes()[:1]))
+    canvas.add_shapes(iter(_shapes())) # a generator, so it can only be pulled once
+    streamed = TiledCanvas(canvas, Size(100, 100))
+
+    expected = SvgCanvas(Size(200, 200))
+    expected.add(ShapeTable.from_components(_shapes()[:1]))
+    for shape in _shapes():
+        expected.add(shape)
+    tiled = TiledCanvas(expected, Size(100, 100))
+
+    for tile in tiled.tiles():
+        assert streamed.tile_svg(tile) == tiled.tile_svg(tile)
+
+    items = [item for tile in streamed.tiles() for item in streamed._items(tile)]
+    # only the shape with it's own attributes is kept as an HtmlComponent
+    assert [item._attributes["id"] for item in items if isinstance(item, HtmlComponent)] == ["own"]
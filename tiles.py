@@ -0,0 +1,296 @@
+"""
+tiles.py
+
+Tiled output for very large SvgCanvases. The canvas is cut into a grid of tiles, each written as a standalone SVG file
+holding only the shapes that reach into it, plus an index page that shows the tiles side by side and only loads the
+ones scrolled into view.
+
+Every tile's SVG has a viewBox over its part of the canvas, so the shapes keep their canvas coordinates and anything
+reaching past the tile's edge is clipped by the SVG viewport, the same way the canvas clips at it's own edge.
+Tiles don't depend on each other, so they can be rendered one at a time (tile_svg / write_tile) or all at once in a
+pool of processes (write).
+
+Usage:
+    tiled = TiledCanvas(canvas, Size(1024, 1024))
+    tiled.write("wall", workers=8) # wall/index.html and wall/tile_<row>_<column>.svg
+
+Types / Tuples:
+    Tile: One tile of the grid (column, row, x, y, width, height)
+Classes:
+    TiledCanvas: Splits an SvgCanvas into tiles and writes them
+"""
+
+import os
+import threading
+from collections import namedtuple
+from math import ceil, floor
+from typing import Iterator, List
+
+from html_f import (HtmlComponent, HtmlDocument, SvgCanvas, ShapeTable, ShapeStream, Comment, Size,
+                    CircleShape, RectangleShape, EllipseShape)
+
+Tile = namedtuple("Tile", ["column", "row", "x", "y", "width", "height"])
+
+_SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+_SHAPES = (CircleShape, RectangleShape, EllipseShape)
+
+# the TiledCanvas shared with forked workers. Set before the pool starts, so the workers inherit it instead of having it pickled
+_forked_tiling = None
+_forked_lock = threading.Lock()
+
+
+def _tile_name(tile: Tile) -> str:
+    return f"tile_{tile.row}_{tile.column}.svg"
+
+def _item_html(item, indentation_level: int) -> str:
+    '''the HTML of a bucket item: an HtmlComponent, a (ShapeTable, row index) pair or (in spawned workers) a row tuple'''
+    if isinstance(item, HtmlComponent):
+        cache = item._render_cache
+        if cache is not None and cache[0] == indentation_level:
+            return cache[1]
+        return "".join(item.iter_chunks(indentation_level=indentation_level))
+    if isinstance(item[0], ShapeTable):
+        table, index = item
+        return ShapeTable.row_html(table.row(index), indentation_level)
+    return ShapeTable.row_html(item, indentation_level)
+
+def _write_svg(path: str, opening: str, closing: str, items: list) -> str:
+    '''writes a tile's SVG file, returning it's path'''
+    with open(path, "w") as file:
+        file.write(opening)
+        for item in items:
+            file.write("\n")
+            file.write(_item_html(item, 1))
+        file.write(closing)
+    return path
+
+def _write_forked_tile(tile: Tile, path: str) -> str:
+    '''runs in a forked worker: writes a tile of the TiledCanvas the worker inherited'''
+    _forked_tiling.write_tile(tile, path)
+    return path
+
+
+class TiledCanvas:
+    """
+    Splits an SvgCanvas into a grid of tiles.
+
+    Shapes are sorted into the tiles their bounding box reaches the first time they are needed, in one pass over the
+    canvas, so make a new TiledCanvas after changing the canvas. Elements without a known extent (SvgText, Raw, ...) go in
+    every tile, Comments in none. A ShapeStream child is pulled once, and it's shapes are kept until the TiledCanvas is
+    thrown away: as table rows, like a ShapeTable's, rather than as HtmlComponents (except shapes with attributes of their own,
+    which a row can't hold). The canvas' own attributes are not copied into the tiles.
+
+    Instance Variables:
+        canvas (SvgCanvas): The canvas being tiled
+        tile_size (Size): The size of every tile (the last column and row are cut to the canvas' size)
+        columns (int): How many tiles across
+        rows (int): How many tiles down
+
+    Methods:
+        tiles(self) -> List[Tile]: Every tile, row by row
+        tile_chunks(self, tile) -> Iterator[str]: Yields a tile's SVG as fragments
+        tile_svg(self, tile) -> str: Returns a tile's SVG
+        write_tile(self, tile, path) -> None: Writes a tile's SVG to a file
+        write(self, directory, workers=None, index_name="index") -> List[str]: Writes every tile and the index page
+    """
+
+    def __init__(self, canvas: SvgCanvas, tile_size: Size = Size(512, 512)):
+        """
+        Args:
+            canvas (SvgCanvas): The canvas to tile
+            tile_size (Size, optional): The size of a tile. Defaults to 512x512.
+
+        Raises:
+            ValueError: If the tile size isn't positive
+        """
+        if tile_size.width <= 0 or tile_size.height <= 0:
+            raise ValueError("tiles need a positive width and height")
+        self.canvas = canvas
+        self.tile_size = tile_size
+        self.columns = max(1, ceil(canvas.size.width / tile_size.width))
+        self.rows = max(1, ceil(canvas.size.height / tile_size.height))
+        self._buckets = None # [row][column] -> the items drawn in that tile, in paint order
+
+    def tiles(self) -> List[Tile]:
+        """
+        Returns every tile of the grid
+
+        Returns:
+            List[Tile]: The tiles, row by row
+        """
+        width, height = self.canvas.size
+        tile_width, tile_height = self.tile_size
+        return [Tile(column, row, column * tile_width, row * tile_height,
+                     min(tile_width, width - column * tile_width), min(tile_height, height - row * tile_height))
+                for row in range(self.rows) for column in range(self.columns)]
+
+    # Sorting shapes into tiles
+    def _sort_into_tiles(self) -> list:
+        '''one pass over the canvas, putting every item in the buckets of the tiles it reaches'''
+        buckets = [[[] for _ in range(self.columns)] for _ in range(self.rows)]
+        everywhere = [bucket for row in buckets for bucket in row]
+        tile_width, tile_height = self.tile_size
+        last_column, last_row = self.columns - 1, self.rows - 1
+
+        def place(item, box) -> None:
+            x_min, y_min, x_max, y_max = box
+            # clamped to the grid, whatever is outside the canvas is clipped anyway
+            first_column, last = max(floor(x_min / tile_width), 0), min(floor(x_max / tile_width), last_column)
+            first_row, bottom = max(floor(y_min / tile_height), 0), min(floor(y_max / tile_height), last_row)
+            for row in range(first_row, bottom + 1):
+                for column in range(first_column, last + 1):
+                    buckets[row][column].append(item)
+
+        def add(element) -> None:
+            if isinstance(element, Comment):
+                return
+            if isinstance(element, ShapeTable):
+                for index, row in enumerate(element.rows()):
+                    place((element, index), ShapeTable.row_bounding_box(row))
+            elif isinstance(element, ShapeStream):
+                # the stream's shapes are copied into a table as they are pulled, each bucket gets (table, row index)
+                streamed = ShapeTable()
+                columns = [streamed.columns[key] for key in ShapeTable.COLUMNS]
+                for component in element.components():
+                    if type(component) in _SHAPES and not component._attributes:
+                        row = ShapeTable.shape_row(component)
+                        for column, value in zip(columns, row):
+                            column.append(value)
+                        place((streamed, len(columns[0]) - 1), ShapeTable.row_bounding_box(row))
+                    else:
+                        add(component)
+            elif hasattr(element, "bounding_box"):
+                place(element, element.bounding_box())
+            else:
+                for bucket in everywhere:
+                    bucket.append(element)
+
+        for element in self.canvas._children or ():
+            add(element)
+        return buckets
+
+    def _items(self, tile: Tile) -> list:
+        if self._buckets is None:
+            self._buckets = self._sort_into_tiles()
+        return self._buckets[tile.row][tile.column]
+
+    # Rendering
+    def _wrapper(self, tile: Tile) -> SvgCanvas:
+        '''the <svg> element of a tile, only used for it's opening and closing tags'''
+        return SvgCanvas(Size(tile.width, tile.height), attributes={
+            "xmlns": _SVG_NAMESPACE,
+            "viewBox": f"{tile.x} {tile.y} {tile.width} {tile.height}",
+        })
+
+    def tile_chunks(self, tile: Tile) -> Iterator[str]:
+        """
+        Yields a tile's standalone SVG as fragments
+
+        Args:
+            tile (Tile): The tile
+
+        Yields:
+            str: The next fragment of SVG
+        """
+        wrapper = self._wrapper(tile)
+        yield wrapper._opening_html(0)
+        for item in self._items(tile):
+            yield "\n"
+            yield _item_html(item, 1)
+        yield wrapper._closing_html(0)
+
+    def tile_svg(self, tile: Tile) -> str:
+        """
+        Returns a tile's standalone SVG
+
+        Args:
+            tile (Tile): The tile
+
+        Returns:
+            str: The SVG
+        """
+        return "".join(self.tile_chunks(tile))
+
+    def write_tile(self, tile: Tile, path: str) -> None:
+        """
+        Writes a tile's standalone SVG to a file
+
+        Args:
+            tile (Tile): The tile
+            path (str): The file to write
+        """
+        wrapper = self._wrapper(tile)
+        _write_svg(path, wrapper._opening_html(0), wrapper._closing_html(0), self._items(tile))
+
+    def _index_page(self, path: str, tiles: List[Tile]) -> HtmlDocument:
+        '''the index page: the tiles in a CSS grid, as images the browser only loads when they are scrolled near'''
+        doc = HtmlDocument(path)
+        doc.head.add(HtmlComponent(tag="title", content="Tiled art", indented_content=False))
+        column_widths = " ".join(f"{tile.width}px" for tile in tiles[:self.columns])
+        doc.head.add(HtmlComponent(tag="style", content=(
+            f".tiles {{ display: grid; grid-template-columns: {column_widths}; }} .tiles img {{ display: block; }}"
+        )))
+        grid = doc.body.add(HtmlComponent(tag="div", attributes={"class": "tiles"}))
+        for tile in tiles:
+            grid.add(HtmlComponent(tag="img", paired=False, attributes={
+                "src": _tile_name(tile), "width": tile.width, "height": tile.height,
+                "loading": "lazy", "decoding": "async", "alt": "",
+            }))
+        return doc
+
+    def write(self, directory: str, workers: int = None, index_name: str = "index") -> List[str]:
+        """
+        Writes every tile as directory/tile_<row>_<column>.svg, and the index page as directory/<index_name>.html
+
+        Args:
+            directory (str): Where to write the files (created if needed)
+            workers (int, optional): The number of processes to write tiles in. Defaults to None (write them in this process).
+            index_name (str, optional): The name of the index page. Defaults to "index".
+
+        Returns:
+            List[str]: The paths of the tiles, row by row, followed by the index page
+        """
+        os.makedirs(directory, exist_ok=True)
+        tiles = self.tiles()
+        paths = [os.path.join(directory, _tile_name(tile)) for tile in tiles]
+
+        if workers is not None and workers > 1 and len(tiles) > 1:
+            self._write_parallel(tiles, paths, workers)
+        else:
+            for tile, path in zip(tiles, paths):
+                self.write_tile(tile, path)
+
+        doc = self._index_page(os.path.join(directory, index_name), tiles)
+        doc.output()
+        doc._close_file()
+        return paths + [doc._doc_name]
+
+    def _write_parallel(self, tiles: List[Tile], paths: List[str], workers: int) -> None:
+        '''writes the tiles in a process pool, the workers inherit the tiles where fork is available, otherwise each gets it's items pickled'''
+        # only needed for parallel writing, so not imported with the module
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        global _forked_tiling
+        self._items(tiles[0]) # sort the shapes into tiles first, so every worker gets the buckets
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            with _forked_lock:
+                _forked_tiling = self
+                try:
+                    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("fork")) as executor:
+                        for future in [executor.submit(_write_forked_tile, tile, path) for tile, path in zip(tiles, paths)]:
+                            future.result()
+                finally:
+                    _forked_tiling = None
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = []
+            for tile, path in zip(tiles, paths):
+                wrapper = self._wrapper(tile)
+                # table rows are sent as their values rather than with the whole table
+                items = [item[0].row(item[1]) if isinstance(item, tuple) else item for item in self._items(tile)]
+                futures.append(executor.submit(_write_svg, path, wrapper._opening_html(0), wrapper._closing_html(0), items))
+            for future in futures:
+                future.result()